@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+"""Module contenant un moteur de règles à bitboards, indépendant de la classe Echiquier.
+
+Une position y est représentée par un entier de 64 bits par code de pièce (voir le module piece):  le bit numéro i est
+à 1 si une pièce de ce code occupe la case d'indice i (voir le module geometrie, 'a1' est le bit 0 et 'h8' le bit 63).
+Les attaques du cavalier, du roi et du pion sont lues dans des tables précalculées;  celles des pièces à longue portée
+sont obtenues en coupant chaque rayon à la première pièce rencontrée.
+
+La classe EchiquierBitboard offre les mêmes requêtes que Echiquier (menaces, échec, coups possibles, mat et pat), avec
+les mêmes noms et les mêmes arguments, et peut être construite à partir d'un dictionnaire de pièces ou d'un Echiquier.
+Elle sert à contre-vérifier les règles d'Echiquier, qui reste le moteur de l'interface:  ses cartes de menaces,
+tenues à jour à chaque coup, le rendent plus rapide.
+
+"""
+from pychecs2.echecs.piece import VIDE, PION, CAVALIER, FOU, TOUR, DAME, ROI, NOIR, PIECES_PAR_CODE
+from pychecs2.echecs.piece import Pion, Tour, Fou, Cavalier, Dame, Roi
+from pychecs2.echecs.geometrie import NOMS_CASES, INDEX_CASES, INDEX_COULEURS, COULEURS, DIRECTIONS
+from pychecs2.echecs.geometrie import DIRECTIONS_TOUR, DIRECTIONS_FOU, SAUTS_CAVALIER, SAUTS_ROI, PRISES_PION, RAYONS
+from pychecs2.echecs.geometrie import AVANCE_PION, RANGEE_DEPART_PION, RANGEE_PROMOTION_PION, rangee_de, ENTRE
+
+
+########################################################################################################################
+# Tables d'attaques précalculées
+########################################################################################################################
+
+def masque(cases):
+    """Retourne le bitboard dont les bits sont à 1 pour les cases (indices) reçues."""
+
+    resultat = 0
+    for case in cases:
+        resultat |= 1 << case
+    return resultat
+
+
+def cases_du_masque(bitboard):
+    """Générateur des indices des cases dont le bit est à 1, du plus petit au plus grand."""
+
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+
+ATTAQUES_CAVALIER = tuple(masque(SAUTS_CAVALIER[case]) for case in range(64))
+ATTAQUES_ROI = tuple(masque(SAUTS_ROI[case]) for case in range(64))
+ATTAQUES_PION = (tuple(masque(PRISES_PION[0][case]) for case in range(64)),
+                 tuple(masque(PRISES_PION[1][case]) for case in range(64)))
+
+# MASQUES_RAYONS[direction][case]:  toutes les cases du rayon, jusqu'au bord.
+MASQUES_RAYONS = tuple(tuple(masque(RAYONS[case][direction]) for case in range(64)) for direction in range(8))
+
+# Une direction est croissante si les indices des cases augmentent en s'éloignant:  la première pièce rencontrée est
+# alors le bit le plus faible des bloqueurs, sinon le plus fort.
+DIRECTIONS_CROISSANTES = tuple(direction[1] > 0 or (direction[1] == 0 and direction[0] > 0)
+                               for direction in DIRECTIONS)
+
+RANGEES = tuple(masque(range(rangee * 8, rangee * 8 + 8)) for rangee in range(8))
+
+# MASQUES_ENTRE[depart][arrivee]:  les cases strictement entre deux cases alignées, 0 sinon.
+MASQUES_ENTRE = tuple(tuple(masque(ENTRE[depart][arrivee]) for arrivee in range(64)) for depart in range(64))
+
+TOUTES_LES_CASES = (1 << 64) - 1
+
+# Pour chaque roque:  (camp, départ et arrivée du roi, départ et arrivée de la tour, cases qui doivent être libres,
+# cases que traverse le roi, nom du roque)
+ROQUES = tuple((camp, INDEX_CASES[roi], INDEX_CASES[arrivee], INDEX_CASES[tour], INDEX_CASES[arrivee_tour],
+                masque(INDEX_CASES[case] for case in libres), tuple(INDEX_CASES[case] for case in traversees), nom)
+               for camp, roi, arrivee, tour, arrivee_tour, libres, traversees, nom in
+               ((0, "e1", "c1", "a1", "d1", ("b1", "c1", "d1"), ("d1", "c1"), "grand roque"),
+                (0, "e1", "g1", "h1", "f1", ("f1", "g1"), ("f1", "g1"), "petit roque"),
+                (1, "e8", "c8", "a8", "d8", ("b8", "c8", "d8"), ("d8", "c8"), "grand roque"),
+                (1, "e8", "g8", "h8", "f8", ("f8", "g8"), ("f8", "g8"), "petit roque")))
+
+
+def premier_bloqueur(bloqueurs, direction):
+    """Retourne la case du bloqueur le plus proche de l'origine d'un rayon, parmi les bits (non nuls) de bloqueurs."""
+
+    if DIRECTIONS_CROISSANTES[direction]:
+        return (bloqueurs & -bloqueurs).bit_length() - 1
+    return bloqueurs.bit_length() - 1
+
+
+def attaques_glissantes(case, occupation, directions):
+    """Retourne le bitboard des cases attaquées depuis une case par une pièce à longue portée, chaque rayon s'arrêtant
+    sur la première case occupée (incluse).
+
+    Args:
+        case(int):  Case de la pièce.
+        occupation(int):  Bitboard de toutes les pièces de l'échiquier.
+        directions(tuple):  Les directions dans lesquelles la pièce glisse."""
+
+    attaques = 0
+    for direction in directions:
+        rayon = MASQUES_RAYONS[direction][case]
+        bloqueurs = rayon & occupation
+        if bloqueurs:
+            rayon ^= MASQUES_RAYONS[direction][premier_bloqueur(bloqueurs, direction)]
+        attaques |= rayon
+    return attaques
+
+
+class EchiquierBitboard:
+    """Position d'échecs représentée par des bitboards.
+
+    Attributes:
+        pieces (list):  Pour chaque code de pièce (de 0 à 15), le bitboard des cases qu'occupent les pièces de ce code.
+        occupation (list):  Pour chaque camp (0 pour blanc, 1 pour noir), le bitboard de ses pièces.
+        piece_a_bouge (dict):  Comme dans Echiquier, indique si les rois et les tours ont déjà bougé.
+        pion_vient_de_sauter_une_case (str):  Comme dans Echiquier, la case du pion qui vient d'avancer de deux cases.
+        pile_coups (list):  Les états sauvegardés par faire_coup(), que defaire_coup() rétablit.
+
+    Args:
+        dictionnaire (dict):  Un dictionnaire {position: pièce}.  Si absent, la position de départ est installée.
+        piece_a_bouge (dict):  Les droits de roque, par défaut tous permis.
+        pion_vient_de_sauter_une_case (str):  La case du pion qui vient de sauter, par défaut aucune.
+
+    """
+
+    def __init__(self, dictionnaire=None, piece_a_bouge=None, pion_vient_de_sauter_une_case=""):
+        self.pieces = [0] * 16
+        self.occupation = [0, 0]
+        if dictionnaire is None:
+            dictionnaire = self.dictionnaire_de_depart()
+        for position, piece in dictionnaire.items():
+            self.poser(INDEX_CASES[position], piece.code)
+
+        if piece_a_bouge is None:
+            piece_a_bouge = {"e1": False, "e8": False, "a1": False, "a8": False, "h1": False, "h8": False}
+        self.piece_a_bouge = dict(piece_a_bouge)
+        self.pion_vient_de_sauter_une_case = pion_vient_de_sauter_une_case
+        self.pile_coups = []
+
+    @staticmethod
+    def dictionnaire_de_depart():
+        """Retourne le dictionnaire des pièces de la position de départ."""
+
+        dictionnaire = {}
+        for colonne, type_piece in zip("abcdefgh", (Tour, Cavalier, Fou, Dame, Roi, Fou, Cavalier, Tour)):
+            dictionnaire[colonne + "1"] = type_piece("blanc")
+            dictionnaire[colonne + "2"] = Pion("blanc")
+            dictionnaire[colonne + "7"] = Pion("noir")
+            dictionnaire[colonne + "8"] = type_piece("noir")
+        return dictionnaire
+
+    @classmethod
+    def depuis_echiquier(cls, echiquier):
+        """Construit la position bitboard correspondant à un Echiquier, à partir de ses codes de pièces.
+
+        Args:
+            echiquier (Echiquier):  L'échiquier à convertir.
+
+        Returns:
+            (EchiquierBitboard):  La position convertie."""
+
+        position = cls({}, echiquier.piece_a_bouge, echiquier.pion_vient_de_sauter_une_case)
+        for case, code in enumerate(echiquier.cases):
+            if code:
+                position.poser(case, code)
+        return position
+
+    def vers_dictionnaire(self):
+        """Retourne un dictionnaire {position: pièce} équivalent, utilisable par exemple pour construire un
+        Echiquier."""
+
+        dictionnaire = {}
+        for code, bitboard in enumerate(self.pieces):
+            for case in cases_du_masque(bitboard):
+                dictionnaire[NOMS_CASES[case]] = PIECES_PAR_CODE[code]
+        return dictionnaire
+
+    ####################################################################################################################
+    # Modification de la position
+    ####################################################################################################################
+
+    def code_a(self, case):
+        """Retourne le code de la pièce située sur une case, VIDE si la case est libre."""
+
+        bit = 1 << case
+        if not (self.occupation[0] | self.occupation[1]) & bit:
+            return VIDE
+        for code, bitboard in enumerate(self.pieces):
+            if bitboard & bit:
+                return code
+
+    def poser(self, case, code):
+        """Installe une pièce d'un code donné sur une case libre."""
+
+        self.pieces[code] |= 1 << case
+        self.occupation[code >> 3] |= 1 << case
+
+    def retirer(self, case, code):
+        """Retire la pièce d'un code donné d'une case."""
+
+        self.pieces[code] &= ~(1 << case)
+        self.occupation[code >> 3] &= ~(1 << case)
+
+    def faire_coup(self, depart, arrivee, special="", promotion=None):
+        """Joue un coup sans le valider.  L'état précédent est empilé:  comme les bitboards sont de simples entiers,
+        il suffit d'en garder une copie.
+
+        Args:
+            depart(int):  Case de départ.
+            arrivee(int):  Case d'arrivée.
+            special(str):  "grand roque", "petit roque", "en passant" ou "".
+            promotion(int):  Le type de pièce (DAME, TOUR, FOU, CAVALIER) qui remplace un pion promu, le cas échéant."""
+
+        self.pile_coups.append((tuple(self.pieces), tuple(self.occupation), self.piece_a_bouge,
+                                self.pion_vient_de_sauter_une_case))
+
+        code = self.code_a(depart)
+        camp = code >> 3
+        self.retirer(depart, code)
+        if special == "en passant":
+            case_prise = (depart & ~7) | (arrivee & 7)
+            self.retirer(case_prise, PION | (NOIR * (1 - camp)))
+        else:
+            code_pris = self.code_a(arrivee)
+            if code_pris:
+                self.retirer(arrivee, code_pris)
+        self.poser(arrivee, code if promotion is None else promotion | (NOIR * camp))
+
+        if special in ("grand roque", "petit roque"):
+            for camp_roque, roi, arrivee_roi, tour, arrivee_tour, libres, traversees, nom in ROQUES:
+                if roi == depart and arrivee_roi == arrivee:
+                    self.retirer(tour, TOUR | (NOIR * camp))
+                    self.poser(arrivee_tour, TOUR | (NOIR * camp))
+
+        # Les droits de roque sont remplacés, jamais modifiés sur place:  un appelant peut partager l'ancien dict
+        droits = dict(self.piece_a_bouge)
+        for case in (depart, arrivee):
+            if NOMS_CASES[case] in droits:
+                droits[NOMS_CASES[case]] = True
+        self.piece_a_bouge = droits
+
+        if code & 7 == PION and abs(arrivee - depart) == 16:
+            self.pion_vient_de_sauter_une_case = NOMS_CASES[arrivee]
+        else:
+            self.pion_vient_de_sauter_une_case = ""
+
+    def defaire_coup(self):
+        """Rétablit l'état d'avant le dernier coup joué avec faire_coup()."""
+
+        pieces, occupation, self.piece_a_bouge, self.pion_vient_de_sauter_une_case = self.pile_coups.pop()
+        self.pieces = list(pieces)
+        self.occupation = list(occupation)
+
+    ####################################################################################################################
+    # Menaces et échecs
+    ####################################################################################################################
+
+    def attaquants(self, case, camp, occupation=None):
+        """Retourne le bitboard des pièces d'un camp qui attaquent une case.
+
+        Args:
+            case(int):  La case attaquée.
+            camp(int):  Le camp des attaquants (0 pour blanc, 1 pour noir).
+            occupation(int):  L'occupation qui arrête les pièces à longue portée, celle de l'échiquier par défaut."""
+
+        pieces = self.pieces
+        noir = NOIR * camp
+        if occupation is None:
+            occupation = self.occupation[0] | self.occupation[1]
+
+        # Un pion du camp attaque la case s'il se trouve là où un pion adverse posé sur la case ferait une prise.
+        attaquants = ATTAQUES_PION[1 - camp][case] & pieces[PION | noir]
+        attaquants |= ATTAQUES_CAVALIER[case] & pieces[CAVALIER | noir]
+        attaquants |= ATTAQUES_ROI[case] & pieces[ROI | noir]
+        dames = pieces[DAME | noir]
+        if pieces[FOU | noir] | dames:
+            attaquants |= attaques_glissantes(case, occupation, DIRECTIONS_FOU) & (pieces[FOU | noir] | dames)
+        if pieces[TOUR | noir] | dames:
+            attaquants |= attaques_glissantes(case, occupation, DIRECTIONS_TOUR) & (pieces[TOUR | noir] | dames)
+        return attaquants
+
+    def case_du_roi(self, camp):
+        """Retourne la case du roi d'un camp."""
+
+        roi = self.pieces[ROI | (NOIR * camp)]
+        assert roi, "Il n'y a pas de roi à mettre en échec."
+        return roi.bit_length() - 1
+
+    def roi_est_en_echec(self, camp):
+        """Retourne True si le roi d'un camp est attaqué."""
+
+        return bool(self.attaquants(self.case_du_roi(camp), 1 - camp))
+
+    ####################################################################################################################
+    # Génération des coups
+    ####################################################################################################################
+
+    def attaques_de(self, case, code, occupation):
+        """Retourne le bitboard des cases attaquées par une pièce, compte tenu de l'occupation de l'échiquier."""
+
+        type_piece = code & 7
+        if type_piece == PION:
+            return ATTAQUES_PION[code >> 3][case]
+        if type_piece == CAVALIER:
+            return ATTAQUES_CAVALIER[case]
+        if type_piece == ROI:
+            return ATTAQUES_ROI[case]
+        if type_piece == FOU:
+            return attaques_glissantes(case, occupation, DIRECTIONS_FOU)
+        if type_piece == TOUR:
+            return attaques_glissantes(case, occupation, DIRECTIONS_TOUR)
+        return attaques_glissantes(case, occupation, DIRECTIONS_TOUR + DIRECTIONS_FOU)
+
+    def coups_pseudo_legaux(self, camp):
+        """Générateur des coups d'un camp qui respectent les règles de déplacement des pièces, sans vérifier si le
+        roi reste en échec.  Les roques sont entièrement validés.
+
+        Yields:
+            (int, int, str):  Case de départ, case d'arrivée et coup spécial."""
+
+        amies = self.occupation[camp]
+        adverses = self.occupation[1 - camp]
+        occupation = amies | adverses
+        noir = NOIR * camp
+
+        for type_piece in (CAVALIER, FOU, TOUR, DAME, ROI):
+            for depart in cases_du_masque(self.pieces[type_piece | noir]):
+                for arrivee in cases_du_masque(self.attaques_de(depart, type_piece, occupation) & ~amies):
+                    yield depart, arrivee, ""
+
+        avance = AVANCE_PION[camp]
+        for depart in cases_du_masque(self.pieces[PION | noir]):
+            simple = depart + avance
+            if 0 <= simple < 64 and not occupation >> simple & 1:
+                yield depart, simple, ""
+                if rangee_de(depart) == RANGEE_DEPART_PION[camp] and not occupation >> (simple + avance) & 1:
+                    yield depart, simple + avance, ""
+            for arrivee in cases_du_masque(ATTAQUES_PION[camp][depart] & adverses):
+                yield depart, arrivee, ""
+
+        # Prise en passant
+        if self.pion_vient_de_sauter_une_case:
+            case_saut = INDEX_CASES[self.pion_vient_de_sauter_une_case]
+            arrivee = case_saut + avance
+            if self.pieces[PION | (NOIR * (1 - camp))] >> case_saut & 1 and not occupation >> arrivee & 1:
+                for depart in cases_du_masque(ATTAQUES_PION[1 - camp][arrivee] & self.pieces[PION | noir]):
+                    yield depart, arrivee, "en passant"
+
+        # Roques:  roi et tour en place et jamais déplacés, cases libres, roi ni en échec ni traversant une case menacée
+        for camp_roque, roi, arrivee_roi, tour, arrivee_tour, libres, traversees, nom in ROQUES:
+            if (camp_roque == camp and not self.piece_a_bouge[NOMS_CASES[roi]]
+                    and not self.piece_a_bouge[NOMS_CASES[tour]]
+                    and self.pieces[ROI | noir] >> roi & 1 and self.pieces[TOUR | noir] >> tour & 1
+                    and not occupation & libres
+                    and not self.attaquants(roi, 1 - camp)
+                    and not any(self.attaquants(case, 1 - camp) for case in traversees)):
+                yield roi, arrivee_roi, nom
+
+    def analyser_echecs(self, camp):
+        """Calcule, comme Echiquier.analyser_echecs, ce qu'il faut savoir pour filtrer les coups d'un camp sans les
+        jouer, mais sous forme de bitboards.
+
+        Args:
+            camp(int):  Le camp (0 pour blanc, 1 pour noir) dont on veut les coups.
+
+        Returns:
+            (tuple):  (case_du_roi, echecs, blocage, clouages) où
+                case_du_roi (int) est la case du roi,
+                echecs (int) le bitboard des pièces adverses qui font échec,
+                blocage (int) les cases où une autre pièce que le roi peut aller:  toutes sans échec, la pièce qui fait
+                    échec et les cases entre elle et le roi pour un échec simple, aucune pour un échec double,
+                clouages (dict) donne pour chaque pièce clouée le bitboard de sa ligne de clouage, cloueuse comprise."""
+
+        case_du_roi = self.case_du_roi(camp)
+        echecs = self.attaquants(case_du_roi, 1 - camp)
+        if not echecs:
+            blocage = TOUTES_LES_CASES
+        elif echecs & (echecs - 1):
+            blocage = 0
+        else:
+            blocage = echecs | MASQUES_ENTRE[case_du_roi][echecs.bit_length() - 1]
+
+        # Pièces clouées:  une seule pièce du camp entre le roi et une pièce adverse à longue portée alignée
+        clouages = {}
+        amies = self.occupation[camp]
+        occupation = amies | self.occupation[1 - camp]
+        noir = NOIR * (1 - camp)
+        dames = self.pieces[DAME | noir]
+        for directions, cloueuses in ((DIRECTIONS_TOUR, self.pieces[TOUR | noir] | dames),
+                                      (DIRECTIONS_FOU, self.pieces[FOU | noir] | dames)):
+            if not cloueuses:
+                continue
+            for direction in directions:
+                rayon = MASQUES_RAYONS[direction][case_du_roi]
+                bloqueurs = rayon & occupation
+                if not bloqueurs & amies:
+                    continue
+                case_clouee = premier_bloqueur(bloqueurs, direction)
+                bloqueurs &= MASQUES_RAYONS[direction][case_clouee]
+                if not amies >> case_clouee & 1 or not bloqueurs:
+                    continue
+                cloueuse = premier_bloqueur(bloqueurs, direction)
+                if cloueuses >> cloueuse & 1:
+                    clouages[case_clouee] = rayon ^ MASQUES_RAYONS[direction][cloueuse]
+
+        return case_du_roi, echecs, blocage, clouages
+
+    def coups_legaux(self, camp):
+        """Générateur des coups légaux d'un camp.  Les échecs et les clouages sont analysés une seule fois pour la
+        position (voir analyser_echecs), puis chaque coup pseudo-légal est filtré sans être joué:  le roi ne va pas sur
+        une case attaquée, les autres pièces parent l'échec et restent sur leur ligne de clouage.  Seule la prise en
+        passant, qui retire deux pièces de la même rangée, est encore jouée puis défaite.
+
+        Yields:
+            (int, int, str):  Case de départ, case d'arrivée et coup spécial."""
+
+        case_du_roi, echecs, blocage, clouages = self.analyser_echecs(camp)
+
+        # Le roi ne doit pas masquer sa propre case aux pièces qui lui font échec de loin
+        sans_le_roi = (self.occupation[0] | self.occupation[1]) & ~(1 << case_du_roi)
+
+        for depart, arrivee, special in list(self.coups_pseudo_legaux(camp)):
+            if depart == case_du_roi:
+                if special or not self.attaquants(arrivee, 1 - camp, sans_le_roi):
+                    yield depart, arrivee, special
+            elif special == "en passant":
+                self.faire_coup(depart, arrivee, special)
+                en_echec = self.roi_est_en_echec(camp)
+                self.defaire_coup()
+                if not en_echec:
+                    yield depart, arrivee, special
+            elif blocage >> arrivee & 1 and clouages.get(depart, TOUTES_LES_CASES) >> arrivee & 1:
+                yield depart, arrivee, special
+
+    def a_des_coups_legaux(self, camp):
+        """Retourne True si un camp a au moins un coup légal."""
+
+        for coup in self.coups_legaux(camp):
+            return True
+        return False
+
+    ####################################################################################################################
+    # Requêtes compatibles avec Echiquier
+    ####################################################################################################################
+
+    def position_est_menacee_par(self, cible, couleur):
+        """Retourne un dictionnaire des pièces d'une couleur donnée, menaçant une case cible."""
+
+        camp = INDEX_COULEURS[couleur]
+        return {NOMS_CASES[case]: PIECES_PAR_CODE[self.code_a(case)]
+                for case in cases_du_masque(self.attaquants(INDEX_CASES[cible], camp))}
+
+    def roi_de_couleur_est_en_echec(self, couleur):
+        """Compile un dictionnaire des pièces adverses menaçant le roi d'une couleur donnée."""
+
+        camp = INDEX_COULEURS[couleur]
+        return self.position_est_menacee_par(NOMS_CASES[self.case_du_roi(camp)], COULEURS[1 - camp])
+
+    def mouvements_possibles_de_la_piece(self, position):
+        """Générateur des coups légaux de la pièce située à une position:  (case d'arrivée, coup spécial)."""
+
+        depart = INDEX_CASES[position]
+        code = self.code_a(depart)
+        if not code:
+            return
+        for source, arrivee, special in self.coups_legaux(code >> 3):
+            if source == depart:
+                yield NOMS_CASES[arrivee], special
+
+    def mouvements_possibles_de_couleur(self, couleur):
+        """Liste des coups légaux d'une couleur:  (case de départ, case d'arrivée, coup spécial)."""
+
+        return [(NOMS_CASES[depart], NOMS_CASES[arrivee], special)
+                for depart, arrivee, special in self.coups_legaux(INDEX_COULEURS[couleur])]
+
+    def roi_de_couleur_est_mat(self, couleur):
+        """Retourne True si le roi est en échec et aucun mouvement n'est disponible."""
+
+        camp = INDEX_COULEURS[couleur]
+        return self.roi_est_en_echec(camp) and not self.a_des_coups_legaux(camp)
+
+    def roi_de_couleur_est_pat(self, couleur):
+        """Retourne True si le roi est pat:  aucun coup disponible mais non en échec."""
+
+        camp = INDEX_COULEURS[couleur]
+        return not self.roi_est_en_echec(camp) and not self.a_des_coups_legaux(camp)
+
+    def resultat_du_coup(self, couleur):
+        """Analyse le résultat d'un coup, comme Echiquier.resultat_du_coup:  "++" si le roi de couleur est mat, "pat"
+        s'il est pat, "+" s'il est en échec, sinon chaîne vide."""
+
+        camp = INDEX_COULEURS[couleur]
+        resultat = {(True, True): "++", (True, False): "pat", (False, True): "+", (False, False): ""}
+        return resultat[(not self.a_des_coups_legaux(camp), self.roi_est_en_echec(camp))]
+
+
+if __name__ == '__main__':
+
+    def test_position_de_depart():
+        obj = EchiquierBitboard()
+        assert len(obj.mouvements_possibles_de_couleur("blanc")) == 20
+        assert len(obj.mouvements_possibles_de_couleur("noir")) == 20
+        assert obj.resultat_du_coup("blanc") == ""
+        assert sorted(obj.position_est_menacee_par("f3", "blanc")) == ["e2", "g1", "g2"]
+
+    def test_mat_et_pat():
+        obj = EchiquierBitboard({"h8": Roi("noir"), "h7": Tour("blanc"), "f6": Cavalier("blanc"), "a1": Roi("blanc")})
+        assert obj.roi_de_couleur_est_mat("noir")
+        assert obj.resultat_du_coup("noir") == "++"
+
+        obj = EchiquierBitboard({"a8": Roi("noir"), "b6": Dame("blanc"), "h1": Roi("blanc")})
+        assert obj.roi_de_couleur_est_pat("noir")
+
+    def test_conversion():
+        obj = EchiquierBitboard()
+        dictionnaire = obj.vers_dictionnaire()
+        assert len(dictionnaire) == 32 and str(dictionnaire["e1"]) == str(Roi("blanc"))
+        assert EchiquierBitboard(dictionnaire).pieces == obj.pieces
+
+    def test_droits_de_roque_partages():
+        # faire_coup() remplace les droits de roque:  le dict d'un appelant qui les partage n'est jamais modifié
+        droits = {"e1": False, "e8": False, "a1": False, "a8": False, "h1": False, "h8": False}
+        obj = EchiquierBitboard({"e1": Roi("blanc"), "h1": Tour("blanc"), "e8": Roi("noir")}, droits)
+        avant = obj.piece_a_bouge
+        obj.faire_coup(INDEX_CASES["e1"], INDEX_CASES["f1"])
+        assert obj.piece_a_bouge["e1"] and not avant["e1"] and not droits["e1"]
+        obj.defaire_coup()
+        assert obj.piece_a_bouge is avant
+        assert ("e1", "g1", "petit roque") in obj.mouvements_possibles_de_couleur("blanc")
+
+    def test_clouages_et_echecs():
+        # La tour clouée reste sur la colonne du roi
+        obj = EchiquierBitboard({"e1": Roi("blanc"), "e4": Tour("blanc"), "e8": Tour("noir"), "a8": Roi("noir")})
+        assert sorted(cible for cible, special in obj.mouvements_possibles_de_la_piece("e4")) == \
+            ["e2", "e3", "e5", "e6", "e7", "e8"]
+
+        # Échec double:  seul le roi peut bouger, et pas le long de la ligne de la tour qui fait échec
+        obj = EchiquierBitboard({"e1": Roi("blanc"), "d1": Dame("blanc"), "e8": Tour("noir"), "f3": Cavalier("noir"),
+                                 "a8": Roi("noir")})
+        assert sorted(obj.mouvements_possibles_de_couleur("blanc")) == [("e1", "f1", ""), ("e1", "f2", "")]
+
+        # Échec simple:  parer en prenant la pièce ou en s'interposant
+        obj = EchiquierBitboard({"e1": Roi("blanc"), "b2": Fou("blanc"), "c1": Cavalier("blanc"), "e5": Tour("noir"),
+                                 "a8": Roi("noir")})
+        assert sorted(depart + arrivee for depart, arrivee, special in obj.mouvements_possibles_de_couleur("blanc")
+                      if depart != "e1") == ["b2e5", "c1e2"]
+
+        # Le roi ne peut pas fuir en reculant sur la ligne de la tour
+        obj = EchiquierBitboard({"e2": Roi("blanc"), "e8": Tour("noir"), "a8": Roi("noir")})
+        assert sorted(cible for cible, special in obj.mouvements_possibles_de_la_piece("e2")) == \
+            ["d1", "d2", "d3", "f1", "f2", "f3"]
+
+        # La prise en passant découvrirait le roi sur sa rangée
+        obj = EchiquierBitboard({"a5": Roi("blanc"), "b5": Pion("blanc"), "c5": Pion("noir"), "h5": Tour("noir"),
+                                 "h1": Roi("noir")}, pion_vient_de_sauter_une_case="c5")
+        assert ("b5", "c6", "en passant") not in obj.mouvements_possibles_de_couleur("blanc")
+
+    def test_comme_echiquier():
+        from pychecs2.echecs.perft import echiquier_depuis_fen
+
+        for fen in ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -",
+                    "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ -"):
+            echiquier = echiquier_depuis_fen(fen)
+            for camp in (0, 1):
+                obj = EchiquierBitboard.depuis_echiquier(echiquier)
+                assert sorted(obj.coups_legaux(camp)) == sorted(echiquier.coups_legaux(camp)), fen
+
+    test_position_de_depart()
+    test_mat_et_pat()
+    test_conversion()
+    test_droits_de_roque_partages()
+    test_clouages_et_echecs()
+    test_comme_echiquier()
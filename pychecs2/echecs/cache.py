@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Module contenant la classe CacheLRU, un cache de capacité bornée qui évince l'entrée la moins récemment utilisée.
+
+Les clés sont typiquement des clés de Zobrist (voir le module zobrist):  une position qui revient, par exemple après
+l'annulation d'un coup, retrouve ses entrées sans qu'il faille rien invalider.
+
+"""
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cache associatif borné, à éviction de l'entrée la moins récemment utilisée (Least Recently Used).
+
+    Attributes:
+        capacite (int):  Le nombre maximal d'entrées conservées.
+        succes (int):  Le nombre de recherches qui ont trouvé leur clé.
+        defauts (int):  Le nombre de recherches qui ne l'ont pas trouvée.
+
+    Args:
+        capacite (int):  Le nombre maximal d'entrées, au moins 1.
+
+    """
+
+    def __init__(self, capacite=512):
+        assert capacite >= 1, f"Capacité erronée dans CacheLRU: {capacite}"
+        self.capacite = capacite
+        self.succes = 0
+        self.defauts = 0
+        self.entrees = OrderedDict()
+
+    def obtenir(self, cle, defaut=None):
+        """Retourne la valeur associée à une clé et la marque comme la plus récemment utilisée.
+
+        Args:
+            cle:  La clé recherchée.
+            defaut:  La valeur retournée si la clé est absente.
+
+        Returns:
+            La valeur en cache, ou defaut."""
+
+        try:
+            valeur = self.entrees[cle]
+        except KeyError:
+            self.defauts += 1
+            return defaut
+        self.entrees.move_to_end(cle)
+        self.succes += 1
+        return valeur
+
+    def ajouter(self, cle, valeur):
+        """Associe une valeur à une clé.  Si la capacité est dépassée, l'entrée la moins récemment utilisée est
+        évincée."""
+
+        self.entrees[cle] = valeur
+        self.entrees.move_to_end(cle)
+        if len(self.entrees) > self.capacite:
+            self.entrees.popitem(last=False)
+
+    def vider(self):
+        """Retire toutes les entrées et remet les compteurs à zéro."""
+
+        self.entrees.clear()
+        self.succes = 0
+        self.defauts = 0
+
+    def taux_de_succes(self):
+        """Retourne la proportion des recherches qui ont trouvé leur clé (0 si aucune recherche)."""
+
+        recherches = self.succes + self.defauts
+        return self.succes / recherches if recherches else 0
+
+    def __contains__(self, cle):
+        return cle in self.entrees
+
+    def __len__(self):
+        return len(self.entrees)
+
+    def __repr__(self):
+        return f"CacheLRU({len(self)}/{self.capacite}, succès: {self.succes}, défauts: {self.defauts})"
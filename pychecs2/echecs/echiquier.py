@@ -1,26 +1,140 @@
 # -*- coding: utf-8 -*-
-
-from pychecs2.echecs.piece import Pion, Tour, Fou, Cavalier, Dame, Roi, UTILISER_UNICODE
+from collections import Counter
+from collections.abc import MutableMapping
+from enum import IntEnum
+
+from pychecs2.echecs.piece import Pion, Tour, Fou, Cavalier, Dame, Roi, UTILISER_UNICODE, Constructeur_de_piece
+from pychecs2.echecs.piece import VIDE, PION, CAVALIER, FOU, TOUR, DAME, ROI, NOIR, PIECES_PAR_CODE
+from pychecs2.echecs.geometrie import NOMS_CASES, INDEX_CASES, INDEX_COULEURS, DIRECTIONS_GLISSANTES, RAYONS
+from pychecs2.echecs.geometrie import DIRECTIONS_CLOUEUSES
+from pychecs2.echecs.geometrie import SAUTS_CAVALIER, SAUTS_ROI, PRISES_PION, DEPLACEMENTS, PRISES
+from pychecs2.echecs.geometrie import AVANCE_PION, RANGEE_DEPART_PION, RANGEE_PROMOTION_PION, COULEUR_CASE, rangee_de
+from pychecs2.echecs.geometrie import ENTRE, DIRECTION_ENTRE, CASES_ENTRE, RANGEES_ENTRE, COLONNES_ENTRE
+from pychecs2.echecs.zobrist import ZOBRIST_PIECES, ZOBRIST_TRAIT, ZOBRIST_ROQUES, cle_des_roques, cle_en_passant
+from pychecs2.echecs.zobrist import cle_de_position
+from pychecs2.echecs.cache import CacheLRU
+from pychecs2.echecs.instantane import Instantane
 from pychecs2.interface.PychecsException import PychecsException, CaseInexistanteException, ReglesException
 from pychecs2.interface.PychecsException import CaseDepartVideException, CheminBloqueException
 from pychecs2.interface.PychecsException import DeplacementImpossibleException, PriseImpossibleException
 from pychecs2.interface.PychecsException import RoqueNonAutoriseException, PriseEnPassantNonAutoriseeException
 from pychecs2.interface.PychecsException import CouleurSeMetElleMemeEnEchecException, CaseArriveeOccupeeException
 
+
+class StatutDeplacement(IntEnum):
+    """Résultat de la validation d'un déplacement par Echiquier.verifier_deplacement().  VALIDE vaut 0:  tout autre
+    statut est vrai dans un test et correspond à l'une des exceptions levées par deplacement_est_valide()."""
+
+    VALIDE = 0
+    CASE_DEPART_VIDE = 1                    # CaseDepartVideException
+    CASE_INEXISTANTE = 2                    # CaseInexistanteException
+    DEPLACEMENT_IMPOSSIBLE = 3              # DeplacementImpossibleException
+    PRISE_IMPOSSIBLE = 4                    # PriseImpossibleException
+    CASE_ARRIVEE_OCCUPEE = 5                # CaseArriveeOccupeeException
+    CHEMIN_BLOQUE = 6                       # CheminBloqueException
+    ROQUE_NON_AUTORISE = 7                  # RoqueNonAutoriseException
+    PRISE_EN_PASSANT_NON_AUTORISEE = 8      # PriseEnPassantNonAutoriseeException
+    SE_MET_EN_ECHEC = 9                     # CouleurSeMetElleMemeEnEchecException
+
+
+class DictionnairePieces(MutableMapping):
+    """Vue de l'échiquier sous forme de dictionnaire {position: pièce}, conservée pour la compatibilité avec le code
+    qui manipule directement dictionnaire_pieces (par exemple CanvasEchiquier lors d'une promotion ou de l'annulation
+    d'un coup).  Les pièces sont en réalité rangées dans les tableaux de 64 cases de l'échiquier:  chaque modification
+    de la vue est transmise à l'échiquier, qui tient ainsi ses cartes de menaces à jour.
+
+    Attributes:
+        echiquier (Echiquier):  L'échiquier dont on présente le contenu.
+
+    Note:
+        copy() retourne un dictionnaire ordinaire, sans lien avec l'échiquier."""
+
+    def __init__(self, echiquier):
+        self.echiquier = echiquier
+
+    def __getitem__(self, position):
+        case = INDEX_CASES.get(position)
+        piece = None if case is None else self.echiquier.objets[case]
+        if piece is None:
+            raise KeyError(position)
+        return piece
+
+    def __setitem__(self, position, piece):
+        if position not in INDEX_CASES:
+            raise KeyError(position)
+        self.echiquier.poser_piece(INDEX_CASES[position], piece)
+
+    def __delitem__(self, position):
+        if position not in self:
+            raise KeyError(position)
+        self.echiquier.retirer_piece(INDEX_CASES[position])
+
+    def __contains__(self, position):
+        case = INDEX_CASES.get(position)
+        return case is not None and self.echiquier.cases[case] != VIDE
+
+    def __iter__(self):
+        for case, piece in enumerate(self.echiquier.objets):
+            if piece is not None:
+                yield NOMS_CASES[case]
+
+    def __len__(self):
+        return 64 - self.echiquier.cases.count(VIDE)
+
+    def get(self, position, defaut=None):
+        case = INDEX_CASES.get(position)
+        piece = None if case is None else self.echiquier.objets[case]
+        return defaut if piece is None else piece
+
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
 class Echiquier:
-    """Classe Echiquier, implémentée avec un dictionnaire de pièces.
+    """Classe Echiquier, implémentée avec un tableau de 64 cases.
 
+    Les cases sont désignées par leur indice (voir le module geometrie) et le contenu de chaque case est un petit
+    entier, le code de la pièce (voir le module piece).  La validation et la génération des coups travaillent
+    uniquement sur ces entiers;  les méthodes qui reçoivent des positions sous forme de chaînes ('e4') ne font que
+    les convertir.
 
     Attributes:
-        dictionnaire_pieces (dict): Un dictionnaire dont les clés sont des positions, suivant le format suivant:
+        dictionnaire_pieces (DictionnairePieces): Une vue de l'échiquier sous forme de dictionnaire dont les clés sont
+            des positions, suivant le format suivant:
             Une position est une chaîne de deux caractères.
             Le premier caractère est une lettre entre a et h, représentant la colonne de l'échiquier.
             Le second caractère est un chiffre entre 1 et 8, représentant la rangée de l'échiquier.
+        cases (list):  Les codes des pièces, pour chacune des 64 cases (VIDE si la case est libre).
+        objets (list):  Les objets Piece correspondants, pour chacune des 64 cases (None si la case est libre).
         chiffres_rangees (list): Une liste contenant, dans l'ordre, les chiffres représentant les rangées.
         lettres_colonnes (list): Une liste contenant, dans l'ordre, les lettres représentant les colonnes.
         self.piece_a_bouge (dict):  Un dictionnaire indiquant si les tours ou les rois ont été déplacés une fois.
         self.roques (dict):  Un dictionnaire contenant les paramètres d'un roque.
         pion_vient_de_sauter_une_case (dict):  Dictionnaire indiquant si un pion vient de faire un coup de deux cases.
+        menaces (tuple):  Pour chaque camp (0 pour blanc, 1 pour noir), une liste donnant pour chaque case l'ensemble
+            des cases d'où elle est attaquée par une pièce de ce camp.  Tenu à jour à chaque modification de l'échiquier.
+        portees (list):  Pour chaque case occupée, l'ensemble des cases attaquées par la pièce qui s'y trouve.
+        materiel (list):  Le nombre de pièces sur l'échiquier, pour chacun des 16 codes de pièces.
+        fous_par_couleur_de_case (list):  Le nombre de fous, des deux camps, sur les cases sombres et sur les cases
+            claires (voir COULEUR_CASE).  Le matériel est tenu à jour à chaque pose ou retrait de pièce.
+        cases_des_rois (list):  Pour chaque camp, l'indice de la case de son roi (None s'il est absent).  Tenu à jour
+            à chaque pose ou retrait de pièce;  voir l'attribut de classe verifier_cases_des_rois.
+        pile_coups (list):  La pile d'annulation des coups joués avec faire_coup(), que defaire_coup() dépile.
+        trait (int):  Le camp qui doit jouer (0 pour blanc, 1 pour noir).  Après faire_coup(), c'est l'adversaire de la
+            pièce jouée.
+        cle_zobrist (int):  La clé de Zobrist de la position (voir le module zobrist):  pièces, trait, droits de roque
+            et prise en passant.  Tenue à jour à chaque modification de l'échiquier.
+        cache_coups (CacheLRU):  Pour chaque (clé de Zobrist, camp) déjà analysé, les coups légaux du camp et si son
+            roi est en échec.  Sa capacité est donnée par l'attribut de classe capacite_cache.
+        historique_positions (Counter):  Le nombre d'occurrences de chaque clé de Zobrist depuis que l'échiquier a été
+            rempli, la position initiale étant comptée au premier appel de deplacer().
+        demi_coups (int):  Le nombre de demi-coups joués avec deplacer() depuis la dernière prise ou le dernier
+            mouvement de pion (règle des 50 coups).
+        instantanes (list):  Un Instantane par position comptée dans historique_positions, dans l'ordre de la partie:
+            la position de départ, puis celle qui suit chaque demi-coup.  Voir revenir_au_demi_coup().
 
     """
 
@@ -31,10 +145,25 @@ class Echiquier:
     roques = {("e1", "c1"): ("grand roque", "blanc", "a1"), ("e1", "g1"): ("petit roque", "blanc", "h1"),
               ("e8", "c8"): ("grand roque", "noir", "a8"), ("e8", "g8"): ("petit roque", "noir", "h8")}
 
+    # Les mêmes roques, indexés par les indices des cases du roi
+    roques_index = {(INDEX_CASES[depart], INDEX_CASES[arrivee]): roque
+                    for (depart, arrivee), roque in roques.items()}
+
+    # Déplacement de la tour pour chaque roque:  (départ, arrivée) du roi -> (départ, arrivée) de la tour, en indices
+    tours_du_roque = {(INDEX_CASES[roi], INDEX_CASES[arrivee]): (INDEX_CASES[tour], INDEX_CASES[arrivee_tour])
+                      for roi, arrivee, tour, arrivee_tour in (("e1", "c1", "a1", "d1"), ("e1", "g1", "h1", "f1"),
+                                                              ("e8", "c8", "a8", "d8"), ("e8", "g8", "h8", "f8"))}
+
     # Cases où le pion peut sauter pour la prise en passant
     pion_peut_sauter_vers = {"blanc": ["a4", "b4", "c4", "d4", "e4", "f4", "g4", "h4"],
                                   "noir": ["a5", "b5", "c5", "d5", "e5", "f5", "g5", "h5"]}
 
+    # Nombre de positions dont les coups légaux sont gardés en cache
+    capacite_cache = 512
+
+    # Mode débogage:  case_du_roi() compare alors la case tenue à jour à celle trouvée en parcourant l'échiquier
+    verifier_cases_des_rois = False
+
 
     @classmethod
     def couleur_adversaire(cls, couleur):
@@ -45,6 +174,12 @@ class Echiquier:
 
     def __init__(self, dictionnaire=None):
 
+        # La clé de Zobrist est mise à jour par chacune des variables d'état ci-dessous
+        self.cle_zobrist = 0
+        self._cle_en_passant = 0
+        self._trait = 0
+        self.cache_coups = CacheLRU(self.capacite_cache)
+
         # Ces listes pourront être utilisées dans les autres méthodes, par exemple pour valider une position.
         self.chiffres_rangees = ['1', '2', '3', '4', '5', '6', '7', '8']
         self.lettres_colonnes = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
@@ -76,6 +211,301 @@ class Echiquier:
         else:
             self.dictionnaire_pieces = dictionnaire
 
+    @property
+    def trait(self):
+        return self._trait
+
+    @trait.setter
+    def trait(self, camp):
+        if camp != self._trait:
+            self.cle_zobrist ^= ZOBRIST_TRAIT
+        self._trait = camp
+
+    @property
+    def piece_a_bouge(self):
+        return self._piece_a_bouge
+
+    @piece_a_bouge.setter
+    def piece_a_bouge(self, droits):
+        """Remplace les droits de roque.  faire_coup() et defaire_coup() les modifient plutôt sur place, en mettant la
+        clé à jour case par case."""
+
+        if hasattr(self, "_piece_a_bouge"):
+            self.cle_zobrist ^= cle_des_roques(self._piece_a_bouge)
+        self._piece_a_bouge = droits
+        self.cle_zobrist ^= cle_des_roques(droits)
+
+    @property
+    def pion_vient_de_sauter_une_case(self):
+        return self._pion_vient_de_sauter_une_case
+
+    @pion_vient_de_sauter_une_case.setter
+    def pion_vient_de_sauter_une_case(self, position):
+        """Le pion ne compte dans la clé que s'il peut être pris en passant:  faire_coup() et defaire_coup() ne le
+        modifient qu'une fois les pièces en place."""
+
+        self._pion_vient_de_sauter_une_case = position
+        self.actualiser_cle_en_passant()
+
+    def actualiser_cle_en_passant(self):
+        """Remplace dans la clé la part due au pion qui vient de sauter, évaluée sur l'échiquier actuel."""
+
+        cle = cle_en_passant(self._pion_vient_de_sauter_une_case, getattr(self, "cases", ()))
+        self.cle_zobrist ^= self._cle_en_passant ^ cle
+        self._cle_en_passant = cle
+
+    def calculer_cle_zobrist(self):
+        """Recalcule entièrement la clé de Zobrist de la position.  Sert à vérifier la clé tenue à jour
+        incrémentalement."""
+
+        return cle_de_position(self.cases, self.trait, self.piece_a_bouge, self.pion_vient_de_sauter_une_case)
+
+    @property
+    def dictionnaire_pieces(self):
+        return self._dictionnaire_pieces
+
+    @dictionnaire_pieces.setter
+    def dictionnaire_pieces(self, dictionnaire):
+        """Remplace le contenu de l'échiquier.  Les cartes de menaces sont reconstruites au fur et à mesure que les
+        pièces sont installées."""
+
+        self.cle_zobrist = cle_de_position((), self.trait, self.piece_a_bouge, self.pion_vient_de_sauter_une_case)
+        self._cle_en_passant = 0
+        self.cases = [VIDE] * 64
+        self.objets = [None] * 64
+        self.menaces = ([set() for case in range(64)], [set() for case in range(64)])
+        self.portees = [None] * 64
+        self.materiel = [0] * 16
+        self.fous_par_couleur_de_case = [0, 0]
+        self.cases_des_rois = [None, None]
+        self.pile_coups = []
+        self.historique_positions = Counter()
+        self.demi_coups = 0
+        self.instantanes = []
+        self._dictionnaire_pieces = DictionnairePieces(self)
+        if dictionnaire:
+            self._dictionnaire_pieces.update(dictionnaire)
+        self.actualiser_cle_en_passant()
+
+    ####################################################################################################################
+    # Modification des cases et cartes de menaces incrémentales
+    ####################################################################################################################
+
+    def poser_piece(self, case, piece):
+        """Installe une pièce sur une case, en remplaçant la pièce qui s'y trouvait le cas échéant, et met à jour les
+        cartes de menaces.
+
+        Args:
+            case(int):  Indice de la case.
+            piece(Piece):  La pièce à installer."""
+
+        ancienne_piece = self.objets[case]
+        if ancienne_piece is not None:
+            self.retirer_portee(case, ancienne_piece.code >> 3)
+            self.compter_materiel(case, ancienne_piece.code, -1)
+        self.compter_materiel(case, piece.code, 1)
+        self.cle_zobrist ^= ZOBRIST_PIECES[self.cases[case]][case] ^ ZOBRIST_PIECES[piece.code][case]
+        self.objets[case] = piece
+        self.cases[case] = piece.code
+        if ancienne_piece is None:
+            self.ajuster_rayons_passant_par(case, False)
+        self.ajouter_portee(case, piece.code)
+
+    def retirer_piece(self, case):
+        """Retire la pièce d'une case et met à jour les cartes de menaces.
+
+        Args:
+            case(int):  Indice de la case.
+
+        Returns:
+            (Piece):  La pièce retirée.
+
+        Raises:
+            KeyError si la case est vide."""
+
+        piece = self.objets[case]
+        if piece is None:
+            raise KeyError(NOMS_CASES[case])
+        self.retirer_portee(case, piece.code >> 3)
+        self.compter_materiel(case, piece.code, -1)
+        self.cle_zobrist ^= ZOBRIST_PIECES[piece.code][case]
+        self.objets[case] = None
+        self.cases[case] = VIDE
+        self.ajuster_rayons_passant_par(case, True)
+        return piece
+
+    def compter_materiel(self, case, code, nombre):
+        """Ajoute nombre (1 ou -1) au compte du matériel pour une pièce posée sur une case ou retirée de celle-ci.  Un
+        roi posé ou retiré met aussi à jour la case de son camp dans cases_des_rois."""
+
+        self.materiel[code] += nombre
+        type_piece = code & 7
+        if type_piece == FOU:
+            self.fous_par_couleur_de_case[COULEUR_CASE[case]] += nombre
+        elif type_piece == ROI:
+            self.cases_des_rois[code >> 3] = case if nombre > 0 else None
+
+    def faire_coup(self, depart, arrivee, special="", promotion=None):
+        """Joue un coup sur l'échiquier, sans le valider, et l'empile pour pouvoir le défaire avec defaire_coup().  La
+        pile conserve tout ce qu'il faut pour revenir en arrière:  la pièce prise, les droits de roque et la case du
+        pion qui vient de sauter.  Aucun échiquier n'est copié.  La clé de Zobrist suit chacune de ces modifications.
+
+        Args:
+            depart(int):  Indice de la case de départ.
+            arrivee(int):  Indice de la case d'arrivée.
+            special(str):  "grand roque", "petit roque", "en passant" ou "", tel que retourné par valider_deplacement().
+            promotion(Piece):  La pièce qui remplace le pion arrivé sur la dernière rangée, le cas échéant.
+
+        Returns:
+            (Piece):  La pièce prise, ou None."""
+
+        piece_jouee = self.retirer_piece(depart)
+
+        # En passant, le pion pris n'est pas sur la case d'arrivée, mais à côté de la case de départ.
+        case_prise = arrivee
+        if special == "en passant":
+            case_prise = (depart & ~7) | (arrivee & 7)
+            piece_prise = self.retirer_piece(case_prise)
+        else:
+            piece_prise = self.objets[arrivee]
+        self.poser_piece(arrivee, piece_jouee if promotion is None else promotion)
+
+        # Pour un roque, la tour suit le roi.
+        tour = self.tours_du_roque.get((depart, arrivee)) if special else None
+        if tour is not None:
+            self.poser_piece(tour[1], self.retirer_piece(tour[0]))
+
+        # Un roi ou une tour qui quitte sa case, ou une tour prise sur sa case, ne pourra plus roquer.
+        droits = self.piece_a_bouge
+        anciens_droits = []
+        for case in (depart, arrivee) if tour is None else (depart, arrivee, tour[0]):
+            position = NOMS_CASES[case]
+            if position in droits:
+                anciens_droits.append((position, droits[position]))
+                if not droits[position]:
+                    self.cle_zobrist ^= ZOBRIST_ROQUES[position]
+                droits[position] = True
+
+        # Seul le pion qui vient de sauter deux rangées peut être pris en passant au coup suivant.
+        ancien_pion_a_saute = self.pion_vient_de_sauter_une_case
+        if piece_jouee.code & 7 == PION and abs(arrivee - depart) == 16:
+            self.pion_vient_de_sauter_une_case = NOMS_CASES[arrivee]
+        else:
+            self.pion_vient_de_sauter_une_case = ""
+
+        ancien_trait = self.trait
+        self.trait = 1 - (piece_jouee.code >> 3)
+
+        self.pile_coups.append((depart, arrivee, piece_jouee, case_prise, piece_prise, tour, anciens_droits,
+                                ancien_pion_a_saute, ancien_trait))
+        return piece_prise
+
+    def defaire_coup(self):
+        """Défait le dernier coup joué avec faire_coup() et rétablit l'état de l'échiquier tel qu'il était avant ce
+        coup.
+
+        Raises:
+            IndexError si aucun coup n'est à défaire."""
+
+        (depart, arrivee, piece_jouee, case_prise, piece_prise, tour, anciens_droits,
+         ancien_pion_a_saute, ancien_trait) = self.pile_coups.pop()
+
+        if tour is not None:
+            self.poser_piece(tour[0], self.retirer_piece(tour[1]))
+
+        if piece_prise is not None and case_prise == arrivee:
+            self.poser_piece(arrivee, piece_prise)
+        else:
+            self.retirer_piece(arrivee)
+            if piece_prise is not None:
+                self.poser_piece(case_prise, piece_prise)
+        self.poser_piece(depart, piece_jouee)
+
+        droits = self.piece_a_bouge
+        for position, valeur in anciens_droits:
+            if valeur != droits[position]:
+                self.cle_zobrist ^= ZOBRIST_ROQUES[position]
+            droits[position] = valeur
+        self.pion_vient_de_sauter_une_case = ancien_pion_a_saute
+        self.trait = ancien_trait
+
+    def cases_attaquees_par(self, depart, code):
+        """Compile la liste des cases attaquées par une pièce, compte tenu des autres pièces de l'échiquier.  Pour les
+        pièces à longue portée, chaque direction s'arrête sur la première case occupée, qui est incluse.
+
+        Args:
+            depart(int):  Case où se trouve la pièce.
+            code(int):  Le code de la pièce en question.
+
+        Returns:
+            [int]:  Les cases attaquées."""
+
+        type_piece = code & 7
+        if type_piece == PION:
+            return PRISES_PION[code >> 3][depart]
+        if type_piece == CAVALIER:
+            return SAUTS_CAVALIER[depart]
+        if type_piece == ROI:
+            return SAUTS_ROI[depart]
+
+        cases = []
+        occupation = self.cases
+        rayons = RAYONS[depart]
+        for direction in DIRECTIONS_GLISSANTES[type_piece]:
+            for case in rayons[direction]:
+                cases.append(case)
+                if occupation[case]:
+                    break
+        return cases
+
+    def ajouter_portee(self, depart, code):
+        """Inscrit dans les cartes de menaces les cases attaquées par la pièce située en depart."""
+
+        menaces = self.menaces[code >> 3]
+        portee = set(self.cases_attaquees_par(depart, code))
+        self.portees[depart] = portee
+        for cible in portee:
+            menaces[cible].add(depart)
+
+    def retirer_portee(self, depart, camp):
+        """Efface des cartes de menaces les cases attaquées depuis la case depart."""
+
+        menaces = self.menaces[camp]
+        for cible in self.portees[depart]:
+            menaces[cible].discard(depart)
+        self.portees[depart] = None
+
+    def ajuster_rayon(self, depart, camp, case, prolonger):
+        """Prolonge ou raccourcit le rayon d'une pièce à longue portée qui attaque une case dont l'occupation vient de
+        changer.  Seules les cases situées au-delà de cette case, jusqu'à la prochaine pièce, sont touchées.
+
+        Args:
+            depart(int):  Case de la pièce à longue portée.
+            camp(int):  Camp de cette pièce (0 pour blanc, 1 pour noir).
+            case(int):  La case qui vient d'être libérée (prolonger=True) ou occupée (prolonger=False)."""
+
+        menaces = self.menaces[camp]
+        portee = self.portees[depart]
+        occupation = self.cases
+        for cible in RAYONS[case][DIRECTION_ENTRE[depart][case]]:
+            if prolonger:
+                portee.add(cible)
+                menaces[cible].add(depart)
+            else:
+                portee.discard(cible)
+                menaces[cible].discard(depart)
+            if occupation[cible]:
+                break
+
+    def ajuster_rayons_passant_par(self, case, prolonger):
+        """Après qu'une case a été libérée ou occupée, ajuste les rayons des pièces à longue portée qui passent par
+        cette case:  ce sont exactement celles qui l'attaquent, des deux camps."""
+
+        for camp in (0, 1):
+            for depart in tuple(self.menaces[camp][case]):
+                if (self.cases[depart] & 7) in DIRECTIONS_GLISSANTES:
+                    self.ajuster_rayon(depart, camp, case, prolonger)
+
     def position_est_valide(self, position):
         """Vérifie si une position est valide (dans l'échiquier). Une position est une concaténation d'une lettre de
         colonne et d'un chiffre de rangée, par exemple 'a1' ou 'h8'.
@@ -103,13 +533,11 @@ class Echiquier:
         # Si un pion a sauté au coup avant le coup précédent, il ne vient plus de sauter
         self.pion_vient_de_sauter_une_case = ""
 
-        piece_deplacee = self.dictionnaire_pieces[position_source]
+        depart, arrivee = INDEX_CASES[position_source], INDEX_CASES[position_cible]
 
-        # Si un pion a sauté: marquer qu'il vient de sauter
-        if position_cible in self.pion_peut_sauter_vers[piece_deplacee.couleur]:
-
-            if isinstance(piece_deplacee, Pion) and abs(ord(position_source[1]) - ord(position_cible[1])) == 2:
-                self.pion_vient_de_sauter_une_case = position_cible
+        # Si un pion a sauté (deux rangées, soit 16 cases): marquer qu'il vient de sauter
+        if self.cases[depart] & 7 == PION and abs(arrivee - depart) == 16:
+            self.pion_vient_de_sauter_une_case = position_cible
 
     def recuperer_piece_a_position(self, position):
         """Retourne la pièce qui est située à une position particulière, reçue en argument. Si aucune pièce n'est
@@ -122,10 +550,7 @@ class Echiquier:
             Piece or None: Une instance de type Piece si une pièce était située à cet endroit, et None autrement.
 
         """
-        if position in self.dictionnaire_pieces.keys():
-            return self.dictionnaire_pieces[position]
-        else:
-            return None
+        return self.dictionnaire_pieces.get(position)
 
     def couleur_piece_a_position(self, position):
         """Retourne la couleur de la pièce située à la position reçue en argument, et une chaîne vide si aucune
@@ -138,8 +563,9 @@ class Echiquier:
             str: La couleur de la pièce s'il y en a une, et '' autrement.
 
         """
-        if position in self.dictionnaire_pieces.keys():
-            return self.dictionnaire_pieces[position].couleur
+        piece = self.dictionnaire_pieces.get(position)
+        if piece is not None:
+            return piece.couleur
         else:
             return ""
 
@@ -168,13 +594,7 @@ class Echiquier:
             list: Une liste des rangées (en str) entre le début et la fin, dans le bon ordre.
 
         """
-        debut = self.chiffres_rangees.index(rangee_debut)
-        fin = self.chiffres_rangees.index(rangee_fin)
-        if fin >= debut:
-            sens = 1
-        else:
-            sens = -1
-        return self.chiffres_rangees[debut+sens:fin:sens]
+        return list(RANGEES_ENTRE[rangee_debut, rangee_fin])
 
     def colonnes_entre(self, colonne_debut, colonne_fin):
         """Retourne la liste des colonnes qui sont situées entre les deux colonnes reçues en argument, exclusivement.
@@ -201,13 +621,7 @@ class Echiquier:
             list: Une liste des colonnes (en str) entre le début et la fin, dans le bon ordre.
 
         """
-        debut = self.lettres_colonnes.index(colonne_debut)
-        fin = self.lettres_colonnes.index(colonne_fin)
-        if fin >= debut:
-            sens = 1
-        else:
-            sens = -1
-        return self.lettres_colonnes[debut + sens:fin:sens]
+        return list(COLONNES_ENTRE[colonne_debut, colonne_fin])
 
     def chemin_libre_entre_positions(self, position_source, position_cible):
         """Vérifie si la voie est libre entre deux positions, reçues en argument. Cette méthode sera pratique
@@ -234,20 +648,22 @@ class Echiquier:
                 ne permettaient pas la vérification).
 
         """
-        # Générer liste des cases entre source et cible
-        positions_inter = self.cases_entre_positions(position_source, position_cible)
+        return self.chemin_libre_entre(INDEX_CASES[position_source], INDEX_CASES[position_cible])
 
-        # Vérifier si les positions intermédiaires sont occupées: les cases occupées sont les clés du dictionnaire.
-        # Si la liste est vide, retournera True.
-        return not [pos for pos in positions_inter if pos in self.dictionnaire_pieces.keys()]
+    def chemin_libre_entre(self, depart, arrivee):
+        """Équivalent de chemin_libre_entre_positions, pour des cases données par leur indice.  Les cases
+        intermédiaires sont lues dans une table précalculée:  aucune liste n'est construite."""
 
-    def cases_occupees_entre_positions(self, position_source, position_cible):
-        # Générer liste des cases entre source et cible
-        positions_inter = self.cases_entre_positions(position_source, position_cible)
+        occupation = self.cases
+        for case in ENTRE[depart][arrivee]:
+            if occupation[case]:
+                return False
+        return True
 
-        # Vérifier si les positions intermédiaires sont occupées: les cases occupées sont les clés du dictionnaire.
-        # Si la liste est vide, retournera True.
-        return [pos for pos in positions_inter if pos in self.dictionnaire_pieces.keys()]
+    def cases_occupees_entre_positions(self, position_source, position_cible):
+        # Générer liste des cases entre source et cible, et ne garder que celles qui sont occupées.
+        return [NOMS_CASES[case] for case in ENTRE[INDEX_CASES[position_source]][INDEX_CASES[position_cible]]
+                if self.cases[case]]
 
     def cases_entre_positions(self, position_source, position_cible):
         """Compile la liste des cases sur un trajet rectiligne entre deux cases données.
@@ -260,33 +676,8 @@ class Echiquier:
             [str]:  Les cases intermédiaires.  Liste vide si les cases sont adjacentes, ou si le mouvement n'est pas
             rectiligne."""
 
-        # On commence par calculer le décalage horizontal et vertical des deux positions.
-        colonne_source = position_source[0]
-        rangee_source = position_source[1]
-        colonne_cible = position_cible[0]
-        rangee_cible = position_cible[1]
-
-        delta_colonne = abs(ord(colonne_source) - ord(colonne_cible))
-        delta_rangee = abs(int(rangee_source) - int(rangee_cible))
-
-        # Générer la liste des positions intermédiaires entre les deux positions extrêmes,  3 cas:
-
-        # Déplacement horizontal:  pas de décalage de rangées.
-        if delta_rangee == 0:
-            positions_entre = [col + rangee_source for col in self.colonnes_entre(colonne_source, colonne_cible)]
-
-        # Déplacement vertical:  pas de décalage de colonnes.
-        elif delta_colonne == 0:
-            positions_entre = [colonne_source + ran for ran in self.rangees_entre(rangee_source, rangee_cible)]
-
-        # Déplacement diagonal:  décalage rangées et colonnes sont égaux (en valeur absolue!)
-        elif delta_rangee == delta_colonne:
-            positions_entre = [col + ran for (ran, col) in zip(self.rangees_entre(rangee_source, rangee_cible),
-                                                               self.colonnes_entre(colonne_source, colonne_cible))]
-        else:
-            positions_entre = []
-
-        return positions_entre
+        # Les cases intermédiaires sont lues dans les rayons précalculés du module geometrie.
+        return list(CASES_ENTRE[position_source][position_cible])
 
     def roque_est_valide(self, position_source, position_cible, exception=True):
         """Vérifie si le roque demandé est permis.
@@ -307,27 +698,30 @@ class Echiquier:
 
         # Calcul des paramètres du roque demandé:  type de roque, identification de la tour et des cases intermédiaires
         coup = self.roques[(position_source, position_cible)][0]
-        couleur_adverse = Echiquier.couleur_adversaire(self.roques[(position_source, position_cible)][1])
         position_tour = self.roques[(position_source, position_cible)][2]
-        cases_inter = self.cases_entre_positions(position_source, position_tour)
+        depart, case_tour, arrivee = INDEX_CASES[position_source], INDEX_CASES[position_tour], INDEX_CASES[position_cible]
+        camp = INDEX_COULEURS[self.roques[(position_source, position_cible)][1]]
+        menaces_adverses = self.menaces[1 - camp]
 
-        # Les pièces concernées ne doivent pas avoir bougé
-        autorisation = not(self.piece_a_bouge[position_source]) and not(self.piece_a_bouge[position_tour])
+        # Les pièces concernées ne doivent pas avoir bougé (ni la tour avoir été prise)
+        autorisation = (not(self.piece_a_bouge[position_source]) and not(self.piece_a_bouge[position_tour])
+                        and self.cases[depart] == ROI | (NOIR * camp) and self.cases[case_tour] == TOUR | (NOIR * camp))
         if not autorisation:
             if exception:
                 raise RoqueNonAutoriseException("Le roi ou la tour a été déplacé.")
             else:
                 return False
 
-        # Les cases intermédiaires doivent être libres et non menacées
-        for case in cases_inter:
-            if case in self.dictionnaire_pieces.keys() or self.position_est_menacee_par(case, couleur_adverse):
+        # Les cases entre le roi et la tour doivent être libres, et celles que traverse le roi, non menacées
+        cases_traversees = ENTRE[depart][arrivee] + (arrivee,)
+        for case in ENTRE[depart][case_tour]:
+            if self.cases[case] or (case in cases_traversees and menaces_adverses[case]):
                 if exception:
-                    raise RoqueNonAutoriseException(f"La case {case} est occupée ou menacée.")
+                    raise RoqueNonAutoriseException(f"La case {NOMS_CASES[case]} est occupée ou menacée.")
                 else:
                     return False
 
-        # On ne valide pas si la position source met le roi en échec car ce sera fait dans deplacement_est_valide()
+        # Le roi n'est pas en échec et ne traverse aucune case menacée:  il ne peut donc pas se mettre en échec.
         if exception:
             return coup
         else:
@@ -343,37 +737,53 @@ class Echiquier:
         Returns:
             (bool):  True si la prise en passant est autorisée, False autrement"""
 
-        assert not position_cible in self.dictionnaire_pieces.keys(), f"Erreur dans la validation de la prise en passant {position_cible}"
+        assert not position_cible in self.dictionnaire_pieces, f"Erreur dans la validation de la prise en passant {position_cible}"
 
-        # Seul un pion peut faire ce mouvement
-        piece_jouee = self.dictionnaire_pieces[position_source]
-        if not isinstance(piece_jouee, Pion):
-            return False
+        return self.prise_en_passant_est_autorisee(INDEX_CASES[position_source], INDEX_CASES[position_cible])
 
-        # Il doit être sur les rangées 4 ou 5
-        if piece_jouee.couleur == "noir":
-            if not position_source[1] == "4":
-                return False
-        else:
-            if not position_source[1] == "5":
-                return False
-        # Il doit se déplacer en diagonale, comme pour une prise normale
-        if not piece_jouee.peut_faire_une_prise_vers(position_source, position_cible):
-            return False
+    def prise_en_passant_est_autorisee(self, depart, arrivee):
+        """Équivalent de prise_en_passant_autorisee, pour des cases données par leur indice.
 
-        # Il doit y avoir un pion à prendre, de couleur opposée!
-        position_prise = position_cible[0] + position_source[1]
-        if not position_prise in self.dictionnaire_pieces.keys() or not isinstance(self.dictionnaire_pieces[position_prise], Pion):
-            return False
+        Raises:
+            PriseEnPassantNonAutoriseeException si le coup a la forme d'une prise en passant, mais que le pion à
+            prendre ne vient pas de sauter."""
 
-        if self.dictionnaire_pieces[position_prise].couleur == piece_jouee.couleur:
+        autorisee = self.etat_prise_en_passant(depart, arrivee)
+        if autorisee is None:
             return False
+        if not autorisee:
+            raise PriseEnPassantNonAutoriseeException
+        return True
+
+    def etat_prise_en_passant(self, depart, arrivee):
+        """Examine, sans lever d'exception, si un coup vers une case vide est une prise en passant.
+
+        Returns:
+            (bool):  None si le coup n'a pas la forme d'une prise en passant, True si elle est autorisée, False si le
+            pion à prendre ne vient pas de sauter."""
+
+        # Seul un pion peut faire ce mouvement
+        code = self.cases[depart]
+        if code & 7 != PION:
+            return None
+
+        # Il doit être sur les rangées 4 ou 5 (d'indices 3 et 4)
+        camp = code >> 3
+        if rangee_de(depart) != 4 - camp:
+            return None
+
+        # Il doit se déplacer en diagonale, comme pour une prise normale
+        if arrivee not in PRISES[code][depart]:
+            return None
+
+        # Il doit y avoir un pion à prendre, de couleur opposée, sur la rangée de départ et la colonne d'arrivée!
+        case_prise = (depart & ~7) | (arrivee & 7)
+        code_prise = self.cases[case_prise]
+        if code_prise & 7 != PION or code_prise >> 3 == camp:
+            return None
 
         # Ce pion doit venir de faire un saut!
-        if self.pion_vient_de_sauter_une_case == position_prise:
-            return True
-        else:
-            raise PriseEnPassantNonAutoriseeException
+        return self.pion_vient_de_sauter_une_case == NOMS_CASES[case_prise]
 
     def deplacement_est_valide(self, position_source, position_cible, verifier_echec=True):
         """Vérifie si un déplacement serait valide dans l'échiquier actuel. Notez que chaque type de
@@ -400,60 +810,222 @@ class Echiquier:
 
         """
 
-        # Vérifier si la case source est occupee, extraire la pièce source, si elle est vide, terminer.
-        piece_deplacee = self.recuperer_piece_a_position(position_source)
-        if not piece_deplacee:
+        # Vérifier si la case source est occupee, si elle est vide, terminer.
+        depart = INDEX_CASES.get(position_source)
+        if depart is None or not self.cases[depart]:
             raise CaseDepartVideException(position_source)
 
         # Vérifier que la position cible est dans l'échiquier, sinon terminer.
-        if not self.position_est_valide(position_cible):
+        arrivee = INDEX_CASES.get(position_cible)
+        if arrivee is None:
             raise CaseInexistanteException
 
-        # Si la case cible est vide, vérifier que le déplacement est valide pour la pièce source
-        if not self.recuperer_piece_a_position(position_cible):
-
-            # Est-ce un roque?
-            if (position_source, position_cible) in self.roques.keys():
-                try:
-                    coup = self.roque_est_valide(position_source, position_cible)
-                except RoqueNonAutoriseException as erreur:
-                    raise erreur
-                else:
-                    return coup
+        return self.valider_deplacement(depart, arrivee, verifier_echec)
+
+    def valider_deplacement(self, depart, arrivee, verifier_echec=True):
+        """Équivalent de deplacement_est_valide, pour des cases données par leur indice.  La validation elle-même est
+        faite par statut_du_deplacement();  l'exception correspondant au statut n'est construite qu'en cas de refus.
+
+        Args:
+            depart (int): L'indice de la case source du déplacement.
+            arrivee (int): L'indice de la case cible du déplacement.
+            verifier_echec (bool): Si True, on va aussi vérifier si le joueur se met lui-même en échec.
 
-            # Ou une prise en passant!!!
-            if self.prise_en_passant_autorisee(position_source, position_cible):
-                return "en passant"
+        Returns:
+            (str): Une chaîne vide si le coup demandé est régulier et autorisé.  Une chaîne de caractère indiquant la
+            nature du coup si c'est un coup spécial comme le roque ou la prise en passant.
+
+        Raises:
+            PychecsException si le déplacement n'est pas valide.
+
+        """
+
+        statut, special = self.statut_du_deplacement(depart, arrivee, verifier_echec)
+        if statut:
+            raise self.exception_du_statut(statut, depart, arrivee)
+        return special
+
+    def verifier_deplacement(self, position_source, position_cible, verifier_echec=True):
+        """Équivalent de deplacement_est_valide qui ne lève aucune exception:  le refus est signalé par un statut.
+        Destinée aux appels en masse (validation de lots, génération de coups, importation de parties).
+
+        Args:
+            position_source (str): La position source du déplacement.
+            position_cible (str): La position cible du déplacement.
+            verifier_echec (bool): Si True, on va aussi vérifier si le joueur se met lui-même en échec.
+
+        Returns:
+            (StatutDeplacement, str):  Le statut (StatutDeplacement.VALIDE si le coup est permis) et le coup spécial:
+            "grand roque", "petit roque", "en passant" ou "".
+
+        """
+
+        depart = INDEX_CASES.get(position_source)
+        if depart is None or not self.cases[depart]:
+            return StatutDeplacement.CASE_DEPART_VIDE, ""
+        arrivee = INDEX_CASES.get(position_cible)
+        if arrivee is None:
+            return StatutDeplacement.CASE_INEXISTANTE, ""
+        return self.statut_du_deplacement(depart, arrivee, verifier_echec)
+
+    def statut_du_deplacement(self, depart, arrivee, verifier_echec=True):
+        """Équivalent de verifier_deplacement, pour des cases données par leur indice.  Toute la validation se fait
+        sur les codes des pièces et les tables du module geometrie.
+
+        Args:
+            depart (int): L'indice de la case source du déplacement.
+            arrivee (int): L'indice de la case cible du déplacement.
+            verifier_echec (bool): Si True, on va aussi vérifier si le joueur se met lui-même en échec.
+
+        Returns:
+            (StatutDeplacement, str):  Le statut et le coup spécial.
+
+        """
+
+        occupation = self.cases
+        code = occupation[depart]
+        if not code:
+            return StatutDeplacement.CASE_DEPART_VIDE, ""
+        code_cible = occupation[arrivee]
 
-            if not piece_deplacee.peut_se_deplacer_vers(position_source, position_cible):
-                raise DeplacementImpossibleException(piece_deplacee)
+        # Si la case cible est vide, vérifier que le déplacement est valide pour la pièce source
+        if not code_cible:
+
+            # Est-ce un roque?  Seul le roi roque:  une tour peut très bien aller de e1 à c1.
+            if code & 7 == ROI and (depart, arrivee) in self.roques_index:
+                if self.roque_est_valide(NOMS_CASES[depart], NOMS_CASES[arrivee], exception=False):
+                    return StatutDeplacement.VALIDE, self.roques_index[depart, arrivee][0]
+                return StatutDeplacement.ROQUE_NON_AUTORISE, ""
+
+            # Ou une prise en passant!!!  Le pion pris peut découvrir une attaque sur le roi:  on vérifie l'échec
+            # en jouant le coup au complet.
+            en_passant = self.etat_prise_en_passant(depart, arrivee)
+            if en_passant is not None:
+                if not en_passant:
+                    return StatutDeplacement.PRISE_EN_PASSANT_NON_AUTORISEE, ""
+                if verifier_echec and self.coup_met_en_echec(depart, arrivee, "en passant"):
+                    return StatutDeplacement.SE_MET_EN_ECHEC, ""
+                return StatutDeplacement.VALIDE, "en passant"
+
+            if arrivee not in DEPLACEMENTS[code][depart]:
+                return StatutDeplacement.DEPLACEMENT_IMPOSSIBLE, ""
 
         # Si la case cible est occupée, elle doit l'être par une pièce de couleur opposée et on doit la prendre
         else:
 
             # Si la case cible est occupée:  pièce de couleur opposée
-            if self.couleur_piece_a_position(position_source) == self.couleur_piece_a_position(position_cible):
-                raise CaseArriveeOccupeeException(position_cible)
+            if code_cible >> 3 == code >> 3:
+                return StatutDeplacement.CASE_ARRIVEE_OCCUPEE, ""
 
             # Prise possible:
-            if not piece_deplacee.peut_faire_une_prise_vers(position_source, position_cible):
-                raise PriseImpossibleException(piece_deplacee)
+            if arrivee not in PRISES[code][depart]:
+                return StatutDeplacement.PRISE_IMPOSSIBLE, ""
 
         # Si le chemin n'est pas libre et que la pièce ne peut sauter, terminer.
-        if not piece_deplacee.peut_sauter and not self.chemin_libre_entre_positions(position_source,
-                                                                                    position_cible):
-            raise CheminBloqueException(position_source,
-                                        position_cible,
-                                        self.cases_occupees_entre_positions(position_source, position_cible))
+        if code & 7 != CAVALIER and not self.chemin_libre_entre(depart, arrivee):
+            return StatutDeplacement.CHEMIN_BLOQUE, ""
 
         # Finalement, on ne doit jamais se mettre soi-même en échec
         # On va permettre de sauter cette étape, si la méthode est appelée par se_met_en_echec() car on
         # obtiendra sinon une récursion infinie.
-        if (verifier_echec and self.se_met_en_echec(position_source, position_cible)):
-            raise CouleurSeMetElleMemeEnEchecException
+        if verifier_echec and self.coup_met_en_echec(depart, arrivee):
+            return StatutDeplacement.SE_MET_EN_ECHEC, ""
 
         # Le déplacement est légal et ce n'est pas un coup spécial on retourne une chaîne vide!
-        return ""
+        return StatutDeplacement.VALIDE, ""
+
+    def valider_lot(self, coups, verifier_echec=True):
+        """Valide une liste de coups sur la position actuelle.  Les échecs et les clouages ne sont analysés qu'une fois
+        par camp (voir analyser_echecs()), puis chaque coup est filtré sans être joué, sauf la prise en passant.
+
+        Args:
+            coups (list):  Les coups à valider, sous forme de paires (position source, position cible).
+            verifier_echec (bool): Si True, on va aussi vérifier si le joueur se met lui-même en échec.
+
+        Returns:
+            [(StatutDeplacement, str)]:  Pour chaque coup, dans l'ordre, le statut et le coup spécial, comme
+            verifier_deplacement().
+
+        """
+
+        analyses = {}
+        resultats = []
+        for position_source, position_cible in coups:
+            statut, special = self.verifier_deplacement(position_source, position_cible, verifier_echec=False)
+            if statut or not verifier_echec:
+                resultats.append((statut, special))
+                continue
+
+            depart, arrivee = INDEX_CASES[position_source], INDEX_CASES[position_cible]
+            camp = self.cases[depart] >> 3
+            if camp not in analyses:
+                analyses[camp] = self.analyser_echecs(camp)
+            if self.coup_laisse_le_roi_sauf(depart, arrivee, special, analyses[camp]):
+                resultats.append((statut, special))
+            else:
+                resultats.append((StatutDeplacement.SE_MET_EN_ECHEC, ""))
+        return resultats
+
+    def coup_laisse_le_roi_sauf(self, depart, arrivee, special, analyse):
+        """Vérifie, à partir de l'analyse des échecs et des clouages, qu'un coup pseudo-légal ne laisse pas le roi en
+        échec.  C'est le filtre qu'applique mouvements_possibles_de_la_case() à chacun des coups qu'il génère.
+
+        Args:
+            depart (int): L'indice de la case source du coup.
+            arrivee (int): L'indice de la case cible du coup.
+            special (str):  Le coup spécial retourné par la validation.
+            analyse (tuple):  Le résultat de analyser_echecs() pour le camp qui joue.
+
+        Returns:
+            (bool):  True si le coup est légal."""
+
+        case_du_roi, echecs, clouages, blocage, interdites_au_roi = analyse
+
+        # Un roque validé ne traverse aucune case menacée;  les autres coups du roi évitent les cases attaquées
+        if depart == case_du_roi:
+            return bool(special) or (not self.menaces[1 - (self.cases[depart] >> 3)][arrivee]
+                                     and arrivee not in interdites_au_roi)
+        if special == "en passant":
+            return not self.coup_met_en_echec(depart, arrivee, special)
+        if len(echecs) > 1:
+            return False
+        ligne = clouages.get(depart)
+        return (ligne is None or arrivee in ligne) and (blocage is None or arrivee in blocage)
+
+    def exception_du_statut(self, statut, depart, arrivee):
+        """Construit l'exception correspondant au refus d'un déplacement, avec les détails utiles au joueur.
+
+        Args:
+            statut (StatutDeplacement):  Le statut retourné par statut_du_deplacement(), autre que VALIDE.
+            depart (int): L'indice de la case source du déplacement.
+            arrivee (int): L'indice de la case cible du déplacement.
+
+        Returns:
+            (ReglesException):  L'exception à lever."""
+
+        if statut == StatutDeplacement.CASE_DEPART_VIDE:
+            return CaseDepartVideException(NOMS_CASES[depart])
+        if statut == StatutDeplacement.CASE_INEXISTANTE:
+            return CaseInexistanteException()
+        if statut == StatutDeplacement.DEPLACEMENT_IMPOSSIBLE:
+            return DeplacementImpossibleException(self.objets[depart])
+        if statut == StatutDeplacement.PRISE_IMPOSSIBLE:
+            return PriseImpossibleException(self.objets[depart])
+        if statut == StatutDeplacement.CASE_ARRIVEE_OCCUPEE:
+            return CaseArriveeOccupeeException(NOMS_CASES[arrivee])
+        if statut == StatutDeplacement.CHEMIN_BLOQUE:
+            return CheminBloqueException(NOMS_CASES[depart], NOMS_CASES[arrivee],
+                                         [NOMS_CASES[case] for case in ENTRE[depart][arrivee] if self.cases[case]])
+        if statut == StatutDeplacement.ROQUE_NON_AUTORISE:
+            # roque_est_valide() lève l'exception qui précise la raison du refus.
+            try:
+                self.roque_est_valide(NOMS_CASES[depart], NOMS_CASES[arrivee])
+            except RoqueNonAutoriseException as erreur:
+                return erreur
+            return RoqueNonAutoriseException("Le roque demandé n'est pas permis.")
+        if statut == StatutDeplacement.PRISE_EN_PASSANT_NON_AUTORISEE:
+            return PriseEnPassantNonAutoriseeException()
+        return CouleurSeMetElleMemeEnEchecException()
 
     def position_est_menacee_par(self, cible, couleur):
         """Retourne un dictionnaire des pièces d'une couleur donnée, menaçant une case cible.
@@ -466,15 +1038,12 @@ class Echiquier:
             (dict):  Dictionnaire des pièces de couleur donnée, pouvant faire une prise à cible avec un chemin dégagé.
             """
 
-        dictionnaire = {}
-        for depart, piece in self.dictionnaire_pieces.items():
-            if (piece.couleur == couleur
-                and
-               (piece.peut_sauter or self.chemin_libre_entre_positions(depart, cible))
-                and
-                piece.peut_faire_une_prise_vers(depart, cible)):
-                    dictionnaire[depart] = piece
-        return dictionnaire
+        # Simple consultation de la carte des menaces, tenue à jour à chaque modification de l'échiquier.
+        case = INDEX_CASES.get(cible)
+        if case is None:
+            return {}
+        objets = self.objets
+        return {NOMS_CASES[depart]: objets[depart] for depart in self.menaces[INDEX_COULEURS[couleur]][case]}
 
     def position_est_accessible_par(self, cible, couleur):
         """Compile la liste des pièces d'une couleur donnée, pouvant accéder à une case donnée.  Diffère de la méthode
@@ -487,16 +1056,32 @@ class Echiquier:
         Returns:
             (dict):  Dictionnaire des pièces de couleur donnée en argument, pouvant aller sur la case cible."""
 
+        arrivee = INDEX_CASES[cible]
+        camp = INDEX_COULEURS[couleur]
         dictionnaire = {}
-        for depart, piece in self.dictionnaire_pieces.items():
-            if (piece.couleur == couleur
+        for depart, code in enumerate(self.cases):
+            if (code and code >> 3 == camp
                 and
-                (piece.peut_sauter or self.chemin_libre_entre_positions(depart, cible))
+                arrivee in DEPLACEMENTS[code][depart]
                 and
-                piece.peut_se_deplacer_vers(depart, cible)):
-                    dictionnaire[depart] = piece
+                (code & 7 == CAVALIER or self.chemin_libre_entre(depart, arrivee))):
+                    dictionnaire[NOMS_CASES[depart]] = self.objets[depart]
         return dictionnaire
 
+    def case_du_roi(self, camp):
+        """Retrouve l'indice de la case du roi d'un camp donné (0 pour blanc, 1 pour noir).
+
+        Raises:
+            assertionError si le roi est absent de l'échiquier."""
+
+        case = self.cases_des_rois[camp]
+        if self.verifier_cases_des_rois:
+            code_roi = ROI | (NOIR * camp)
+            assert case == (self.cases.index(code_roi) if code_roi in self.cases else None), \
+                f"Case du roi erronée dans Echiquier.case_du_roi: {case}"
+        assert case is not None, "Il n'y a pas de roi à mettre en échec."
+        return case
+
     def position_du_roi_de_couleur(self, couleur):
         """Retrouve le roi d'une couleur donnée dans l'échiquier.
         Args:
@@ -507,10 +1092,7 @@ class Echiquier:
         Raises:
             assertionError si le roi est absent de l'échiquier."""
 
-        assert self.roi_de_couleur_est_dans_echiquier(couleur), "Il n'y a pas de roi à mettre en échec."
-        for position, piece in self.dictionnaire_pieces.items():
-            if isinstance(piece, Roi) and self.couleur_piece_a_position(position) == couleur:
-                return position
+        return NOMS_CASES[self.case_du_roi(INDEX_COULEURS[couleur])]
 
     def roi_de_couleur_est_en_echec(self, couleur):
         """Compile un dictionnaire des pièces adverses menaçant un roi de couleur donnée.
@@ -524,6 +1106,11 @@ class Echiquier:
         pieces_menacantes = self.position_est_menacee_par(self.position_du_roi_de_couleur(couleur), Echiquier.couleur_adversaire(couleur))
         return pieces_menacantes
 
+    def roi_est_en_echec(self, camp):
+        """Retourne True si le roi d'un camp donné (0 pour blanc, 1 pour noir) est attaqué."""
+
+        return bool(self.menaces[1 - camp][self.case_du_roi(camp)])
+
     def generer_toutes_les_positions(self):
         """Générateur qui retourne toutes les cases de l'échiquier."""
 
@@ -532,8 +1119,8 @@ class Echiquier:
                 yield(col+ran)
 
     def se_met_en_echec(self, source, cible):
-        """Vérifie si le coup joué résulte en un échec pour le joueur.  Crée une copie de l'échiquier pour faire la
-        vérification.
+        """Vérifie si le coup joué résulte en un échec pour le joueur.  Le coup est joué temporairement sur
+        l'échiquier lui-même, puis défait: les cartes de menaces suivent ces deux modifications sans être reconstruites.
 
         Args:
             source(str):  Case départ du coup
@@ -542,17 +1129,24 @@ class Echiquier:
         Returns:
             (bool):  True si le coup est illégal."""
 
-        couleur = self.couleur_piece_a_position(source)
+        return self.coup_met_en_echec(INDEX_CASES[source], INDEX_CASES[cible])
+
+    def coup_met_en_echec(self, depart, arrivee, special=""):
+        """Équivalent de se_met_en_echec, pour des cases données par leur indice.  Le coup spécial éventuel (prise en
+        passant) est joué au complet."""
+
+        camp = self.cases[depart] >> 3
+
+        # On fait le déplacement sans validation: il ne faut pas appeler se_met_en_echec() récursivement!
+        self.faire_coup(depart, arrivee, special)
 
-        # On crée une copie de l'échiquier, avec une copie du dictionnaire de pièces.
-        echiquier_fictif = Echiquier(self.dictionnaire_pieces.copy())
+        # Si la liste des menaces est vide le coup est permis.
+        en_echec = self.roi_est_en_echec(camp)
 
-        # On fait le déplacement, mais il ne faut pas appeler se_met_en_echec() récursivement!
-        # Donc on utilise la version sans_verifier_echec
-        echiquier_fictif.deplacer_sans_verifier_echec(source, cible)
+        # Remettre l'échiquier dans son état initial
+        self.defaire_coup()
 
-        # Si la liste des menaces est vide on retourne False.
-        return bool(echiquier_fictif.roi_de_couleur_est_en_echec(couleur))
+        return en_echec
 
     def roi_de_couleur_peut_eviter_echec(self, couleur):
         """Vérifier si le roi peut se déplacer pour esquiver l'attaque.  Retire le roi du jeu, vérifie tous les mouvements
@@ -564,67 +1158,263 @@ class Echiquier:
         Returns:
             ([str]):  Liste des cases où le roi peut fuir."""
 
-        position_du_roi = self.position_du_roi_de_couleur(couleur)
+        camp = INDEX_COULEURS[couleur]
+        case_du_roi = self.case_du_roi(camp)
 
         # On enlève temporairement le roi du jeu, sinon il pourrait se "protéger" lui-même!
-        roi = self.dictionnaire_pieces.pop(position_du_roi)
+        roi = self.retirer_piece(case_du_roi)
         liste_des_deplacements = []
 
-        # On examine toutes les cases du jeu:  si le roi peut se déplacer dans l'une d'elle en sécurité:  ajouter à la
+        # On examine les cases voisines du roi:  s'il peut se déplacer dans l'une d'elle en sécurité:  ajouter à la
         # liste
-        for position in self.generer_toutes_les_positions():
+        for case in SAUTS_ROI[case_du_roi]:
 
-            # Soit la case visée est vide ou occupée par une pièce adverse ET le roi peut s'y déplacer
-            if self.couleur_piece_a_position(position) != couleur and roi.peut_se_deplacer_vers(position_du_roi, position):
+            # Soit la case visée est vide ou occupée par une pièce adverse
+            code = self.cases[case]
+            if not code or code >> 3 != camp:
 
                 # Dans ce cas il faut vérifier que le roi ne se remet pas en échec
-                if not self.position_est_menacee_par(position, Echiquier.couleur_adversaire(couleur)):
-                    liste_des_deplacements.append(position)
+                if not self.menaces[1 - camp][case]:
+                    liste_des_deplacements.append(NOMS_CASES[case])
 
         # Une fois la liste compilée, remettre le roi à sa place, et retourner la liste.
-        self.dictionnaire_pieces[position_du_roi] = roi
+        self.poser_piece(case_du_roi, roi)
         return liste_des_deplacements
 
     def pieces_de_couleur(self, couleur):
-        """Générateur qui retourne toutes les pièces d'une couleur donnée."""
+        """Générateur qui retourne toutes les pièces d'une couleur donnée.  On parcourt une copie de la liste des
+        pièces, car la vérification des coups modifie temporairement l'échiquier."""
 
-        for position, piece in self.dictionnaire_pieces.items():
-            if piece.couleur == couleur:
-                yield(position)
+        for case in self.cases_du_camp(INDEX_COULEURS[couleur]):
+            yield(NOMS_CASES[case])
+
+    def cases_du_camp(self, camp):
+        """Retourne la liste des indices des cases occupées par les pièces d'un camp (0 pour blanc, 1 pour noir)."""
+
+        return [case for case, code in enumerate(self.cases) if code and code >> 3 == camp]
 
     def mouvements_possibles_de_la_piece(self, position):
         """Générateur qui retourne tous les mouvements qu'une pièce peut faire sur un échiquier donné, compte tenu des
         autres pièces.  Si le mouvement résulte en un échec, il n'est pas inclus!"""
 
-        for cible in self.generer_toutes_les_positions():
-            if cible != position:
-                try:
-                    coup = self.deplacement_est_valide(position, cible, verifier_echec=True)
-                except ReglesException:
+        depart = INDEX_CASES[position]
+        if not self.cases[depart]:
+            return
+        coups, en_echec = self.analyse_en_cache(self.cases[depart] >> 3)
+        for source, arrivee, coup in coups:
+            if source == depart:
+                yield NOMS_CASES[arrivee], coup
+
+    def mouvements_possibles_de_la_case(self, depart, analyse=None):
+        """Équivalent de mouvements_possibles_de_la_piece, pour une case donnée par son indice.  Les cases d'arrivée
+        sont aussi données par leur indice.
+
+        Args:
+            depart(int):  Indice de la case de la pièce.
+            analyse(tuple):  Le résultat de analyser_echecs() pour le camp de la pièce, s'il est déjà calculé."""
+
+        if analyse is None:
+            analyse = self.analyser_echecs(self.cases[depart] >> 3)
+        case_du_roi, echecs, clouages, blocage, interdites_au_roi = analyse
+
+        # Le roi ne peut aller sur une case attaquée, ni reculer le long de la ligne d'une pièce qui lui fait échec.
+        if depart == case_du_roi:
+            menaces_adverses = self.menaces[1 - (self.cases[depart] >> 3)]
+            for arrivee, special in self.coups_pseudo_legaux(depart):
+                if special or (not menaces_adverses[arrivee] and arrivee not in interdites_au_roi):
+                    yield arrivee, special
+            return
+
+        # Échec double:  seul le roi peut bouger
+        if len(echecs) > 1:
+            return
+
+        ligne = clouages.get(depart)
+        for arrivee, special in self.coups_pseudo_legaux(depart):
+
+            # La prise en passant retire deux pièces d'une même rangée:  on la joue pour en avoir le coeur net.
+            if special == "en passant":
+                if not self.coup_met_en_echec(depart, arrivee, special):
+                    yield arrivee, special
+
+            # Une pièce clouée reste sur sa ligne, et en cas d'échec il faut prendre la pièce ou s'interposer.
+            elif (ligne is None or arrivee in ligne) and (blocage is None or arrivee in blocage):
+                yield arrivee, special
+
+    def analyser_echecs(self, camp):
+        """Calcule, une fois pour toutes pour une position, ce qu'il faut savoir pour filtrer les coups d'un camp sans
+        les jouer:  les pièces qui font échec au roi, les pièces clouées et les cases interdites au roi.
+
+        Args:
+            camp(int):  Le camp (0 pour blanc, 1 pour noir) dont on veut les coups.
+
+        Returns:
+            (tuple):  (case_du_roi, echecs, clouages, blocage, interdites_au_roi) où
+                case_du_roi (int) est la case du roi,
+                echecs (set) les cases des pièces adverses qui font échec,
+                clouages (dict) donne pour chaque pièce clouée les cases de sa ligne de clouage,
+                blocage (set) les cases qui parent un échec simple (prise ou interposition), None sans échec,
+                interdites_au_roi (set) les cases situées derrière le roi sur la ligne d'une pièce qui lui fait échec."""
+
+        occupation = self.cases
+        case_du_roi = self.case_du_roi(camp)
+        echecs = self.menaces[1 - camp][case_du_roi]
+
+        # Cases qui parent un échec simple, et cases que les rayons des pièces qui font échec atteignent à travers le roi
+        blocage = None
+        interdites_au_roi = set()
+        for case in echecs:
+            direction = DIRECTION_ENTRE[case][case_du_roi]
+            if direction is not None and (occupation[case] & 7) in DIRECTIONS_GLISSANTES:
+                blocage = set(ENTRE[case_du_roi][case])
+                interdites_au_roi.update(RAYONS[case_du_roi][direction][:1])
+            else:
+                blocage = set()
+            blocage.add(case)
+
+        # Pièces clouées:  une seule pièce de son camp entre le roi et une pièce adverse à longue portée alignée
+        clouages = {}
+        for direction, rayon in enumerate(RAYONS[case_du_roi]):
+            pieces_cloueuses = DIRECTIONS_CLOUEUSES[direction]
+            case_clouee = None
+            for case in rayon:
+                code = occupation[case]
+                if not code:
+                    continue
+                if case_clouee is None and code >> 3 == camp:
+                    case_clouee = case
                     continue
+                if case_clouee is not None and code >> 3 != camp and (code & 7) in pieces_cloueuses:
+                    clouages[case_clouee] = rayon[:rayon.index(case) + 1]
+                break
+
+        return case_du_roi, echecs, clouages, blocage, interdites_au_roi
+
+    def coups_pseudo_legaux(self, depart):
+        """Générateur des coups d'une pièce qui respectent ses règles de déplacement, compte tenu des autres pièces,
+        mais sans vérifier si le joueur se met lui-même en échec.  Les cases d'arrivée sont obtenues directement à
+        partir de la case de départ (rayons, sauts du cavalier et du roi, avance et prises du pion), sans essayer les
+        64 cases ni lever d'exceptions.
+
+        Les roques sont entièrement validés ici:  un roque permis ne met jamais le roi en échec.
+
+        Args:
+            depart(int):  Indice de la case de la pièce.
+
+        Yields:
+            (int, str):  La case d'arrivée, et le coup spécial ("grand roque", "petit roque", "en passant" ou "")."""
+
+        occupation = self.cases
+        code = occupation[depart]
+        camp = code >> 3
+        type_piece = code & 7
+
+        if type_piece == PION:
+
+            # Avance d'une case, puis de deux depuis la rangée de départ, si les cases sont libres
+            avance = depart + AVANCE_PION[camp]
+            if 0 <= avance < 64 and not occupation[avance]:
+                yield avance, ""
+                if rangee_de(depart) == RANGEE_DEPART_PION[camp] and not occupation[avance + AVANCE_PION[camp]]:
+                    yield avance + AVANCE_PION[camp], ""
+
+            # Prises en diagonale
+            for arrivee in PRISES_PION[camp][depart]:
+                code_cible = occupation[arrivee]
+                if code_cible and code_cible >> 3 != camp:
+                    yield arrivee, ""
+
+            # Prise en passant du pion qui vient de sauter, s'il est à côté
+            if self.pion_vient_de_sauter_une_case:
+                case_saut = INDEX_CASES[self.pion_vient_de_sauter_une_case]
+                arrivee = case_saut + AVANCE_PION[camp]
+                if (rangee_de(case_saut) == rangee_de(depart) and abs(case_saut - depart) == 1
+                        and occupation[case_saut] == PION | (NOIR * (1 - camp)) and not occupation[arrivee]):
+                    yield arrivee, "en passant"
+            return
+
+        if type_piece == CAVALIER or type_piece == ROI:
+            for arrivee in (SAUTS_CAVALIER if type_piece == CAVALIER else SAUTS_ROI)[depart]:
+                code_cible = occupation[arrivee]
+                if not code_cible or code_cible >> 3 != camp:
+                    yield arrivee, ""
+
+            # Roques, s'ils sont permis
+            if type_piece == ROI:
+                for arrivee in (depart - 2, depart + 2):
+                    roque = self.roques_index.get((depart, arrivee))
+                    if roque is not None and self.roque_est_valide(NOMS_CASES[depart], NOMS_CASES[arrivee], False):
+                        yield arrivee, roque[0]
+            return
+
+        # Pièces à longue portée:  on glisse dans chaque direction jusqu'à la première pièce, prise si elle est adverse
+        rayons = RAYONS[depart]
+        for direction in DIRECTIONS_GLISSANTES[type_piece]:
+            for arrivee in rayons[direction]:
+                code_cible = occupation[arrivee]
+                if not code_cible:
+                    yield arrivee, ""
                 else:
-                    yield cible, coup
+                    if code_cible >> 3 != camp:
+                        yield arrivee, ""
+                    break
 
     def mouvements_possibles_de_couleur(self, couleur):
 
         # On compile la liste de tous les mouvements possibles de couleur:  le roi est pat si aucun mouvement n'est
         # disponible, mais que le roi n'est pas mat.
 
-        liste_des_mouvements_restants = []
-        for position_depart in self.pieces_de_couleur(couleur):
-            for coup in self.mouvements_possibles_de_la_piece(position_depart):
-                liste_des_mouvements_restants.append((position_depart, coup[0], coup[1]))
-        return liste_des_mouvements_restants
+        coups, en_echec = self.analyse_en_cache(INDEX_COULEURS[couleur])
+        return [(NOMS_CASES[depart], NOMS_CASES[arrivee], coup) for depart, arrivee, coup in coups]
+
+    def analyse_en_cache(self, camp):
+        """Retourne les coups légaux d'un camp et si son roi est en échec, en passant par le cache des positions déjà
+        analysées.  La clé de Zobrist identifiant la position, un coup annulé retrouve son entrée sans qu'il faille
+        invalider quoi que ce soit.
+
+        Args:
+            camp(int):  Le camp (0 pour blanc, 1 pour noir).
+
+        Returns:
+            (tuple, bool):  Les coups légaux (case de départ, case d'arrivée, coup spécial) et True si le roi est en
+            échec."""
+
+        cle = (self.cle_zobrist, camp)
+        analyse = self.cache_coups.obtenir(cle)
+        if analyse is None:
+            analyse = (tuple(self.coups_legaux(camp)), self.roi_est_en_echec(camp))
+            self.cache_coups.ajouter(cle, analyse)
+        return analyse
+
+    def coups_legaux(self, camp):
+        """Générateur de tous les coups légaux d'un camp (0 pour blanc, 1 pour noir).  Les échecs et les clouages sont
+        analysés une seule fois pour la position, puis chaque coup est filtré sans être joué.
+
+        Yields:
+            (int, int, str):  Case de départ, case d'arrivée et coup spécial."""
+
+        analyse = self.analyser_echecs(camp)
+        for depart in self.cases_du_camp(camp):
+            for arrivee, coup in self.mouvements_possibles_de_la_case(depart, analyse):
+                yield depart, arrivee, coup
+
+    def a_des_coups_legaux(self, camp):
+        """Retourne True si un camp (0 pour blanc, 1 pour noir) a au moins un coup légal.  S'arrête au premier coup
+        trouvé."""
+
+        for coup in self.coups_legaux(camp):
+            return True
+        return False
 
     def roi_de_couleur_est_pat(self, couleur):
         """Retourne True si le roi est pat:  aucun coup disponible mais non en échec."""
 
-        return not self.mouvements_possibles_de_couleur(couleur) and not self.roi_de_couleur_est_en_echec(couleur)
+        return self.roi_de_couleur_est_immobilise(couleur) == (True, False)
 
     def roi_de_couleur_est_mat(self, couleur):
         """Retourne True si le roi est en échec et aucun mouvement n'est disponible."""
 
-        return not self.mouvements_possibles_de_couleur(couleur) and self.roi_de_couleur_est_en_echec(couleur)
+        return self.roi_de_couleur_est_immobilise(couleur) == (True, True)
 
     def roi_de_couleur_est_immobilise(self, couleur):
         """Vérifie si un roi donnée a des mouvements possibles et est en échce
@@ -632,7 +1422,8 @@ class Echiquier:
         Returns:
             (bool, bool): (Couleur a des coups possibles, roi de couleur est en échec)"""
 
-        return (not bool(self.mouvements_possibles_de_couleur(couleur)), bool(self.roi_de_couleur_est_en_echec(couleur)))
+        coups, en_echec = self.analyse_en_cache(INDEX_COULEURS[couleur])
+        return not coups, en_echec
 
     def resultat_du_coup(self, couleur):
         """Analyse le résultat d'un coup
@@ -641,10 +1432,186 @@ class Echiquier:
             couleur(str):  Si "blanc" vient de jouer un coup, on analyse le résultat pour "noir".
 
         Returns:
-            (str):  "++" si le roi de couleur est mat, "pat" s'il est pat, "+" s'il est en échec, sinon chaîne vide."""
+            (str):  "++" si le roi de couleur est mat, "pat" s'il est pat, "+" s'il est en échec, sinon chaîne vide.  Si
+            la partie est nulle, "matériel insuffisant", "répétition" ou "50 coups" (voir partie_nulle())."""
+
+        # Une position morte est nulle sans qu'il faille générer les coups
+        if self.materiel_insuffisant():
+            return "matériel insuffisant"
 
         resultat = {(True, True): "++", (True, False): "pat", (False, True): "+", (False, False): ""}
-        return resultat[self.roi_de_couleur_est_immobilise(couleur)]
+        resultat = resultat[self.roi_de_couleur_est_immobilise(couleur)]
+        if resultat in ("++", "pat"):
+            return resultat
+        return self.partie_nulle() or resultat
+
+    def partie_nulle(self):
+        """Vérifie, en temps constant, si la partie est nulle par répétition ou par la règle des 50 coups.
+
+        Returns:
+            (str):  "matériel insuffisant" si aucun camp ne peut plus mater, "répétition" si la position actuelle est
+            apparue trois fois, "50 coups" si cinquante coups de chaque camp ont été joués sans prise ni mouvement de
+            pion, sinon chaîne vide."""
+
+        if self.materiel_insuffisant():
+            return "matériel insuffisant"
+        if self.historique_positions[self.cle_zobrist] >= 3:
+            return "répétition"
+        if self.demi_coups >= 100:
+            return "50 coups"
+        return ""
+
+    def materiel_insuffisant(self):
+        """Vérifie, en temps constant à partir des comptes de matériel, qu'aucun camp ne peut plus mater:  roi contre
+        roi, roi et pièce mineure contre roi, ou seulement des fous, tous sur des cases de la même couleur.
+
+        Returns:
+            (bool):  True si le mat est impossible."""
+
+        materiel = self.materiel
+        for type_piece in (PION, TOUR, DAME):
+            if materiel[type_piece] or materiel[type_piece | NOIR]:
+                return False
+        cavaliers = materiel[CAVALIER] + materiel[CAVALIER | NOIR]
+        fous_sombres, fous_clairs = self.fous_par_couleur_de_case
+        if cavaliers + fous_sombres + fous_clairs <= 1:
+            return True
+        return not cavaliers and not (fous_sombres and fous_clairs)
+
+    def enregistrer_position(self):
+        """Compte une occurrence de la position actuelle dans l'historique et en garde un instantané, qui partage ses
+        rangées inchangées avec l'instantané précédent."""
+
+        self.historique_positions[self.cle_zobrist] += 1
+        self.instantanes.append(Instantane.depuis_echiquier(self, self.instantanes[-1] if self.instantanes else None))
+
+    def oublier_position(self):
+        """Retire de l'historique la dernière position enregistrée (à défaut, la position actuelle), avant
+        l'annulation du coup qui y a mené."""
+
+        cle = self.instantanes.pop().cle_zobrist if self.instantanes else self.cle_zobrist
+        if self.historique_positions[cle] > 1:
+            self.historique_positions[cle] -= 1
+        else:
+            self.historique_positions.pop(cle, None)
+
+    def revenir_au_demi_coup(self, demi_coup):
+        """Rétablit la position enregistrée après un demi-coup donné, et oublie les positions qui l'ont suivie.  Les
+        coups sont défaits un à un avec defaire_coup() tant que la pile des coups suit les instantanés;  sinon,
+        l'instantané est repris directement.
+
+        Args:
+            demi_coup (int):  L'indice de la position dans instantanes, 0 pour la position de départ.
+
+        Raises:
+            IndexError si aucune position n'a été enregistrée à ce demi-coup."""
+
+        if not 0 <= demi_coup < len(self.instantanes):
+            raise IndexError(demi_coup)
+        pile_alignee = len(self.pile_coups) == len(self.instantanes) - 1
+        while len(self.instantanes) > demi_coup + 1:
+            self.oublier_position()
+            if pile_alignee:
+                self.defaire_coup()
+        if not pile_alignee:
+            self.pile_coups = []
+        self.restaurer(self.instantanes[demi_coup])
+
+    def restaurer(self, instantane):
+        """Rétablit la position d'un instantané, en conservant l'historique des positions.  Seules les cases qui
+        diffèrent sont modifiées, ce qui met à jour les cartes de menaces et la clé de Zobrist sans reconstruire
+        l'échiquier.
+
+        Args:
+            instantane (Instantane):  La position à rétablir."""
+
+        for case, code in enumerate(instantane.cases()):
+            if code != self.cases[case]:
+                if code:
+                    self.poser_piece(case, PIECES_PAR_CODE[code])
+                else:
+                    self.retirer_piece(case)
+        if instantane.piece_a_bouge() != self.piece_a_bouge:
+            self.piece_a_bouge = instantane.piece_a_bouge()
+        self.pion_vient_de_sauter_une_case = instantane.pion_vient_de_sauter_une_case
+        self.trait = instantane.trait
+        self.demi_coups = instantane.demi_coups
+        assert self.cle_zobrist == instantane.cle_zobrist, "Instantané incohérent dans Echiquier.restaurer"
+
+    def reconstituer_historique(self, liste_coups):
+        """Reconstitue les instantanés d'une partie chargée d'un fichier, qui ne contient que la position finale et
+        la liste des coups.  La position de départ est retrouvée en défaisant les coups enregistrés, puis ils sont
+        rejoués avec faire_coup():  chaque demi-coup retrouve ses droits de roque et de prise en passant, et
+        l'annulation d'un coup passe ensuite par revenir_au_demi_coup().  Au départ, aucun roi ni aucune tour n'est
+        réputé avoir bougé.
+
+        Args:
+            liste_coups (list):  Les coups de la partie, tels que retournés par deplacer(), abandons compris.
+
+        Si les coups ne mènent pas à la position actuelle, l'échiquier reste dans sa position actuelle, sans
+        historique, avec les droits de roque et la prise en passant enregistrés avec le dernier coup.
+
+        Raises:
+            ValueError si les coups ne mènent pas à la position actuelle et que le dernier coup n'enregistre pas les
+            droits de roque."""
+
+        coups = [coup for coup in liste_coups if coup["special"] != "Abandon"]
+        position_finale, cases_finales, trait_final = dict(self.dictionnaire_pieces), list(self.cases), self.trait
+        droits_finaux, pion_final = dict(self.piece_a_bouge), self.pion_vient_de_sauter_une_case
+        demi_coups_final = self.demi_coups
+        try:
+            # Défaire les coups à partir de la position finale
+            pieces = dict(position_finale)
+            for coup in reversed(coups):
+                source, cible = coup["source"], coup["cible"]
+                piece_jouee = Constructeur_de_piece.convertir(coup["jouee"])
+                del pieces[cible]
+                pieces[source] = piece_jouee
+                if coup["prise"]:
+                    case_prise = cible[0] + source[1] if coup["special"] == "en passant" else cible
+                    pieces[case_prise] = Constructeur_de_piece.convertir(coup["prise"])
+                if "roque" in coup["special"]:
+                    depart_tour, arrivee_tour = self.parametres_du_roque(piece_jouee.couleur, coup["special"])
+                    pieces[depart_tour] = pieces.pop(arrivee_tour)
+
+            # Puis les rejouer depuis la position de départ
+            self.piece_a_bouge = {position: False for position in self.piece_a_bouge}
+            self.pion_vient_de_sauter_une_case = ""
+            if coups:
+                self.trait = INDEX_COULEURS[Constructeur_de_piece.convertir(coups[0]["jouee"]).couleur]
+            self.dictionnaire_pieces = pieces
+            if coups:
+                self.demi_coups = max(coups[0].get("demi coups", 0) - 1, 0)
+            self.enregistrer_position()
+            for coup in coups:
+                depart, arrivee, special = INDEX_CASES[coup["source"]], INDEX_CASES[coup["cible"]], coup["special"]
+                piece_jouee, promotion = self.objets[depart], None
+                if special.startswith("promotion"):
+                    promotion = Constructeur_de_piece.convertir(special[len("promotion"):] +
+                                                                ("B" if piece_jouee.couleur == "blanc" else "N"))
+                    special = ""
+                if self.faire_coup(depart, arrivee, special, promotion) is not None or piece_jouee.code & 7 == PION:
+                    self.demi_coups = 0
+                else:
+                    self.demi_coups += 1
+                self.enregistrer_position()
+            if self.cases != cases_finales or self.trait != trait_final:
+                raise ValueError("Les coups ne mènent pas à la position enregistrée")
+
+        except (KeyError, AssertionError, AttributeError, TypeError, ValueError) as erreur:
+            self.trait, self.piece_a_bouge, self.pion_vient_de_sauter_une_case = trait_final, droits_finaux, pion_final
+            self.dictionnaire_pieces = position_finale
+            self.demi_coups = demi_coups_final
+            dernier_coup = coups[-1] if coups else {}
+            if not dernier_coup.get("piece a bouge"):
+                raise ValueError(f"Historique impossible à reconstituer:  {erreur!r}") from erreur
+
+            # Les anciens fichiers notent la prise en passant dans un dictionnaire {position: bool}
+            pion_a_saute = dernier_coup.get("pion a saute") or ""
+            if isinstance(pion_a_saute, dict):
+                pion_a_saute = next((position for position, a_saute in pion_a_saute.items() if a_saute), "")
+            self.piece_a_bouge = dict(dernier_coup["piece a bouge"])
+            self.pion_vient_de_sauter_une_case = pion_a_saute
 
     # def roi_de_couleur_est_mat_2(self, couleur):
     #     """Vérifier si le roi de couleur donnée est mat.
@@ -710,6 +1677,12 @@ class Echiquier:
     #     # Échec et mat!
     #     return True
 
+    def roi_peut_roquer(self, couleur):
+        """Retourne True si le roi d'une couleur n'a pas encore bougé.  Les pièces étant partagées entre les
+        échiquiers, c'est l'échiquier, et non l'objet Roi, qui tient cet état."""
+
+        return not self.piece_a_bouge["e1" if couleur == "blanc" else "e8"]
+
     def parametres_du_roque(self, couleur, type_de_roque):
         """Retourne les positions départ et arrivée de la tour pour un roque demandé."""
 
@@ -739,9 +1712,10 @@ class Echiquier:
             "special":  "grand roque", "petit roque", "en passant", "promotion" ou ""
             "jouee":  Unicode de la pièce jouée
             "prise":  Unicode de la pièce prise, sinon ""
-            "resultat":  mat: "++" échec: "+" pat: "pat" sinon ""
+            "resultat":  mat: "++" échec: "+" pat: "pat" nulle: "répétition" ou "50 coups" sinon ""
             "pion a saute": contenu de la variable self.pion_vient_de_sauter_une_case (pour la prise en passant)
-            "piece a bouge": contenu de la variable self.piece_a_bouge (pour le roque)
+            "piece a bouge": copie de la variable self.piece_a_bouge (pour le roque)
+            "demi coups": contenu de la variable self.demi_coups (pour la règle des 50 coups)
 
         Raises:
             PychecsException si le déplacement n'est pas valide
@@ -755,7 +1729,8 @@ class Echiquier:
                       "prise" : "",
                       "resultat": "",
                       "pion a saute": None,
-                      "piece a bouge": None}
+                      "piece a bouge": None,
+                      "demi coups": 0}
         try:
             code_coup["special"] = self.deplacement_est_valide(position_source, position_cible)
             couleur_active = self.couleur_piece_a_position(position_source)
@@ -764,64 +1739,36 @@ class Echiquier:
         except PychecsException as erreur:
             raise erreur
 
-        # Déplacement valide:  modifier le dictionnaire des pièces et retourner le coup en notation algébrique
+        # Déplacement valide:  jouer le coup sur l'échiquier (la pile d'annulation conserve de quoi le défaire) et
+        # retourner le coup en notation algébrique
         else:
-            if not code_coup["special"]:
+            depart, arrivee = INDEX_CASES[position_source], INDEX_CASES[position_cible]
+            piece_jouee = self.objets[depart]
+            code_coup["jouee"] = str(piece_jouee)
 
-                # Mettre à jour la permission de roquer pour le roi, enregistrer l'état de cette permission dansle
-                # dictionnaire du coup
-                if position_source in self.piece_a_bouge.keys():
-                    self.piece_a_bouge[position_source] = True
-                    #if isinstance(self.piece_a_bouge[position_source], Roi):
-                    #    self.dictionnaire_pieces[position_source].peut_roquer = False
+            if "roque" in code_coup["special"]:
+                assert isinstance(piece_jouee, Roi), "On tente de roquer une autre pièce que le roi."
 
-                # Mettre à jour les pions pouvant être pris en passant, enregistrer l'état de cette permission dans
-                # le dictionnaire du coup joué
-                self.mettre_a_jour_pion_a_saute(position_source, position_cible)
+            # La position de départ n'entre dans l'historique qu'ici, une fois le trait et les droits de roque fixés
+            if not self.instantanes:
+                self.enregistrer_position()
 
-                # Retirer la pièce jouée de la case départ, et l'installer sur la case arrivée.
-                piece_jouee = self.dictionnaire_pieces.pop(position_source)
-                code_coup["jouee"] = str(piece_jouee)
+            # Le coup met aussi à jour les permissions de roquer et de prise en passant
+            piece_prise = self.faire_coup(depart, arrivee, code_coup["special"])
+            if piece_prise is not None:
+                code_coup["prise"] = str(piece_prise)
 
-                if not self.couleur_piece_a_position(position_cible):
-                    code_coup["prise"] = ""
-                else:
-                    code_coup["prise"] = str(self.dictionnaire_pieces.pop(position_cible))
-                self.dictionnaire_pieces[position_cible] = piece_jouee
-
-                # Vérifier si on doit faire la promotion du pion
-                if (isinstance(piece_jouee, Pion) and
-                    ((piece_jouee.couleur == "blanc")and (position_cible[1] == "8") or
-                    (piece_jouee.couleur == "noir") and (position_cible[1] == "1"))):
-                    code_coup["special"] = "promotion"
-
-            # Grand roque
-            if code_coup["special"] == "grand roque":
-                piece_jouee = self.dictionnaire_pieces.pop(position_source)
-                code_coup["jouee"] = str(piece_jouee)
-                assert isinstance(piece_jouee, Roi), "On tente de roquer une autre pièce que le roi."
-                piece_jouee.peut_roquer = False
-                self.dictionnaire_pieces[position_cible] = piece_jouee
-                position_initiale, position_finale = self.parametres_du_roque(piece_jouee.couleur, code_coup["special"])
-                self.dictionnaire_pieces[position_finale] = self.dictionnaire_pieces.pop(position_initiale)
-
-            # Petit roque
-            elif code_coup["special"] == "petit roque":
-                piece_jouee = self.dictionnaire_pieces.pop(position_source)
-                code_coup["jouee"] = str(piece_jouee)
-                assert isinstance(piece_jouee, Roi), "On tente de roquer une autre pièce que le roi."
-                piece_jouee.peut_roquer = False
-                self.dictionnaire_pieces[position_cible] = piece_jouee
-                position_initiale, position_finale = self.parametres_du_roque(piece_jouee.couleur, code_coup["special"])
-                self.dictionnaire_pieces[position_finale] = self.dictionnaire_pieces.pop(position_initiale)
-
-            # Prise en passant
-            elif code_coup["special"] == "en passant":
-                piece_jouee = self.dictionnaire_pieces.pop(position_source)
-                code_coup["jouee"] = str(piece_jouee)
-                position_prise = position_cible[0] + position_source[1]
-                code_coup["prise"] = str(self.dictionnaire_pieces.pop(position_prise))
-                self.dictionnaire_pieces[position_cible] = piece_jouee
+            # Une prise ou un coup de pion remet à zéro le compte de la règle des 50 coups
+            if piece_prise is not None or piece_jouee.code & 7 == PION:
+                self.demi_coups = 0
+            else:
+                self.demi_coups += 1
+            self.enregistrer_position()
+
+            # Vérifier si on doit faire la promotion du pion
+            if (not code_coup["special"] and piece_jouee.code & 7 == PION and
+                    rangee_de(arrivee) == RANGEE_PROMOTION_PION[piece_jouee.code >> 3]):
+                code_coup["special"] = "promotion"
 
         # Verifier le résultat du coup sur le roi adverse
         code_coup["resultat"] = self.resultat_du_coup(self.couleur_adversaire(couleur_active))
@@ -830,9 +1777,10 @@ class Echiquier:
         #if self.roi_de_couleur_est_pat(couleur_active):
         #   code_coup["resultat"] = "pat"
 
-        # Enregistrer les autorisations à jour pour les coups spéciaux: roque et prise en passant
-        code_coup["piece a bouge"] = self.piece_a_bouge
+        # Les droits de roque sont recopiés:  faire_coup() modifie self.piece_a_bouge sur place
+        code_coup["piece a bouge"] = dict(self.piece_a_bouge)
         code_coup["pion a saute"] = self.pion_vient_de_sauter_une_case
+        code_coup["demi coups"] = self.demi_coups
 
         print(code_coup)
         return code_coup
@@ -872,10 +1820,7 @@ class Echiquier:
             bool: True si un roi de cette couleur est dans l'échiquier, et False autrement.
 
         """
-        for piece_sur_echiquier in self.dictionnaire_pieces.values():
-            if isinstance(piece_sur_echiquier, Roi) and piece_sur_echiquier.couleur == couleur:
-                return True
-        return False
+        return self.cases_des_rois[INDEX_COULEURS[couleur]] is not None
 
     def initialiser_echiquier_depart(self):
         """Initialise l'échiquier à son contenu initial. Pour faire vos tests pendant le développement,
@@ -1162,9 +2107,294 @@ if __name__ == '__main__':
     def test_prise_en_passant():
         obj = Echiquier({"e5": Pion("blanc"),
                          "d5": Pion("noir")})
-        obj.pion_vient_de_sauter_une_case["d5"] = True
+        obj.pion_vient_de_sauter_une_case = "d5"
         assert obj.prise_en_passant_autorisee("e5", "d6")
 
+    def test_faire_et_defaire_coup():
+        obj = Echiquier()
+        cases, droits = list(obj.cases), dict(obj.piece_a_bouge)
+        for source, cible in [("e2", "e4"), ("d7", "d5"), ("e4", "d5"), ("d8", "d5"), ("g1", "f3"), ("d5", "a2")]:
+            obj.faire_coup(INDEX_CASES[source], INDEX_CASES[cible])
+        obj.faire_coup(INDEX_CASES["e1"], INDEX_CASES["e2"])
+        assert obj.piece_a_bouge["e1"]
+        while obj.pile_coups:
+            obj.defaire_coup()
+        assert obj.cases == cases and obj.piece_a_bouge == droits and obj.pion_vient_de_sauter_une_case == ""
+
+        # La prise en passant qui découvre le roi est refusée
+        obj = Echiquier({"a5": Roi("blanc"), "b5": Pion("blanc"), "c5": Pion("noir"), "h5": Tour("noir"),
+                         "e8": Roi("noir")})
+        obj.pion_vient_de_sauter_une_case = "c5"
+        try:
+            obj.deplacement_est_valide("b5", "c6")
+        except CouleurSeMetElleMemeEnEchecException:
+            pass
+        else:
+            raise Exception
+
+        # Le grand roque est permis même si b1 est attaquée, et la tour suit le roi
+        obj = Echiquier({"e1": Roi("blanc"), "a1": Tour("blanc"), "b8": Tour("noir"), "e8": Roi("noir")})
+        assert obj.deplacer("e1", "c1")["special"] == "grand roque"
+        assert str(obj.recuperer_piece_a_position("d1")) == str(Tour("blanc"))
+        assert obj.cases_des_rois == [INDEX_CASES["c1"], INDEX_CASES["e8"]]
+        obj.defaire_coup()
+        assert obj.recuperer_piece_a_position("a1") is not None and not obj.piece_a_bouge["e1"]
+        assert obj.position_du_roi_de_couleur("blanc") == "e1"
+
+        # La vue dictionnaire tient aussi la case des rois à jour
+        del obj.dictionnaire_pieces["e8"]
+        assert not obj.roi_de_couleur_est_dans_echiquier("noir")
+        obj.dictionnaire_pieces["g8"] = Roi("noir")
+        assert obj.position_du_roi_de_couleur("noir") == "g8"
+
+    def test_coups_legaux():
+        # Le fou e2 est cloué par la tour e8:  il ne peut pas bouger.  Le fou b4 fait échec:  le cavalier peut le
+        # prendre ou s'interposer en c3, le roi ne peut pas aller en d2.
+        obj = Echiquier({"e1": Roi("blanc"), "e2": Fou("blanc"), "e8": Tour("noir"), "b4": Fou("noir"),
+                         "a2": Cavalier("blanc"), "h8": Roi("noir")})
+        coups = {(source, cible) for source, cible, special in obj.mouvements_possibles_de_couleur("blanc")}
+        assert not [coup for coup in coups if coup[0] == "e2"]
+        assert ("a2", "b4") in coups and ("e1", "d2") not in coups and ("e1", "f1") in coups
+        assert ("a2", "c3") in coups and ("a2", "c1") not in coups
+
+    def test_verifier_deplacement():
+        obj = Echiquier()
+        assert obj.verifier_deplacement("e2", "e4") == (StatutDeplacement.VALIDE, "")
+        assert obj.verifier_deplacement("e3", "e4")[0] == StatutDeplacement.CASE_DEPART_VIDE
+        assert obj.verifier_deplacement("e2", "e9")[0] == StatutDeplacement.CASE_INEXISTANTE
+        assert obj.verifier_deplacement("e2", "e5")[0] == StatutDeplacement.DEPLACEMENT_IMPOSSIBLE
+        assert obj.verifier_deplacement("a1", "a2")[0] == StatutDeplacement.CASE_ARRIVEE_OCCUPEE
+        assert obj.verifier_deplacement("c1", "e3")[0] == StatutDeplacement.CHEMIN_BLOQUE
+
+        obj = Echiquier({"e1": Roi("blanc"), "h1": Tour("blanc"), "e2": Fou("blanc"), "e8": Tour("noir"),
+                         "a8": Roi("noir")})
+        assert obj.verifier_deplacement("e1", "g1") == (StatutDeplacement.VALIDE, "petit roque")
+        obj.piece_a_bouge = dict(obj.piece_a_bouge, h1=True)
+        assert obj.verifier_deplacement("e1", "g1")[0] == StatutDeplacement.ROQUE_NON_AUTORISE
+        assert obj.verifier_deplacement("e2", "d3")[0] == StatutDeplacement.SE_MET_EN_ECHEC
+        try:
+            obj.deplacement_est_valide("e2", "d3")
+        except CouleurSeMetElleMemeEnEchecException:
+            pass
+        else:
+            raise Exception
+
+    def test_valider_lot():
+        # Le fou e2 est cloué, le roi ne peut aller en d2 attaquée par le fou b4, et le cavalier doit parer l'échec.
+        obj = Echiquier({"e1": Roi("blanc"), "e2": Fou("blanc"), "e8": Tour("noir"), "b4": Fou("noir"),
+                         "a2": Cavalier("blanc"), "h8": Roi("noir")})
+        coups = [("e2", "d3"), ("e1", "d2"), ("e1", "f1"), ("a2", "c3"), ("a2", "c1"), ("a2", "a3"), ("h8", "h7")]
+        statuts = [statut for statut, special in obj.valider_lot(coups)]
+        assert statuts == [StatutDeplacement.SE_MET_EN_ECHEC, StatutDeplacement.SE_MET_EN_ECHEC,
+                           StatutDeplacement.VALIDE, StatutDeplacement.VALIDE, StatutDeplacement.SE_MET_EN_ECHEC,
+                           StatutDeplacement.DEPLACEMENT_IMPOSSIBLE, StatutDeplacement.VALIDE]
+        assert statuts == [obj.verifier_deplacement(source, cible)[0] for source, cible in coups]
+
+    def test_partie_nulle():
+        # Les cavaliers font deux fois l'aller-retour:  la position de départ revient une troisième fois
+        obj = Echiquier()
+        aller_retour = [("g1", "f3"), ("g8", "f6"), ("f3", "g1"), ("f6", "g8")]
+        for source, cible in aller_retour + aller_retour[:3]:
+            assert obj.deplacer(source, cible)["resultat"] == ""
+        assert obj.deplacer("f6", "g8")["resultat"] == "répétition"
+        assert obj.historique_positions[obj.cle_zobrist] == 3 and obj.demi_coups == 8
+
+        obj.oublier_position()
+        assert obj.partie_nulle() == ""
+
+        # Un coup de pion remet le compte à zéro
+        assert obj.deplacer("e2", "e4")["demi coups"] == 0
+
+        # La position qui suit 1. e4 revient deux fois:  aucun pion noir ne pouvant prendre e4 en passant, sa première
+        # occurrence compte comme les suivantes
+        obj = Echiquier()
+        obj.deplacer("e2", "e4")
+        aller_retour = [("g8", "f6"), ("g1", "f3"), ("f6", "g8"), ("f3", "g1")]
+        for source, cible in aller_retour + aller_retour[:3]:
+            assert obj.deplacer(source, cible)["resultat"] == ""
+        assert obj.deplacer("f3", "g1")["resultat"] == "répétition"
+        assert obj.historique_positions[obj.cle_zobrist] == 3
+
+        obj = Echiquier({"e1": Roi("blanc"), "a2": Tour("blanc"), "h8": Roi("noir")})
+        obj.demi_coups = 98
+        assert obj.deplacer("a2", "a3")["resultat"] == ""
+        assert obj.deplacer("h8", "h7")["resultat"] == "50 coups"
+
+        # Le mat l'emporte sur la règle des 50 coups
+        obj = Echiquier({"g6": Roi("blanc"), "a2": Tour("blanc"), "h8": Roi("noir")})
+        obj.demi_coups = 99
+        assert obj.deplacer("a2", "a8")["resultat"] == "++"
+
+    def test_materiel_insuffisant():
+        obj = Echiquier({"e1": Roi("blanc"), "e8": Roi("noir"), "c1": Fou("blanc"), "f8": Fou("noir")})
+        assert obj.materiel_insuffisant() and obj.fous_par_couleur_de_case == [2, 0]
+        assert obj.resultat_du_coup("noir") == "matériel insuffisant"
+
+        # Des fous de couleurs différentes, ou un cavalier de plus, permettent encore un mat
+        obj.dictionnaire_pieces["c8"] = Fou("noir")
+        assert not obj.materiel_insuffisant()
+        del obj.dictionnaire_pieces["c8"]
+        obj.dictionnaire_pieces["b1"] = Cavalier("blanc")
+        assert not obj.materiel_insuffisant()
+
+        # Le roi prend la dernière tour:  la partie se termine aussitôt
+        obj = Echiquier({"e1": Roi("blanc"), "e8": Roi("noir"), "e2": Tour("noir"), "b1": Cavalier("blanc")})
+        assert obj.materiel[TOUR | NOIR] == 1 and not obj.materiel_insuffisant()
+        assert obj.deplacer("e1", "e2")["resultat"] == "matériel insuffisant"
+        assert obj.materiel == Echiquier({"e1": Roi("blanc"), "e8": Roi("noir"), "b1": Cavalier("blanc")}).materiel
+
+    def test_instantanes():
+        obj = Echiquier()
+        coups = [("e2", "e4"), ("e7", "e5"), ("g1", "f3"), ("b8", "c6"), ("f1", "c4"), ("g8", "f6"), ("e1", "g1")]
+        positions = [list(obj.cases)]
+        for source, cible in coups:
+            obj.deplacer(source, cible)
+            positions.append(list(obj.cases))
+        assert len(obj.instantanes) == 8 and not obj.roi_peut_roquer("blanc")
+
+        # Retour direct à la position après 1. e4 e5, puis annulation d'un seul demi-coup
+        obj.revenir_au_demi_coup(2)
+        assert obj.cases == positions[2] and obj.roi_peut_roquer("blanc") and obj.trait == 0
+        assert sum(obj.historique_positions.values()) == 3 and obj.cle_zobrist == obj.calculer_cle_zobrist()
+        obj.revenir_au_demi_coup(1)
+        assert obj.cases == positions[1] and obj.pion_vient_de_sauter_une_case == "e4" and obj.trait == 1
+        obj.deplacer("e7", "e5")
+        assert obj.cases == positions[2] and obj.historique_positions[obj.cle_zobrist] == 1
+        try:
+            obj.revenir_au_demi_coup(3)
+        except IndexError:
+            pass
+        else:
+            raise Exception
+
+    def test_annulation_sans_reconstruction():
+        class EchiquierSurveille(Echiquier):
+            reconstructions = 0
+
+            @Echiquier.dictionnaire_pieces.setter
+            def dictionnaire_pieces(self, dictionnaire):
+                EchiquierSurveille.reconstructions += 1
+                Echiquier.dictionnaire_pieces.fset(self, dictionnaire)
+
+        # Une promotion faite comme dans l'interface:  la dame remplace le pion après le coup
+        obj = EchiquierSurveille({"e1": Roi("blanc"), "e8": Roi("noir"), "b7": Pion("blanc"), "h7": Pion("noir")})
+        obj.deplacer("e1", "d1")
+        obj.deplacer("h7", "h5")
+        positions = [list(instantane.cases()) for instantane in obj.instantanes]
+        obj.deplacer("b7", "b8")
+        obj.oublier_position()
+        obj.dictionnaire_pieces["b8"] = Dame("blanc")
+        obj.enregistrer_position()
+        obj.deplacer("e8", "e7")
+        reconstructions = EchiquierSurveille.reconstructions
+
+        # Les coups sont défaits un à un:  l'échiquier n'est jamais reconstruit
+        obj.revenir_au_demi_coup(2)
+        assert obj.cases == positions[2] and obj.pion_vient_de_sauter_une_case == "h5" and obj.trait == 0
+        obj.revenir_au_demi_coup(0)
+        assert obj.cases == positions[0] and obj.roi_peut_roquer("blanc") and not obj.pile_coups
+        assert obj.cle_zobrist == obj.calculer_cle_zobrist()
+        assert EchiquierSurveille.reconstructions == reconstructions
+
+    def test_reconstituer_historique():
+        import json
+
+        # Une partie avec prise en passant et roque, sauvegardée comme le fait le contrôleur de partie
+        obj = Echiquier()
+        coups = [("e2", "e4"), ("a7", "a6"), ("e4", "e5"), ("d7", "d5"), ("e5", "d6"), ("e7", "d6"), ("g1", "f3"),
+                 ("g8", "f6"), ("f1", "e2"), ("f8", "e7"), ("e1", "f1"), ("e8", "g8")]
+        liste = json.loads(json.dumps([obj.deplacer(source, cible) for source, cible in coups]))
+        assert liste[4]["special"] == "en passant" and liste[-1]["special"] == "petit roque"
+        positions = [instantane.cle_zobrist for instantane in obj.instantanes]
+        dictionnaire = {position: str(piece) for position, piece in obj.dictionnaire_pieces.items()}
+        dictionnaire = json.loads(json.dumps(dictionnaire))
+
+        # Au chargement, seule la position finale est connue
+        chargee = Echiquier(Constructeur_de_piece.charger_dictionnaire(dictionnaire))
+        chargee.trait = 0
+        chargee.reconstituer_historique(liste + [{"special": "Abandon", "resultat": ""}])
+        assert [instantane.cle_zobrist for instantane in chargee.instantanes] == positions
+        assert chargee.cases == obj.cases and chargee.cle_zobrist == chargee.calculer_cle_zobrist()
+        assert not chargee.roi_peut_roquer("blanc") and not chargee.roi_peut_roquer("noir")
+
+        # Annuler le roque noir et le coup du roi blanc:  les blancs peuvent de nouveau roquer
+        chargee.revenir_au_demi_coup(len(chargee.instantanes) - 3)
+        assert chargee.trait == 0 and chargee.roi_peut_roquer("blanc")
+        assert chargee.deplacer("e1", "g1")["special"] == "petit roque"
+
+        # Une liste qui ne mène pas à la position laisse l'échiquier dans sa position, sans historique, avec les
+        # droits de roque et la prise en passant du dernier coup
+        chargee = Echiquier(Constructeur_de_piece.charger_dictionnaire(dictionnaire))
+        chargee.trait = 0
+        chargee.reconstituer_historique(liste[:-1])
+        assert not chargee.instantanes and chargee.cases == obj.cases
+        assert chargee.piece_a_bouge == liste[-2]["piece a bouge"] and chargee.roi_peut_roquer("noir")
+        assert chargee.cle_zobrist == chargee.calculer_cle_zobrist()
+
+        # Sans droits de roque enregistrés, la liste est refusée et l'échiquier reste intact
+        chargee = Echiquier(Constructeur_de_piece.charger_dictionnaire(dictionnaire))
+        cle = chargee.cle_zobrist
+        try:
+            chargee.reconstituer_historique([dict(coup, **{"piece a bouge": None}) for coup in liste[:-1]])
+        except ValueError:
+            pass
+        else:
+            raise Exception
+        assert chargee.cle_zobrist == cle and not chargee.instantanes and chargee.cases == obj.cases
+
+    def test_cle_zobrist():
+        # Les cavaliers qui reviennent à leur case retrouvent la clé de départ;  un roi qui fait de même a perdu ses
+        # droits de roque et la clé diffère.
+        obj = Echiquier()
+        cle_depart = obj.cle_zobrist
+        for source, cible in [("g1", "f3"), ("g8", "f6"), ("f3", "g1"), ("f6", "g8")]:
+            obj.faire_coup(INDEX_CASES[source], INDEX_CASES[cible])
+            assert obj.cle_zobrist == obj.calculer_cle_zobrist()
+        assert obj.cle_zobrist == cle_depart
+        for source, cible in [("e2", "e4"), ("e7", "e5"), ("e1", "e2"), ("e8", "e7"), ("e2", "e1"), ("e7", "e8")]:
+            obj.faire_coup(INDEX_CASES[source], INDEX_CASES[cible])
+            assert obj.cle_zobrist == obj.calculer_cle_zobrist()
+        assert obj.cle_zobrist != cle_depart
+        while obj.pile_coups:
+            obj.defaire_coup()
+        assert obj.cle_zobrist == cle_depart
+
+        # Le pion qui vient de sauter ne fait partie de la clé que si un pion adverse peut le prendre en passant
+        obj.faire_coup(INDEX_CASES["e2"], INDEX_CASES["e4"])
+        cle = obj.cle_zobrist
+        obj.pion_vient_de_sauter_une_case = ""
+        assert obj.cle_zobrist == cle and obj.cle_zobrist == obj.calculer_cle_zobrist()
+        for source, cible in [("a7", "a6"), ("e4", "e5"), ("f7", "f5")]:
+            obj.faire_coup(INDEX_CASES[source], INDEX_CASES[cible])
+        cle = obj.cle_zobrist
+        obj.pion_vient_de_sauter_une_case = ""
+        assert obj.cle_zobrist != cle and obj.cle_zobrist == obj.calculer_cle_zobrist()
+        obj.defaire_coup()
+        obj.faire_coup(INDEX_CASES["f7"], INDEX_CASES["f5"])
+        assert obj.cle_zobrist == cle
+
+        # Le trait aussi
+        obj.trait = 1
+        assert obj.cle_zobrist != cle and obj.cle_zobrist == obj.calculer_cle_zobrist()
+
+    def test_cache_des_coups():
+        obj = Echiquier()
+        assert len(obj.mouvements_possibles_de_couleur("blanc")) == 20
+        assert obj.resultat_du_coup("blanc") == "" and obj.cache_coups.succes == 1
+        obj.faire_coup(INDEX_CASES["e2"], INDEX_CASES["e4"])
+        assert len(obj.mouvements_possibles_de_couleur("blanc")) == 30
+        obj.defaire_coup()
+        assert sorted(obj.mouvements_possibles_de_la_piece("g1")) == [("f3", ""), ("h3", "")]
+        assert obj.cache_coups.succes == 2 and obj.cache_coups.defauts == 2
+
+        # Au-delà de sa capacité, le cache oublie la position la moins récemment consultée
+        cache = CacheLRU(2)
+        cache.ajouter("a", 1)
+        cache.ajouter("b", 2)
+        cache.obtenir("a")
+        cache.ajouter("c", 3)
+        assert "a" in cache and "b" not in cache and len(cache) == 2
+
     def test_roi_de_couleur_est_pat():
         obj = Echiquier({"a8": Roi("noir", False),
                          "b6": Dame("blanc")})
@@ -1203,6 +2433,7 @@ if __name__ == '__main__':
 
     # Exemple de __main__ qui crée un nouvel échiquier, puis l'affiche à l'éran. Vous pouvez ajouter des instructions ici
     # pour tester votre échiquier, mais n'oubliez pas que le programme principal est démarré en exécutant __main__.py.
+    Echiquier.verifier_cases_des_rois = True
     test_couleur_adversaire()
     test_cases_entre_positions()
     test_chemin_libre_entre_positions()
@@ -1214,5 +2445,16 @@ if __name__ == '__main__':
     test_roi_de_couleur_est_mat()
     test_mat_anormal()
     test_prise_en_passant()
+    test_faire_et_defaire_coup()
+    test_coups_legaux()
+    test_verifier_deplacement()
+    test_valider_lot()
+    test_partie_nulle()
+    test_materiel_insuffisant()
+    test_instantanes()
+    test_annulation_sans_reconstruction()
+    test_reconstituer_historique()
+    test_cle_zobrist()
+    test_cache_des_coups()
     test_roi_de_couleur_est_pat()
 
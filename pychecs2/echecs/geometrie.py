@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Module contenant la géométrie de l'échiquier, calculée une fois pour toutes au chargement du module.
+
+Les cases sont numérotées de 0 à 63:  l'indice d'une case est rangee * 8 + colonne, où la rangée et la colonne sont
+comptées à partir de zéro.  Ainsi 'a1' a l'indice 0, 'h1' l'indice 7, 'a2' l'indice 8 et 'h8' l'indice 63.  Toutes les
+tables ci-dessous sont indexées par ces entiers, ce qui évite de manipuler des chaînes de caractères pendant la
+validation et la génération des coups.
+
+"""
+from pychecs2.echecs.piece import PION, CAVALIER, FOU, TOUR, DAME, ROI, NOIR
+
+LETTRES_COLONNES = "abcdefgh"
+CHIFFRES_RANGEES = "12345678"
+
+# Conversion entre le nom d'une case et son indice
+NOMS_CASES = tuple(LETTRES_COLONNES[indice % 8] + CHIFFRES_RANGEES[indice // 8] for indice in range(64))
+INDEX_CASES = {nom: indice for indice, nom in enumerate(NOMS_CASES)}
+
+# Couleurs, dans l'ordre de leur indice:  l'indice d'une couleur est aussi le bit NOIR d'un code de pièce, décalé.
+COULEURS = ("blanc", "noir")
+INDEX_COULEURS = {"blanc": 0, "noir": 1}
+
+
+def indice(colonne, rangee):
+    """Retourne l'indice de la case de coordonnées (colonne, rangée), comptées à partir de zéro, ou None si ces
+    coordonnées sont hors de l'échiquier."""
+
+    if 0 <= colonne < 8 and 0 <= rangee < 8:
+        return rangee * 8 + colonne
+    return None
+
+
+def colonne_de(case):
+    """Retourne la colonne (de 0 à 7) d'une case donnée par son indice."""
+
+    return case & 7
+
+
+def rangee_de(case):
+    """Retourne la rangée (de 0 à 7) d'une case donnée par son indice."""
+
+    return case >> 3
+
+
+def couleur_du_code(code):
+    """Retourne l'indice de la couleur (0 pour blanc, 1 pour noir) d'un code de pièce non vide."""
+
+    return code >> 3
+
+
+def type_du_code(code):
+    """Retourne le type de pièce (PION, CAVALIER, etc.) d'un code de pièce."""
+
+    return code & 7
+
+
+def _cases_atteintes(case, decalages):
+    """Tuple des cases atteintes depuis case par des sauts de longueur fixe."""
+
+    cases = (indice(colonne_de(case) + delta_colonne, rangee_de(case) + delta_rangee)
+             for delta_colonne, delta_rangee in decalages)
+    return tuple(cible for cible in cases if cible is not None)
+
+
+def _rayon(case, direction):
+    """Tuple ordonné des cases rencontrées en glissant depuis case dans une direction, jusqu'au bord."""
+
+    cases = []
+    for distance in range(1, 8):
+        cible = indice(colonne_de(case) + distance * direction[0], rangee_de(case) + distance * direction[1])
+        if cible is None:
+            break
+        cases.append(cible)
+    return tuple(cases)
+
+
+# Les huit directions, désignées par leur rang dans ce tuple:  les quatre premières sont celles de la tour, les quatre
+# suivantes celles du fou.
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, -1), (-1, 1))
+DIRECTIONS_TOUR = (0, 1, 2, 3)
+DIRECTIONS_FOU = (4, 5, 6, 7)
+DIRECTIONS_GLISSANTES = {TOUR: DIRECTIONS_TOUR, FOU: DIRECTIONS_FOU, DAME: DIRECTIONS_TOUR + DIRECTIONS_FOU}
+
+# Pour chaque direction, les types de pièces qui glissent dans cette direction (et peuvent donc clouer ou faire échec
+# de loin le long de celle-ci).
+DIRECTIONS_CLOUEUSES = tuple(frozenset(type_piece for type_piece, directions in DIRECTIONS_GLISSANTES.items()
+                                       if direction in directions) for direction in range(len(DIRECTIONS)))
+
+DECALAGES_CAVALIER = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+
+SAUTS_CAVALIER = tuple(_cases_atteintes(case, DECALAGES_CAVALIER) for case in range(64))
+SAUTS_ROI = tuple(_cases_atteintes(case, DIRECTIONS) for case in range(64))
+
+# Prises du pion, par indice de couleur puis par case
+PRISES_PION = (tuple(_cases_atteintes(case, ((-1, 1), (1, 1))) for case in range(64)),
+               tuple(_cases_atteintes(case, ((-1, -1), (1, -1))) for case in range(64)))
+
+# Progression du pion, par indice de couleur:  sens de la marche (en indices), rangée de départ et rangée de promotion
+AVANCE_PION = (8, -8)
+RANGEE_DEPART_PION = (1, 6)
+RANGEE_PROMOTION_PION = (7, 0)
+
+# COULEUR_CASE[case]:  0 pour une case sombre (comme a1), 1 pour une case claire
+COULEUR_CASE = tuple((case // 8 + case % 8) & 1 for case in range(64))
+
+# RAYONS[case][direction]:  les cases rencontrées depuis case dans cette direction, de la plus proche à la plus loin.
+RAYONS = tuple(tuple(_rayon(case, direction) for direction in DIRECTIONS) for case in range(64))
+
+# DIRECTION_VERS[case]:  pour chaque case alignée avec case, la direction dans laquelle elle se trouve.
+DIRECTION_VERS = tuple({cible: direction for direction, rayon in enumerate(RAYONS[case]) for cible in rayon}
+                       for case in range(64))
+
+
+def _deplacements_pion(couleur, case):
+    """Cases où un pion peut avancer sans prendre, sans tenir compte des autres pièces."""
+
+    if rangee_de(case) == RANGEE_PROMOTION_PION[couleur]:
+        return ()
+    cases = (case + AVANCE_PION[couleur],)
+    if rangee_de(case) == RANGEE_DEPART_PION[couleur]:
+        cases += (case + 2 * AVANCE_PION[couleur],)
+    return cases
+
+
+def _portee_geometrique(type_piece, case):
+    """Cases atteintes par une pièce sur un échiquier vide."""
+
+    if type_piece == CAVALIER:
+        return SAUTS_CAVALIER[case]
+    if type_piece == ROI:
+        return SAUTS_ROI[case]
+    return tuple(cible for direction in DIRECTIONS_GLISSANTES[type_piece] for cible in RAYONS[case][direction])
+
+
+# DEPLACEMENTS[code][case] et PRISES[code][case]:  les cases qu'une pièce peut atteindre selon ses propres règles,
+# sur un échiquier vide, respectivement pour un simple déplacement et pour une prise.  Seul le pion distingue les deux.
+DEPLACEMENTS = {}
+PRISES = {}
+for _couleur in range(2):
+    for _type_piece in (PION, CAVALIER, FOU, TOUR, DAME, ROI):
+        _code = _type_piece | (NOIR * _couleur)
+        if _type_piece == PION:
+            DEPLACEMENTS[_code] = tuple(frozenset(_deplacements_pion(_couleur, case)) for case in range(64))
+            PRISES[_code] = tuple(frozenset(PRISES_PION[_couleur][case]) for case in range(64))
+        else:
+            DEPLACEMENTS[_code] = PRISES[_code] = tuple(frozenset(_portee_geometrique(_type_piece, case))
+                                                        for case in range(64))
+
+
+def _entre(depart, arrivee):
+    """Cases situées strictement entre deux cases alignées, dans l'ordre à partir de depart."""
+
+    direction = DIRECTION_VERS[depart].get(arrivee)
+    if direction is None:
+        return ()
+    rayon = RAYONS[depart][direction]
+    return rayon[:rayon.index(arrivee)]
+
+
+def _symboles_entre(symboles, debut, fin):
+    """Tuple des rangées (ou colonnes) strictement entre debut et fin, dans l'ordre à partir de debut."""
+
+    indice_debut, indice_fin = symboles.index(debut), symboles.index(fin)
+    sens = 1 if indice_fin >= indice_debut else -1
+    return tuple(symboles[indice_debut + sens:indice_fin:sens])
+
+
+# Tables de toutes les paires de cases, indexées [depart][arrivee]:
+#   ENTRE:  les cases strictement entre les deux, à partir de depart (tuple vide si adjacentes ou non alignées);
+#   DIRECTION_ENTRE:  la direction dans laquelle se trouve arrivee vue de depart, ou None si elles ne sont pas alignées;
+#   ALIGNEES:  True si les deux cases sont sur une même rangée, colonne ou diagonale.
+ENTRE = tuple(tuple(_entre(depart, arrivee) for arrivee in range(64)) for depart in range(64))
+DIRECTION_ENTRE = tuple(tuple(DIRECTION_VERS[depart].get(arrivee) for arrivee in range(64)) for depart in range(64))
+ALIGNEES = tuple(tuple(direction is not None for direction in directions) for directions in DIRECTION_ENTRE)
+
+# Les mêmes tables pour les noms de cases, de rangées et de colonnes, utilisées par les méthodes qui reçoivent des
+# chaînes de caractères:  CASES_ENTRE[source][cible], RANGEES_ENTRE[debut, fin] et COLONNES_ENTRE[debut, fin].
+CASES_ENTRE = {NOMS_CASES[depart]: {NOMS_CASES[arrivee]: tuple(NOMS_CASES[case] for case in ENTRE[depart][arrivee])
+                                    for arrivee in range(64)}
+               for depart in range(64)}
+RANGEES_ENTRE = {(debut, fin): _symboles_entre(CHIFFRES_RANGEES, debut, fin)
+                 for debut in CHIFFRES_RANGEES for fin in CHIFFRES_RANGEES}
+COLONNES_ENTRE = {(debut, fin): _symboles_entre(LETTRES_COLONNES, debut, fin)
+                  for debut in LETTRES_COLONNES for fin in LETTRES_COLONNES}
+
+
+def cases_entre(depart, arrivee):
+    """Retourne les cases situées strictement entre deux cases alignées, dans l'ordre à partir de depart.  Retourne un
+    tuple vide si les cases sont adjacentes ou ne sont pas alignées."""
+
+    return ENTRE[depart][arrivee]
+
+
+if __name__ == '__main__':
+    assert NOMS_CASES[0] == "a1" and NOMS_CASES[7] == "h1" and NOMS_CASES[8] == "a2" and NOMS_CASES[63] == "h8"
+    assert all(INDEX_CASES[NOMS_CASES[case]] == case for case in range(64))
+    assert sorted(NOMS_CASES[case] for case in SAUTS_CAVALIER[INDEX_CASES["b1"]]) == ["a3", "c3", "d2"]
+    assert len(SAUTS_ROI[INDEX_CASES["e4"]]) == 8
+    assert [NOMS_CASES[case] for case in cases_entre(INDEX_CASES["a1"], INDEX_CASES["e5"])] == ["b2", "c3", "d4"]
+    assert [NOMS_CASES[case] for case in cases_entre(INDEX_CASES["f7"], INDEX_CASES["f1"])] == ["f6", "f5", "f4", "f3",
+                                                                                               "f2"]
+    assert cases_entre(INDEX_CASES["d6"], INDEX_CASES["g7"]) == ()
+    assert INDEX_CASES["e4"] in DEPLACEMENTS[PION][INDEX_CASES["e2"]]
+    assert INDEX_CASES["e5"] in DEPLACEMENTS[PION | NOIR][INDEX_CASES["e7"]]
+    assert INDEX_CASES["d3"] in PRISES[PION][INDEX_CASES["e2"]]
+    assert ENTRE[INDEX_CASES["h8"]][INDEX_CASES["a1"]] == tuple(range(54, 0, -9))
+    assert DIRECTION_ENTRE[INDEX_CASES["a1"]][INDEX_CASES["a8"]] == 0 and not ALIGNEES[INDEX_CASES["a1"]][INDEX_CASES["b3"]]
+    assert COULEUR_CASE[INDEX_CASES["a1"]] == COULEUR_CASE[INDEX_CASES["h8"]] == 0 and COULEUR_CASE[INDEX_CASES["h1"]] == 1
+    assert RANGEES_ENTRE["8", "3"] == ("7", "6", "5", "4") and COLONNES_ENTRE["b", "c"] == ()
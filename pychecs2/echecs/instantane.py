@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Module contenant la classe Instantane, une photographie immuable d'une position d'échecs.
+
+Les instantanés successifs d'une partie partagent leur structure:  les codes des cases sont rangés en huit rangées
+immuables, et une rangée que le coup n'a pas modifiée est reprise telle quelle de l'instantané précédent, tout comme
+les droits de roque lorsqu'ils n'ont pas changé.  Un coup ordinaire n'ajoute donc qu'une ou deux rangées de huit codes,
+et conserver un instantané par demi-coup ne coûte presque rien, même pour une longue partie.
+
+"""
+from pychecs2.echecs.geometrie import NOMS_CASES
+from pychecs2.echecs.piece import PIECES_PAR_CODE
+
+# Ordre des cases de roi et de tour dans Instantane.droits
+POSITIONS_DES_DROITS = ("e1", "e8", "a1", "a8", "h1", "h8")
+
+
+class Instantane:
+    """Photographie immuable d'une position:  les pièces, le trait, les droits de roque, la prise en passant et le
+    compte de la règle des 50 coups.
+
+    Attributes:
+        rangees (tuple):  Les huit rangées, de la première à la huitième, chacune un tuple des codes de ses huit cases.
+        trait (int):  Le camp qui doit jouer (0 pour blanc, 1 pour noir).
+        droits (tuple):  Pour chaque position de POSITIONS_DES_DROITS, True si la pièce qui s'y trouvait a bougé.
+        pion_vient_de_sauter_une_case (str):  La case du pion qui vient de sauter deux rangées, ou "".
+        demi_coups (int):  Le nombre de demi-coups depuis la dernière prise ou le dernier mouvement de pion.
+        cle_zobrist (int):  La clé de Zobrist de la position.
+
+    """
+    __slots__ = ("rangees", "trait", "droits", "pion_vient_de_sauter_une_case", "demi_coups", "cle_zobrist")
+
+    def __init__(self, rangees, trait, droits, pion_vient_de_sauter_une_case, demi_coups, cle_zobrist):
+        for nom, valeur in zip(self.__slots__, (rangees, trait, droits, pion_vient_de_sauter_une_case, demi_coups,
+                                                cle_zobrist)):
+            object.__setattr__(self, nom, valeur)
+
+    def __setattr__(self, nom, valeur):
+        raise AttributeError(f"Les instantanés sont immuables: {nom}")
+
+    def __delattr__(self, nom):
+        raise AttributeError(f"Les instantanés sont immuables: {nom}")
+
+    @classmethod
+    def depuis_echiquier(cls, echiquier, precedent=None):
+        """Photographie la position d'un échiquier.
+
+        Args:
+            echiquier (Echiquier):  L'échiquier à photographier.
+            precedent (Instantane):  L'instantané du demi-coup précédent, dont on reprend les rangées et les droits
+                inchangés.  None pour ne rien partager.
+
+        Returns:
+            (Instantane):  Le nouvel instantané."""
+
+        cases = echiquier.cases
+        rangees = tuple(tuple(cases[debut:debut + 8]) for debut in range(0, 64, 8))
+        droits = tuple(echiquier.piece_a_bouge[position] for position in POSITIONS_DES_DROITS)
+        if precedent is not None:
+            rangees = tuple(ancienne if ancienne == rangee else rangee
+                            for ancienne, rangee in zip(precedent.rangees, rangees))
+            if droits == precedent.droits:
+                droits = precedent.droits
+        return cls(rangees, echiquier.trait, droits, echiquier.pion_vient_de_sauter_une_case, echiquier.demi_coups,
+                   echiquier.cle_zobrist)
+
+    def cases(self):
+        """Retourne la liste des codes des 64 cases."""
+
+        return [code for rangee in self.rangees for code in rangee]
+
+    def dictionnaire(self):
+        """Retourne les pièces sous forme de dictionnaire {position: Piece}."""
+
+        return {NOMS_CASES[case]: PIECES_PAR_CODE[code] for case, code in enumerate(self.cases()) if code}
+
+    def piece_a_bouge(self):
+        """Retourne les droits de roque sous la forme de Echiquier.piece_a_bouge."""
+
+        return dict(zip(POSITIONS_DES_DROITS, self.droits))
+
+    def __repr__(self):
+        return f"Instantane(trait: {self.trait}, clé: {self.cle_zobrist:016x})"
+
+
+if __name__ == '__main__':
+    from pychecs2.echecs.echiquier import Echiquier
+
+    echiquier = Echiquier()
+    depart = Instantane.depuis_echiquier(echiquier)
+    echiquier.deplacer("g1", "f3")
+    apres = Instantane.depuis_echiquier(echiquier, depart)
+
+    # Seules la première et la troisième rangée ont changé
+    assert [apres.rangees[rangee] is depart.rangees[rangee] for rangee in range(8)] == [False, True, False] + [True] * 5
+    assert apres.droits is depart.droits and apres.trait == 1 and apres.demi_coups == 1
+    assert apres.cases() == echiquier.cases and depart.dictionnaire() == Echiquier().dictionnaire_pieces.copy()
+    try:
+        apres.trait = 0
+    except AttributeError:
+        pass
+    else:
+        raise Exception
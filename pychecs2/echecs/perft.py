@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+"""Module perft:  dénombrement des positions atteintes en N demi-coups, pour mesurer la vitesse du moteur de règles
+d'Echiquier et en vérifier l'exactitude.
+
+Le perft joue récursivement tous les coups légaux jusqu'à la profondeur demandée et compte les feuilles, en détaillant
+les prises (prises en passant comprises), les prises en passant, les roques, les promotions et les échecs.  Pour les
+positions de référence connues, les comptes sont comparés aux valeurs publiées:  toute différence trahit une erreur
+dans les règles.
+
+Utilisation:
+    python -m pychecs2.echecs.perft 4
+    python -m pychecs2.echecs.perft 3 --partie parties/testpetitroqueblanc.pychecs
+    python -m pychecs2.echecs.perft 3 --fen "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -"
+    python -m pychecs2.echecs.perft 3 --diviser
+    python -m pychecs2.echecs.perft 5 --processus 32
+
+Avec --processus, les coups de la position de départ sont répartis entre des processus, chacun ayant son propre
+Echiquier, et les comptes des sous-arbres sont additionnés.  Le même mécanisme, parcourir_en_parallele(), applique à
+chaque feuille une fonction fournie par l'utilisateur, par exemple pour compter les mats ou recueillir des positions.
+
+"""
+import argparse
+import copy
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pychecs2.echecs.echiquier import Echiquier
+from pychecs2.echecs.piece import PION, CAVALIER, FOU, TOUR, DAME, ROI, CLASSES_PIECES, PIECES_PAR_CODE
+from pychecs2.echecs.piece import Constructeur_de_piece
+from pychecs2.echecs.geometrie import NOMS_CASES, COULEURS, INDEX_COULEURS, RANGEE_PROMOTION_PION, rangee_de
+
+FEN_DEPART = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -"
+
+# Valeurs publiées, par position et par profondeur:  (feuilles, prises, en passant, roques, promotions, échecs)
+REFERENCES = {
+    FEN_DEPART: {1: (20, 0, 0, 0, 0, 0),
+                 2: (400, 0, 0, 0, 0, 0),
+                 3: (8902, 34, 0, 0, 0, 12),
+                 4: (197281, 1576, 0, 0, 0, 469),
+                 5: (4865609, 82719, 258, 0, 0, 27351),
+                 6: (119060324, 2812008, 5248, 0, 0, 809099)},
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -": {1: (48, 8, 0, 2, 0, 0),
+                                                                         2: (2039, 351, 1, 91, 0, 3),
+                                                                         3: (97862, 17102, 45, 3162, 0, 993),
+                                                                         4: (4085603, 757163, 1929, 128013, 15172,
+                                                                             25523)},
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -": {1: (14, 1, 0, 0, 0, 2),
+                                              2: (191, 14, 0, 0, 0, 10),
+                                              3: (2812, 209, 2, 0, 0, 267),
+                                              4: (43238, 3348, 123, 0, 0, 1680),
+                                              5: (674624, 52051, 1165, 0, 0, 52950)},
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq -": {1: (6, 0, 0, 0, 0, 0),
+                                                                     2: (264, 87, 0, 6, 48, 10),
+                                                                     3: (9467, 1021, 4, 0, 120, 38),
+                                                                     4: (422333, 131393, 0, 7795, 60032, 15492)},
+}
+
+# Pièces proposées pour la promotion, dans l'ordre où elles sont essayées
+TYPES_PROMOTION = (DAME, TOUR, FOU, CAVALIER)
+
+LETTRES_FEN = {"p": PION, "n": CAVALIER, "b": FOU, "r": TOUR, "q": DAME, "k": ROI}
+
+
+class Statistiques:
+    """Comptes des feuilles d'un perft.
+
+    Attributes:
+        feuilles (int):  Le nombre de positions atteintes à la profondeur demandée.
+        prises (int):  Les feuilles atteintes par une prise, en passant comprise.
+        en_passant (int):  Les feuilles atteintes par une prise en passant.
+        roques (int):  Les feuilles atteintes par un roque.
+        promotions (int):  Les feuilles atteintes par une promotion (chaque pièce de promotion compte).
+        echecs (int):  Les feuilles où le roi qui a le trait est en échec.
+
+    """
+
+    champs = ("feuilles", "prises", "en_passant", "roques", "promotions", "echecs")
+
+    def __init__(self):
+        for champ in self.champs:
+            setattr(self, champ, 0)
+
+    def ajouter(self, autres):
+        """Additionne les comptes d'autres statistiques à celles-ci."""
+
+        for champ in self.champs:
+            setattr(self, champ, getattr(self, champ) + getattr(autres, champ))
+
+    def comptes(self):
+        """Retourne les comptes dans l'ordre des valeurs de REFERENCES."""
+
+        return tuple(getattr(self, champ) for champ in self.champs)
+
+
+def echiquier_depuis_fen(fen):
+    """Construit un échiquier à partir d'une notation FEN (les compteurs de coups, s'ils sont présents, sont ignorés).
+
+    Args:
+        fen(str):  La position en notation Forsyth-Edwards.
+
+    Returns:
+        (Echiquier):  L'échiquier, dont l'attribut trait indique le camp qui doit jouer.
+
+    Raises:
+        ValueError si la notation n'est pas une FEN valide."""
+
+    champs = fen.split()
+    if len(champs) < 3:
+        raise ValueError(f"FEN incomplète, il faut au moins les pièces, le trait et les roques: {fen!r}")
+    lignes = champs[0].split("/")
+    if len(lignes) != 8:
+        raise ValueError(f"FEN invalide, il faut huit rangées: {champs[0]!r}")
+
+    dictionnaire = {}
+    for numero, ligne in enumerate(lignes):
+        colonne = 0
+        for symbole in ligne:
+            if symbole in "12345678":
+                colonne += int(symbole)
+            elif symbole.lower() in LETTRES_FEN and colonne < 8:
+                position = "abcdefgh"[colonne] + str(8 - numero)
+                dictionnaire[position] = CLASSES_PIECES[LETTRES_FEN[symbole.lower()]]("blanc" if symbole.isupper()
+                                                                                       else "noir")
+                colonne += 1
+            else:
+                raise ValueError(f"FEN invalide, symbole {symbole!r} dans la rangée {8 - numero}: {ligne!r}")
+        if colonne != 8:
+            raise ValueError(f"FEN invalide, la rangée {8 - numero} n'a pas huit cases: {ligne!r}")
+
+    for couleur in COULEURS:
+        if sum(piece.code & 7 == ROI and piece.couleur == couleur for piece in dictionnaire.values()) != 1:
+            raise ValueError(f"FEN invalide, il faut un et un seul roi {couleur}: {champs[0]!r}")
+    if champs[1] not in ("w", "b"):
+        raise ValueError(f"FEN invalide, le trait doit être w ou b: {champs[1]!r}")
+    roques = champs[2]
+    if roques != "-" and (not set(roques) <= set("KQkq") or len(set(roques)) != len(roques)):
+        raise ValueError(f"FEN invalide, droits de roque: {roques!r}")
+    prise_en_passant = champs[3] if len(champs) > 3 else "-"
+    if prise_en_passant != "-" and (len(prise_en_passant) != 2 or prise_en_passant[0] not in "abcdefgh" or
+                                    prise_en_passant[1] != ("6" if champs[1] == "w" else "3")):
+        raise ValueError(f"FEN invalide, case de prise en passant: {prise_en_passant!r}")
+
+    echiquier = Echiquier(dictionnaire)
+    echiquier.trait = 0 if champs[1] == "w" else 1
+    echiquier.piece_a_bouge = {"e1": "K" not in roques and "Q" not in roques,
+                               "e8": "k" not in roques and "q" not in roques,
+                               "a1": "Q" not in roques, "h1": "K" not in roques,
+                               "a8": "q" not in roques, "h8": "k" not in roques}
+
+    # La FEN donne la case que le pion a sautée;  Echiquier retient plutôt celle où il est arrivé.
+    if prise_en_passant != "-":
+        echiquier.pion_vient_de_sauter_une_case = prise_en_passant[0] + ("4" if prise_en_passant[1] == "3" else "5")
+    return echiquier
+
+
+def echiquier_depuis_partie(fichier):
+    """Construit un échiquier à partir d'une partie sauvegardée (.pychecs).  La prise en passant est celle enregistrée
+    avec le dernier coup.  Les droits de roque aussi;  à défaut, une case de roi ou de tour a perdu son droit dès
+    qu'un coup de la liste en part ou y arrive, ou qu'un roque déplace sa tour.
+
+    Args:
+        fichier(file object):  Le fichier de la partie, ouvert au préalable.
+
+    Returns:
+        (Echiquier):  L'échiquier, dont l'attribut trait indique le camp qui doit jouer."""
+
+    info_partie = json.load(fichier)
+    echiquier = Echiquier(Constructeur_de_piece.charger_dictionnaire(info_partie["dictionnaire_pieces"]))
+    echiquier.trait = INDEX_COULEURS[info_partie["joueur_actif"]]
+
+    if info_partie["liste_coups"]:
+        dernier_coup = info_partie["liste_coups"][-1]
+        if dernier_coup.get("piece a bouge"):
+            echiquier.piece_a_bouge = dict(dernier_coup["piece a bouge"])
+        else:
+            cases_touchees = set()
+            for coup in info_partie["liste_coups"]:
+                cases_touchees.update((coup.get("source"), coup.get("cible")))
+                if "roque" in coup.get("special", ""):
+                    cases_touchees.add(Echiquier.roques[coup["source"], coup["cible"]][2])
+            echiquier.piece_a_bouge = {position: position in cases_touchees for position in echiquier.piece_a_bouge}
+
+        # Les anciens fichiers notent la prise en passant dans un dictionnaire {position: bool}
+        pion_a_saute = dernier_coup.get("pion a saute") or ""
+        if isinstance(pion_a_saute, dict):
+            pion_a_saute = next((position for position, a_saute in pion_a_saute.items() if a_saute), "")
+        echiquier.pion_vient_de_sauter_une_case = pion_a_saute
+    return echiquier
+
+
+def coups_avec_promotions(echiquier, camp):
+    """Liste des coups légaux d'un camp, chaque promotion étant déclinée pour chacune des pièces de TYPES_PROMOTION.
+
+    Returns:
+        [(int, int, str, int)]:  Case de départ, case d'arrivée, coup spécial et type de la pièce de promotion (None
+        si le coup n'est pas une promotion)."""
+
+    coups = []
+    for depart, arrivee, special in echiquier.coups_legaux(camp):
+        if echiquier.cases[depart] & 7 == PION and rangee_de(arrivee) == RANGEE_PROMOTION_PION[camp]:
+            coups.extend((depart, arrivee, special, type_piece) for type_piece in TYPES_PROMOTION)
+        else:
+            coups.append((depart, arrivee, special, None))
+    return coups
+
+
+def perft(echiquier, camp, profondeur):
+    """Dénombre les feuilles atteintes en jouant tous les coups légaux jusqu'à une profondeur donnée.
+
+    Args:
+        echiquier(Echiquier):  La position de départ.  Elle est rétablie à la fin.
+        camp(int):  Le camp qui a le trait (0 pour blanc, 1 pour noir).
+        profondeur(int):  Le nombre de demi-coups, au moins 1.
+
+    Returns:
+        (Statistiques):  Les comptes des feuilles."""
+
+    statistiques = Statistiques()
+    couleur = COULEURS[camp]
+    for depart, arrivee, special, promotion in coups_avec_promotions(echiquier, camp):
+        if profondeur > 1:
+            echiquier.faire_coup(depart, arrivee, special, None if promotion is None
+                                 else CLASSES_PIECES[promotion](couleur))
+            statistiques.ajouter(perft(echiquier, 1 - camp, profondeur - 1))
+            echiquier.defaire_coup()
+            continue
+
+        # Dernier demi-coup:  on classe la feuille d'après le coup qui y mène
+        statistiques.feuilles += 1
+        if echiquier.cases[arrivee] or special == "en passant":
+            statistiques.prises += 1
+        if special == "en passant":
+            statistiques.en_passant += 1
+        elif "roque" in special:
+            statistiques.roques += 1
+        if promotion is not None:
+            statistiques.promotions += 1
+        echiquier.faire_coup(depart, arrivee, special, None if promotion is None
+                             else CLASSES_PIECES[promotion](couleur))
+        if echiquier.roi_est_en_echec(1 - camp):
+            statistiques.echecs += 1
+        echiquier.defaire_coup()
+    return statistiques
+
+
+def diviser(echiquier, camp, profondeur):
+    """Affiche le nombre de feuilles sous chacun des coups de la position, pour localiser une erreur de règles.
+
+    Returns:
+        (Statistiques):  Les comptes totaux."""
+
+    total = Statistiques()
+    couleur = COULEURS[camp]
+    for depart, arrivee, special, promotion in coups_avec_promotions(echiquier, camp):
+        if profondeur == 1:
+            statistiques = Statistiques()
+            statistiques.feuilles = 1
+        else:
+            echiquier.faire_coup(depart, arrivee, special, None if promotion is None
+                                 else CLASSES_PIECES[promotion](couleur))
+            statistiques = perft(echiquier, 1 - camp, profondeur - 1)
+            echiquier.defaire_coup()
+        suffixe = "" if promotion is None else "=" + "PCFTDR"[promotion - 1]
+        print(f"{NOMS_CASES[depart]}{NOMS_CASES[arrivee]}{suffixe}: {statistiques.feuilles}")
+        total.ajouter(statistiques)
+    return total
+
+
+####################################################################################################################
+# Parcours en parallèle
+####################################################################################################################
+
+def etat_de(echiquier):
+    """Retourne un état de l'échiquier qui peut être transmis à un autre processus:  les codes des cases, les droits
+    de roque, le pion qui vient de sauter et le trait."""
+
+    return (tuple(echiquier.cases), dict(echiquier.piece_a_bouge), echiquier.pion_vient_de_sauter_une_case,
+            echiquier.trait)
+
+
+def echiquier_depuis_etat(etat):
+    """Reconstruit un Echiquier à partir d'un état retourné par etat_de()."""
+
+    cases, piece_a_bouge, pion_vient_de_sauter_une_case, trait = etat
+    echiquier = Echiquier({NOMS_CASES[case]: PIECES_PAR_CODE[code] for case, code in enumerate(cases) if code})
+    # Copiés:  faire_coup() modifie les droits sur place, et un état peut servir à plusieurs tâches du même processus
+    echiquier.piece_a_bouge = dict(piece_a_bouge)
+    echiquier.pion_vient_de_sauter_une_case = pion_vient_de_sauter_une_case
+    echiquier.trait = trait
+    return echiquier
+
+
+def jouer(echiquier, coup, camp):
+    """Joue un coup retourné par coups_avec_promotions()."""
+
+    depart, arrivee, special, promotion = coup
+    echiquier.faire_coup(depart, arrivee, special, None if promotion is None
+                         else CLASSES_PIECES[promotion](COULEURS[camp]))
+
+
+def parcourir(echiquier, camp, profondeur, visiteur, total):
+    """Parcourt l'arbre des coups légaux jusqu'à une profondeur donnée et applique le visiteur à chaque feuille.
+
+    Args:
+        echiquier(Echiquier):  La position de départ.  Elle est rétablie à la fin.
+        camp(int):  Le camp qui a le trait.
+        profondeur(int):  Le nombre de demi-coups à jouer avant d'atteindre les feuilles.
+        visiteur(function):  Appelée avec (echiquier, camp) pour chaque feuille;  sa valeur est ajoutée au total avec
+            l'opérateur +=.
+        total:  La valeur à laquelle s'ajoutent les résultats du visiteur (0 pour compter, [] pour recueillir).
+
+    Returns:
+        Le total."""
+
+    if profondeur == 0:
+        total += visiteur(echiquier, camp)
+        return total
+    for coup in coups_avec_promotions(echiquier, camp):
+        jouer(echiquier, coup, camp)
+        total = parcourir(echiquier, 1 - camp, profondeur - 1, visiteur, total)
+        echiquier.defaire_coup()
+    return total
+
+
+def _parcourir_sous_arbre(etat, coup, profondeur, visiteur, initial):
+    """Tâche d'un processus:  joue un coup de la racine sur son propre échiquier et parcourt le sous-arbre."""
+
+    echiquier = echiquier_depuis_etat(etat)
+    jouer(echiquier, coup, echiquier.trait)
+    return parcourir(echiquier, echiquier.trait, profondeur - 1, visiteur, initial)
+
+
+def _perft_sous_arbre(etat, coup, profondeur):
+    """Tâche d'un processus:  perft du sous-arbre d'un coup de la racine."""
+
+    echiquier = echiquier_depuis_etat(etat)
+    jouer(echiquier, coup, echiquier.trait)
+    return perft(echiquier, echiquier.trait, profondeur - 1)
+
+
+def repartir(echiquier, camp, tache, arguments, processus=None):
+    """Répartit les coups de la racine entre des processus et retourne les résultats des tâches, dans l'ordre des
+    coups.
+
+    Args:
+        echiquier(Echiquier):  La position de départ.
+        camp(int):  Le camp qui a le trait.
+        tache(function):  Fonction de module appelée avec (etat, coup, *arguments) dans chaque processus.
+        arguments(tuple):  Les autres arguments de la tâche.
+        processus(int):  Le nombre de processus;  par défaut, le nombre de processeurs.  Avec un seul processus, les
+            tâches sont exécutées l'une après l'autre dans le processus courant."""
+
+    # Le camp reçu a priorité sur le trait de l'échiquier
+    etat = etat_de(echiquier)[:3] + (camp,)
+    if processus == 1:
+        return [tache(etat, coup, *arguments) for coup in coups_avec_promotions(echiquier, camp)]
+    with ProcessPoolExecutor(max_workers=processus) as executeur:
+        futurs = [executeur.submit(tache, etat, coup, *arguments) for coup in coups_avec_promotions(echiquier, camp)]
+        return [futur.result() for futur in futurs]
+
+
+def parcourir_en_parallele(echiquier, camp, profondeur, visiteur, initial=0, processus=None):
+    """Parcourt l'arbre des coups légaux en répartissant les coups de la racine entre des processus, et applique le
+    visiteur à chaque feuille.
+
+    Args:
+        echiquier(Echiquier):  La position de départ.
+        camp(int):  Le camp qui a le trait.
+        profondeur(int):  Le nombre de demi-coups, au moins 1.
+        visiteur(function):  Fonction définie au niveau d'un module (pour être transmise aux processus), appelée avec
+            (echiquier, camp) pour chaque feuille.
+        initial:  La valeur de départ du total (0 pour compter, [] pour recueillir).
+        processus(int):  Le nombre de processus;  par défaut, le nombre de processeurs.
+
+    Returns:
+        La somme, avec +=, des résultats du visiteur."""
+
+    total = copy.copy(initial)
+    for resultat in repartir(echiquier, camp, _parcourir_sous_arbre, (profondeur, visiteur, initial), processus):
+        total += resultat
+    return total
+
+
+def perft_parallele(echiquier, camp, profondeur, processus=None):
+    """Équivalent de perft(), les sous-arbres des coups de la racine étant dénombrés par des processus distincts."""
+
+    if profondeur < 2:
+        return perft(echiquier, camp, profondeur)
+    statistiques = Statistiques()
+    for resultat in repartir(echiquier, camp, _perft_sous_arbre, (profondeur,), processus):
+        statistiques.ajouter(resultat)
+    return statistiques
+
+
+def compter_mats(echiquier, camp):
+    """Visiteur pour parcourir_en_parallele():  1 si le camp qui a le trait est mat, sinon 0."""
+
+    return int(echiquier.roi_est_en_echec(camp) and not echiquier.a_des_coups_legaux(camp))
+
+
+def main(arguments=None):
+    analyseur = argparse.ArgumentParser(prog="python -m pychecs2.echecs.perft",
+                                        description="Perft du moteur de règles d'Echiquier.")
+    analyseur.add_argument("profondeur", type=int, nargs="?", default=4, help="profondeur en demi-coups (défaut: 4)")
+    source = analyseur.add_mutually_exclusive_group()
+    source.add_argument("--partie", help="partie sauvegardée (.pychecs) dont on part")
+    source.add_argument("--fen", help="position de départ en notation FEN")
+    analyseur.add_argument("--diviser", action="store_true", help="détailler les feuilles sous chaque coup")
+    analyseur.add_argument("--processus", type=int, default=0,
+                           help="répartir les coups de la racine entre ce nombre de processus")
+    options = analyseur.parse_args(arguments)
+
+    if options.partie:
+        with open(options.partie, encoding="utf-8") as fichier:
+            echiquier = echiquier_depuis_partie(fichier)
+        references = {}
+    else:
+        fen = options.fen or FEN_DEPART
+        try:
+            echiquier = echiquier_depuis_fen(fen)
+        except ValueError as erreur:
+            analyseur.error(str(erreur))
+        references = REFERENCES.get(" ".join(fen.split()[:4]), {})
+
+    erreurs = 0
+    print(f"{'prof.':>5} {'feuilles':>12} {'prises':>10} {'e.p.':>7} {'roques':>8} {'promos':>8} {'échecs':>9} "
+          f"{'feuilles/s':>10}  référence")
+    profondeurs = [options.profondeur] if options.diviser else range(1, options.profondeur + 1)
+    for profondeur in profondeurs:
+        debut = time.perf_counter()
+        if options.diviser:
+            statistiques = diviser(echiquier, echiquier.trait, profondeur)
+        elif options.processus:
+            statistiques = perft_parallele(echiquier, echiquier.trait, profondeur, options.processus)
+        else:
+            statistiques = perft(echiquier, echiquier.trait, profondeur)
+        duree = time.perf_counter() - debut
+
+        reference = references.get(profondeur)
+        if reference is None:
+            verdict = "-"
+        elif options.diviser:
+            verdict = "ok" if statistiques.feuilles == reference[0] else f"ERREUR (attendu {reference[0]})"
+        else:
+            verdict = "ok" if statistiques.comptes() == reference else f"ERREUR (attendu {reference})"
+        erreurs += verdict.startswith("ERREUR")
+
+        # Seules les feuilles sont comptées, pas les noeuds intérieurs de l'arbre
+        vitesse = statistiques.feuilles / duree if duree else 0
+        print(f"{profondeur:>5} {statistiques.feuilles:>12} {statistiques.prises:>10} {statistiques.en_passant:>7} "
+              f"{statistiques.roques:>8} {statistiques.promotions:>8} {statistiques.echecs:>9} {vitesse:>10.0f}  "
+              f"{verdict}")
+    return 1 if erreurs else 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ["tests"]:
+        sys.exit(main())
+
+    KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -"
+
+    def test_echiquier_depuis_fen():
+        for fen, references in REFERENCES.items():
+            pieces, trait, roques, prise_en_passant = fen.split()
+            echiquier = echiquier_depuis_fen(fen + " 0 1")
+            assert echiquier.trait == "wb".index(trait) and echiquier.pion_vient_de_sauter_une_case == ""
+            for lettre, (roi, tour) in {"K": ("e1", "h1"), "Q": ("e1", "a1"), "k": ("e8", "h8"),
+                                        "q": ("e8", "a8")}.items():
+                assert echiquier.piece_a_bouge[tour] == (lettre not in roques)
+                if lettre in roques:
+                    assert not echiquier.piece_a_bouge[roi]
+            assert echiquier.cle_zobrist == echiquier.calculer_cle_zobrist()
+            assert perft(echiquier, echiquier.trait, 2).comptes() == references[2]
+
+        # Les noirs au trait, après le saut du pion blanc:  la FEN donne la case sautée, Echiquier celle d'arrivée
+        echiquier = echiquier_depuis_fen("rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b Kq e3")
+        assert echiquier.trait == 1 and echiquier.pion_vient_de_sauter_une_case == "e4"
+        assert echiquier.piece_a_bouge == {"e1": False, "e8": False, "a1": True, "h1": False, "a8": False, "h8": True}
+        assert perft(echiquier, echiquier.trait, 1).en_passant == 1
+
+    def test_fen_invalide():
+        for fen in ("", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR",
+                    "rnbqkbnr/pppppppp/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNRR w KQkq -",
+                    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -",
+                    "rnbqkbnr/pppppxpp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQQBNR w KQkq -",
+                    "8/8/8/8/8/8/8/8 w - -",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq -",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KXkq -",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e4",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e3"):
+            try:
+                echiquier_depuis_fen(fen)
+            except ValueError:
+                pass
+            else:
+                assert False, f"FEN acceptée à tort: {fen!r}"
+
+    def test_ligne_de_commande():
+        import contextlib
+        import io
+        import os
+
+        for arguments in (["3"], ["2", "--fen", KIWIPETE], ["2", "--fen", KIWIPETE, "--diviser"],
+                          ["2", "--partie", os.path.join("parties", "testpetitroqueblanc.pychecs")]):
+            sortie = io.StringIO()
+            with contextlib.redirect_stdout(sortie):
+                assert main(arguments) == 0
+            assert "ERREUR" not in sortie.getvalue()
+        assert sortie.getvalue().splitlines()[-1].endswith("-")
+
+        # Une FEN invalide est signalée par argparse, sans trace d'exception
+        erreurs = io.StringIO()
+        with contextlib.redirect_stderr(erreurs):
+            try:
+                main(["1", "--fen", "rnbqkbnr/pppppppp w KQkq -"])
+            except SystemExit as sortie:
+                assert sortie.code == 2
+            else:
+                assert False, "La FEN invalide aurait dû être refusée"
+        assert "FEN invalide" in erreurs.getvalue()
+
+    def test_perft_parallele():
+        for fen in (FEN_DEPART, KIWIPETE):
+            echiquier = echiquier_depuis_fen(fen)
+            cases, cle = list(echiquier.cases), echiquier.cle_zobrist
+            comptes = perft(echiquier, echiquier.trait, 3).comptes()
+            assert comptes == REFERENCES[fen][3]
+
+            # Plusieurs processus, puis un seul:  les tâches sont alors exécutées dans ce processus
+            for processus in (2, 1):
+                assert perft_parallele(echiquier, echiquier.trait, 3, processus).comptes() == comptes
+            assert echiquier.cases == cases and echiquier.cle_zobrist == cle and not echiquier.pile_coups
+
+    def test_parcourir_en_parallele():
+        # 22 mats en trois demi-coups dans la quatrième position de référence
+        echiquier = echiquier_depuis_fen("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq -")
+        assert parcourir(echiquier, echiquier.trait, 3, compter_mats, 0) == 22
+        for processus in (2, 1):
+            assert parcourir_en_parallele(echiquier, echiquier.trait, 3, compter_mats, processus=processus) == 22
+
+        # Le camp reçu a priorité sur le trait de l'échiquier
+        echiquier = echiquier_depuis_fen(FEN_DEPART)
+        assert len(repartir(echiquier, 1, _perft_sous_arbre, (1,), 1)) == 20
+        assert perft_parallele(echiquier, 1, 2, 2).feuilles == 400
+
+    test_echiquier_depuis_fen()
+    test_fen_invalide()
+    test_ligne_de_commande()
+    test_perft_parallele()
+    test_parcourir_en_parallele()
@@ -7,27 +7,65 @@
 # du cours pour vous aider à faire fonctionner les caractères Unicoe sous Windows.
 UTILISER_UNICODE = True
 
+# Codes entiers des pièces, utilisés par la représentation en tableau de l'échiquier.  Le type de la pièce occupe les
+# trois bits de poids faible, et le bit NOIR est ajouté pour les pièces noires.  Une case vide a le code VIDE.
+VIDE, PION, CAVALIER, FOU, TOUR, DAME, ROI = 0, 1, 2, 3, 4, 5, 6
+NOIR = 8
+
 
 class Piece:
     """Une classe de base représentant une pièce du jeu d'échecs. C'est cette classe qui est héritée plus bas pour fournir
     une classe par type de pièce (Pion, Tour, etc.).
 
+    Une pièce ne dépend que de son type et de sa couleur:  il n'en existe donc qu'une instance par type et par couleur
+    (poids mouche), que le constructeur retourne à chaque appel.  Ces instances sont immuables et n'ont pas de
+    __dict__;  l'état qui varie au cours d'une partie, comme le droit de roquer, est tenu par l'échiquier.
+
     Attributes:
         couleur (str): La couleur de la pièce, soit 'blanc' ou 'noir'.
         peut_sauter (bool): Si oui ou non la pièce peut "sauter" par dessus d'autres pièces sur un échiquier.
+        code (int): Le code entier de la pièce, combinant son type (type_piece) et sa couleur.
 
     Args:
-        couleur (str): La couleur avec laquelle créer la pièce.
-        peut_sauter (bool): La valeur avec laquelle l'attribut peut_sauter doit être initialisé.
+        couleur (str): La couleur de la pièce voulue.
 
     """
-    def __init__(self, couleur, peut_sauter, peut_roquer=False, peut_prendre_en_passant=False, est_eligible_a_promotion=False):
-        # Validation si la couleur reçue est valide.
+    __slots__ = ("couleur", "code")
+    type_piece = VIDE
+    peut_sauter = False
+
+    # Les instances uniques, par (classe, couleur)
+    _instances = {}
+
+    def __new__(cls, couleur, *args, **kwargs):
+        try:
+            return Piece._instances[cls, couleur]
+        except KeyError:
+            pass
+
+        # Première demande de cette pièce:  validation de la couleur et création de l'instance unique.
         assert couleur in ('blanc', 'noir')
+        piece = object.__new__(cls)
+        object.__setattr__(piece, "couleur", couleur)
+        object.__setattr__(piece, "code", cls.type_piece if couleur == 'blanc' else cls.type_piece | NOIR)
+        Piece._instances[cls, couleur] = piece
+        return piece
+
+    def __setattr__(self, nom, valeur):
+        raise AttributeError(f"Les pièces sont partagées et ne peuvent être modifiées: {nom}")
 
-        # Création des attributs avec les valeurs reçues.
-        self.couleur = couleur
-        self.peut_sauter = peut_sauter
+    def __delattr__(self, nom):
+        raise AttributeError(f"Les pièces sont partagées et ne peuvent être modifiées: {nom}")
+
+    def __reduce__(self):
+        # Une pièce copiée ou transmise à un autre processus redevient l'instance unique de son type et de sa couleur.
+        return self.__class__, (self.couleur,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def est_blanc(self):
         """Retourne si oui ou non la pièce est blanche.
@@ -95,8 +133,8 @@ class Piece:
 
 
 class Pion(Piece):
-    def __init__(self, couleur):
-        super().__init__(couleur, False)
+    __slots__ = ()
+    type_piece = PION
 
     def peut_se_deplacer_vers(self, position_source, position_cible):
         # Le déplacement se fait sur une même colonne.
@@ -157,8 +195,8 @@ class Pion(Piece):
 
 
 class Tour(Piece):
-    def __init__(self, couleur):
-        super().__init__(couleur, False)
+    __slots__ = ()
+    type_piece = TOUR
 
     def peut_se_deplacer_vers(self, position_source, position_cible):
         return (position_source[0] == position_cible[0]) or (position_source[1] == position_cible[1])
@@ -177,8 +215,9 @@ class Tour(Piece):
 
 
 class Cavalier(Piece):
-    def __init__(self, couleur):
-        super().__init__(couleur, True)
+    __slots__ = ()
+    type_piece = CAVALIER
+    peut_sauter = True
 
     def peut_se_deplacer_vers(self, position_source, position_cible):
         delta_colonne = abs(ord(position_cible[0]) - ord(position_source[0]))
@@ -199,9 +238,9 @@ class Cavalier(Piece):
 
 
 class Fou(Piece):
-    def __init__(self, couleur):
-        super().__init__(couleur, False)
-        
+    __slots__ = ()
+    type_piece = FOU
+
     def peut_se_deplacer_vers(self, position_source, position_cible):
         delta_colonne = abs(ord(position_cible[0]) - ord(position_source[0]))
         delta_rangee = abs(int(position_cible[1]) - int(position_source[1]))
@@ -221,9 +260,10 @@ class Fou(Piece):
 
 
 class Roi(Piece):
-    def __init__(self, couleur, peut_roquer=True):
-        super().__init__(couleur, False)
-        self.peut_roquer = peut_roquer
+    """Le roi.  Le second argument du constructeur, peut_roquer, est accepté pour la compatibilité mais ignoré:  le
+    droit de roquer est tenu par l'échiquier (Echiquier.piece_a_bouge)."""
+    __slots__ = ()
+    type_piece = ROI
 
     def peut_se_deplacer_vers(self, position_source, position_cible):
         delta_colonne = abs(ord(position_cible[0]) - ord(position_source[0]))
@@ -245,9 +285,9 @@ class Roi(Piece):
 
 
 class Dame(Piece):
-    def __init__(self, couleur):
-        super().__init__(couleur, False)
-    
+    __slots__ = ()
+    type_piece = DAME
+
     def peut_se_deplacer_vers(self, position_source, position_cible):
         return Fou.peut_se_deplacer_vers(self, position_source, position_cible) or Tour.peut_se_deplacer_vers(self, position_source, position_cible)
 
@@ -263,6 +303,15 @@ class Dame(Piece):
             else:
                 return 'DN'
 
+
+# Classe correspondant à chaque type de pièce
+CLASSES_PIECES = {PION: Pion, CAVALIER: Cavalier, FOU: Fou, TOUR: Tour, DAME: Dame, ROI: Roi}
+
+# L'instance unique correspondant à chaque code de pièce
+PIECES_PAR_CODE = {classe(couleur).code: classe(couleur)
+                   for classe in CLASSES_PIECES.values() for couleur in ('blanc', 'noir')}
+
+
 class Constructeur_de_piece():
     """Classe auxiliaire servant à convertir un code Unicode ou texte en pièce correspondante.  Est utilisé pour la
     récupération des fichiers de match, puisque les coups sont notés en format JSON et qu'il faut reconvertir les
@@ -281,17 +330,30 @@ class Constructeur_de_piece():
                        '\u2655': (Dame, 'blanc'), 'DB': (Dame, 'blanc'),
                        '\u265b': (Dame, 'noir'), 'DN': (Dame, 'noir')}
 
+    # Les instances uniques, par symbole
+    pieces_par_symbole = {symbole: constructeur(couleur) for symbole, (constructeur, couleur) in str_to_piece.items()}
+
     @classmethod
     def convertir(cls, code):
         """Convertit un caractère unicode en pièce d'échec.
         Args:
             code(str):  Soit le caractère unicode de la pièce, soit le code texte ad hoc.
         Returns:
-            (objet pièce):  Un objet du type et de la couleur correspondants.  Si retourne un roi, celui-ci ne peut
-            pas roquer d'emblée."""
+            (objet pièce):  L'instance unique du type et de la couleur correspondants.  Le droit de roquer d'un roi
+            est tenu par l'échiquier."""
+
+        assert code in cls.pieces_par_symbole, f"Code erroné dans Constructeur_de_piece.convertir: {code}"
+        return cls.pieces_par_symbole[code]
+
+    @classmethod
+    def charger_dictionnaire(cls, dictionnaire_json):
+        """Convertit un dictionnaire contenant les représentations des pièces, comme dans les fichiers de match, en
+        dictionnaire d'objets Piece.
+        Args:
+            dictionnaire_json(dict):  Dictionnaire {position: code de pièce} stocké dans un objet json.
+        Returns:
+            (dict):  Dictionnaire {position: Piece} utilisable par la classe Echiquier."""
 
-        assert code in cls.str_to_piece.keys(), f"Code erroné dans Constructeur_de_piece.convertir: {code}"
-        constructeur, couleur = Constructeur_de_piece.str_to_piece[code]
-        return constructeur(couleur)
+        return {position: cls.convertir(piece) for position, piece in dictionnaire_json.items()}
 
 
@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+"""Module solveur:  recherche de mats forcés en N coups, sur le moteur de règles d'Echiquier.
+
+La recherche de preuve parcourt l'arbre en profondeur d'abord.  Aux noeuds de l'attaquant, il suffit d'un coup qui
+mate à coup sûr;  aux noeuds du défenseur, toutes les ripostes doivent mener au mat.  Les positions déjà prouvées ou
+réfutées sont mémorisées dans une table de transposition indexée par la clé de Zobrist:  une position atteinte par
+plusieurs ordres de coups n'est analysée qu'une fois, et chaque itération de l'approfondissement réutilise les
+résultats de la précédente.  Les échecs sont essayés en premier, puis les prises;  au dernier coup, seuls les échecs
+peuvent mater et les autres coups ne sont même pas essayés.
+
+Les règles de partie nulle (répétition, 50 coups) sont ignorées:  on cherche un mat, pas le résultat de la partie.
+
+Utilisation:
+    python -m pychecs2.echecs.solveur parties/coupdubergerblancs.pychecs
+    python -m pychecs2.echecs.solveur --fen "r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq -" -n 2
+    python -m pychecs2.echecs.solveur parties/ -n 3 --processus 4 --limite 10
+    python -m pychecs2.echecs.solveur tests
+
+Si l'argument est un répertoire, chacun de ses fichiers .pychecs est chargé sans interface graphique et résolu dans
+un processus distinct, avec une limite de temps par fichier.  Un résultat JSON est écrit par ligne dès qu'il est
+connu, puis le débit (positions/s) sur la sortie d'erreur.
+
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pychecs2.echecs.piece import CLASSES_PIECES
+from pychecs2.echecs.geometrie import NOMS_CASES, COULEURS
+from pychecs2.echecs.perft import coups_avec_promotions, jouer, echiquier_depuis_fen, echiquier_depuis_partie
+
+
+class TempsEcoule(Exception):
+    """Levée lorsqu'une recherche dépasse la limite de temps de son Solveur."""
+
+
+class Solveur:
+    """Recherche les mats forcés d'un camp à partir de la position d'un échiquier.
+
+    Attributes:
+        echiquier (Echiquier):  La position analysée.  Elle est rétablie après chaque recherche.
+        attaquant (int):  Le camp qui cherche à mater (0 pour blanc, 1 pour noir).
+        prouvees (dict):  Pour chaque clé de Zobrist, (n, coup):  le mat est prouvé en au plus n coups de
+            l'attaquant.  coup est le coup gagnant si c'est à l'attaquant de jouer, sinon None.
+        refutees (dict):  Pour chaque clé de Zobrist, le plus grand n pour lequel aucun mat en n coups n'existe.
+        noeuds (int):  Le nombre de positions analysées.
+        echeance (float):  L'instant (selon time.perf_counter()) après lequel la recherche lève TempsEcoule, ou None.
+
+    Args:
+        echiquier (Echiquier):  La position de départ.
+        attaquant (int):  Le camp qui cherche à mater;  par défaut, celui qui a le trait.
+        limite (float):  La durée maximale de la recherche, en secondes, à compter de la création du solveur.  None
+            pour chercher sans limite.
+
+    """
+
+    def __init__(self, echiquier, attaquant=None, limite=None):
+        self.echiquier = echiquier
+        self.attaquant = echiquier.trait if attaquant is None else attaquant
+        self.prouvees = {}
+        self.refutees = {}
+        self.noeuds = 0
+        self.echeance = None if limite is None else time.perf_counter() + limite
+
+    def compter_noeud(self):
+        """Compte une position analysée et vérifie la limite de temps.
+
+        Raises:
+            TempsEcoule si l'échéance est dépassée."""
+
+        self.noeuds += 1
+        if self.echeance is not None and time.perf_counter() > self.echeance:
+            raise TempsEcoule(f"{self.noeuds} positions")
+
+    def coups_ordonnes(self, coups_restants):
+        """Coups de l'attaquant dans l'ordre où ils sont essayés:  les échecs, puis les prises, puis les autres.  S'il
+        ne reste qu'un coup pour mater, seuls les échecs sont retournés."""
+
+        echiquier, camp = self.echiquier, self.attaquant
+        echecs, prises, autres = [], [], []
+        for coup in coups_avec_promotions(echiquier, camp):
+            prise = echiquier.cases[coup[1]] or coup[2] == "en passant"
+            jouer(echiquier, coup, camp)
+            donne_echec = echiquier.roi_est_en_echec(1 - camp)
+            echiquier.defaire_coup()
+            if donne_echec:
+                echecs.append(coup)
+            elif coups_restants > 1:
+                (prises if prise else autres).append(coup)
+        return echecs + prises + autres
+
+    def attaque(self, coups_restants):
+        """Cherche, l'attaquant ayant le trait, un coup qui mate en au plus coups_restants coups.
+
+        Returns:
+            (tuple):  Le coup gagnant, comme retourné par coups_avec_promotions(), ou None s'il n'y en a pas."""
+
+        echiquier = self.echiquier
+        cle = echiquier.cle_zobrist
+        prouvee = self.prouvees.get(cle)
+        if prouvee is not None and prouvee[0] <= coups_restants:
+            return prouvee[1]
+        if self.refutees.get(cle, 0) >= coups_restants:
+            return None
+
+        self.compter_noeud()
+        for coup in self.coups_ordonnes(coups_restants):
+            jouer(echiquier, coup, self.attaquant)
+            reussi = self.defense(coups_restants - 1)
+            echiquier.defaire_coup()
+            if reussi:
+                self.prouvees[cle] = (coups_restants, coup)
+                return coup
+        self.refutees[cle] = coups_restants
+        return None
+
+    def defense(self, coups_restants):
+        """Vérifie, le défenseur ayant le trait, que chacune de ses ripostes mène au mat en au plus coups_restants
+        coups de l'attaquant.
+
+        Returns:
+            (bool):  True si le défenseur est déjà mat ou ne peut éviter le mat."""
+
+        echiquier = self.echiquier
+        cle = echiquier.cle_zobrist
+        prouvee = self.prouvees.get(cle)
+        if prouvee is not None and prouvee[0] <= coups_restants:
+            return True
+        if self.refutees.get(cle, -1) >= coups_restants:
+            return False
+
+        self.compter_noeud()
+        defenseur = 1 - self.attaquant
+        ripostes = coups_avec_promotions(echiquier, defenseur)
+        if not ripostes:
+            reussi = echiquier.roi_est_en_echec(defenseur)
+        elif coups_restants == 0:
+            reussi = False
+        else:
+            reussi = True
+            for coup in ripostes:
+                jouer(echiquier, coup, defenseur)
+                reussi = self.attaque(coups_restants) is not None
+                echiquier.defaire_coup()
+                if not reussi:
+                    break
+
+        if reussi:
+            self.prouvees[cle] = (coups_restants, None)
+        else:
+            self.refutees[cle] = coups_restants
+        return reussi
+
+    def mat_le_plus_court(self, coups_max):
+        """Approfondissement itératif:  cherche un mat en 1 coup, puis en 2, etc. jusqu'à coups_max.
+
+        Returns:
+            (int, tuple):  Le nombre de coups du mat le plus court et son premier coup, ou (None, None)."""
+
+        for coups_restants in range(1, coups_max + 1):
+            coup = self.attaque(coups_restants)
+            if coup is not None:
+                return coups_restants, coup
+        return None, None
+
+    def ligne_de_mat(self, coups_max):
+        """Cherche le mat le plus court en au plus coups_max coups, ainsi que la meilleure défense:  le défenseur
+        choisit toujours la riposte qui retarde le plus le mat.
+
+        Returns:
+            [tuple]:  Les demi-coups de la ligne, en commençant par l'attaquant, ou une liste vide si aucun mat n'est
+            trouvé.
+
+        Raises:
+            TempsEcoule si la limite de temps est dépassée.  L'échiquier est tout de même rétabli."""
+
+        echiquier = self.echiquier
+        hauteur = len(echiquier.pile_coups)
+        try:
+            return self.construire_ligne(coups_max)
+        finally:
+            while len(echiquier.pile_coups) > hauteur:
+                echiquier.defaire_coup()
+
+    def construire_ligne(self, coups_max):
+        """Joue la ligne de mat de ligne_de_mat() sur l'échiquier, sans la défaire."""
+
+        echiquier = self.echiquier
+        coups_restants, coup = self.mat_le_plus_court(coups_max)
+        ligne = []
+        while coup is not None:
+            jouer(echiquier, coup, self.attaquant)
+            ligne.append(coup)
+            coups_restants -= 1
+
+            # La riposte qui résiste le plus longtemps
+            defenseur, meilleure, pire_cas = 1 - self.attaquant, None, -1
+            for riposte in coups_avec_promotions(echiquier, defenseur):
+                jouer(echiquier, riposte, defenseur)
+                duree = self.mat_le_plus_court(coups_restants)[0]
+                echiquier.defaire_coup()
+                if duree > pire_cas:
+                    meilleure, pire_cas = riposte, duree
+            if meilleure is None:
+                break
+            jouer(echiquier, meilleure, defenseur)
+            ligne.append(meilleure)
+            coups_restants, coup = self.mat_le_plus_court(pire_cas)
+        return ligne
+
+
+def notation(echiquier, coup, camp):
+    """Retourne un coup sous la forme pièce, case de départ, case d'arrivée, pièce de promotion et résultat ("+" pour
+    un échec, "++" pour un mat), par exemple ♘g1-f3.  Le coup est joué puis défait pour en connaître le résultat."""
+
+    depart, arrivee, special, promotion = coup
+    texte = f"{echiquier.objets[depart]}{NOMS_CASES[depart]}-{NOMS_CASES[arrivee]}"
+    if promotion is not None:
+        texte += str(CLASSES_PIECES[promotion](COULEURS[camp]))
+    jouer(echiquier, coup, camp)
+    if echiquier.roi_est_en_echec(1 - camp):
+        texte += "+" if echiquier.a_des_coups_legaux(1 - camp) else "++"
+    echiquier.defaire_coup()
+    return texte
+
+
+def ligne_en_notation(echiquier, ligne, camp):
+    """Retourne une ligne de demi-coups en notation numérotée:  "1. coup riposte 2. coup ...".  Le premier coup est
+    joué par camp;  l'échiquier est rétabli à la fin."""
+
+    textes = []
+    for demi_coup, coup in enumerate(ligne):
+        texte = notation(echiquier, coup, camp)
+        textes.append(f"{demi_coup // 2 + 1}. {texte}" if demi_coup % 2 == 0 else texte)
+        jouer(echiquier, coup, camp)
+        camp = 1 - camp
+    for coup in ligne:
+        echiquier.defaire_coup()
+    return " ".join(textes)
+
+
+####################################################################################################################
+# Résolution en lot d'un répertoire de positions
+####################################################################################################################
+
+def resoudre_fichier(chemin, coups_max, limite=None):
+    """Charge une partie sauvegardée et y cherche un mat.  Conçue pour être exécutée dans un processus distinct:  les
+    erreurs sont rapportées dans le résultat plutôt que levées.
+
+    Args:
+        chemin (str):  Le fichier .pychecs.
+        coups_max (int):  Le nombre maximal de coups du mat.
+        limite (float):  La durée maximale de la recherche, en secondes, ou None.
+
+    Returns:
+        (dict):  "fichier", "statut" ("mat", "aucun mat", "temps écoulé" ou "erreur"), "positions" (analysées),
+        "duree" (en secondes) et, selon le statut, "camp", "coups" et "ligne" (en notation) ou "erreur"."""
+
+    debut = time.perf_counter()
+    resultat = {"fichier": chemin}
+    try:
+        with open(chemin, encoding="utf-8") as fichier:
+            echiquier = echiquier_depuis_partie(fichier)
+        solveur = Solveur(echiquier, limite=limite)
+        resultat["camp"] = COULEURS[solveur.attaquant]
+        try:
+            ligne = solveur.ligne_de_mat(coups_max)
+        except TempsEcoule:
+            resultat["statut"] = "temps écoulé"
+        else:
+            if ligne:
+                resultat.update(statut="mat", coups=(len(ligne) + 1) // 2,
+                                ligne=ligne_en_notation(echiquier, ligne, solveur.attaquant))
+            else:
+                resultat["statut"] = "aucun mat"
+        resultat["positions"] = solveur.noeuds
+    except Exception as erreur:
+        resultat.update(statut="erreur", erreur=f"{type(erreur).__name__}: {erreur}")
+    resultat["duree"] = round(time.perf_counter() - debut, 3)
+    return resultat
+
+
+def resoudre_repertoire(repertoire, coups_max, limite=None, processus=None):
+    """Résout chacun des fichiers .pychecs d'un répertoire dans un ProcessPoolExecutor.
+
+    Args:
+        repertoire (str):  Le répertoire des positions.
+        coups_max (int):  Le nombre maximal de coups du mat.
+        limite (float):  La durée maximale de chaque recherche, en secondes, ou None.
+        processus (int):  Le nombre de processus;  par défaut, le nombre de processeurs.
+
+    Yields:
+        (dict):  Le résultat de resoudre_fichier() pour chaque fichier, dans l'ordre où ils sont terminés."""
+
+    chemins = sorted(os.path.join(repertoire, nom) for nom in os.listdir(repertoire) if nom.endswith(".pychecs"))
+    with ProcessPoolExecutor(max_workers=processus) as executeur:
+        taches = [executeur.submit(resoudre_fichier, chemin, coups_max, limite) for chemin in chemins]
+        for tache in as_completed(taches):
+            yield tache.result()
+
+
+def main(arguments=None):
+    analyseur = argparse.ArgumentParser(prog="python -m pychecs2.echecs.solveur",
+                                        description="Recherche d'un mat forcé en N coups.")
+    source = analyseur.add_mutually_exclusive_group(required=True)
+    source.add_argument("partie", nargs="?", help="partie sauvegardée (.pychecs) dont on part, ou répertoire de parties")
+    source.add_argument("--fen", help="position de départ en notation FEN")
+    analyseur.add_argument("-n", "--coups", type=int, default=4,
+                           help="nombre maximal de coups du camp qui mate (défaut: 4)")
+    analyseur.add_argument("--processus", type=int, default=None,
+                           help="répertoire:  nombre de processus (défaut: nombre de processeurs)")
+    analyseur.add_argument("--limite", type=float, default=None,
+                           help="répertoire:  durée maximale de la recherche pour chaque fichier, en secondes")
+    options = analyseur.parse_args(arguments)
+
+    if options.partie and os.path.isdir(options.partie):
+        debut, nombre = time.perf_counter(), 0
+        for resultat in resoudre_repertoire(options.partie, options.coups, options.limite, options.processus):
+            print(json.dumps(resultat, ensure_ascii=False), flush=True)
+            nombre += 1
+        duree = time.perf_counter() - debut
+        print(f"{nombre} positions en {duree:.2f} s ({nombre / duree if duree else 0:.1f} positions/s)",
+              file=sys.stderr)
+        return 0
+
+    if options.fen:
+        echiquier = echiquier_depuis_fen(options.fen)
+    else:
+        with open(options.partie, encoding="utf-8") as fichier:
+            echiquier = echiquier_depuis_partie(fichier)
+
+    debut = time.perf_counter()
+    solveur = Solveur(echiquier)
+    ligne = solveur.ligne_de_mat(options.coups)
+    duree = time.perf_counter() - debut
+
+    if not ligne:
+        print(f"Aucun mat en {options.coups} coups pour les {COULEURS[solveur.attaquant]}s "
+              f"({solveur.noeuds} positions, {duree:.2f} s).")
+        return 1
+
+    print(f"Mat en {(len(ligne) + 1) // 2} pour les {COULEURS[solveur.attaquant]}s "
+          f"({solveur.noeuds} positions, {duree:.2f} s):")
+    print(ligne_en_notation(echiquier, ligne, solveur.attaquant))
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ["tests"]:
+        sys.exit(main())
+
+    def test_mat_en_deux():
+        # Le mat de Légal:  1. Cf6+ gxf6 2. Fxf7++
+        echiquier = echiquier_depuis_fen("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq -")
+        cases, cle = list(echiquier.cases), echiquier.cle_zobrist
+        solveur = Solveur(echiquier)
+        assert solveur.attaquant == 0
+        assert solveur.mat_le_plus_court(2)[0] == 2 and solveur.mat_le_plus_court(1) == (None, None)
+
+        ligne = solveur.ligne_de_mat(2)
+        assert len(ligne) == 3 and NOMS_CASES[ligne[0][0]] == "d5" and NOMS_CASES[ligne[0][1]] == "f6"
+        texte = ligne_en_notation(echiquier, ligne, solveur.attaquant)
+        assert texte.startswith("1. ") and " 2. " in texte and texte.endswith("++")
+        assert echiquier.cases == cases and echiquier.cle_zobrist == cle and echiquier.trait == 0
+
+    def test_mat_en_un_et_aucun_mat():
+        echiquier = echiquier_depuis_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - -")
+        assert ligne_en_notation(echiquier, Solveur(echiquier).ligne_de_mat(3), 0) == "1. ♖a1-a8++"
+
+        # Roi et dame contre roi:  pas de mat en 2, et la recherche ne laisse pas de coup joué
+        echiquier = echiquier_depuis_fen("8/8/8/4k3/8/8/8/K6Q w - -")
+        cases, cle = list(echiquier.cases), echiquier.cle_zobrist
+        solveur = Solveur(echiquier)
+        assert solveur.ligne_de_mat(2) == [] and solveur.noeuds > 0
+        assert echiquier.cases == cases and echiquier.cle_zobrist == cle
+
+    def test_temps_ecoule():
+        echiquier = echiquier_depuis_fen("8/8/8/4k3/8/8/8/K6Q w - -")
+        cases, cle = list(echiquier.cases), echiquier.cle_zobrist
+        try:
+            Solveur(echiquier, limite=0).ligne_de_mat(4)
+        except TempsEcoule:
+            pass
+        else:
+            assert False, "La limite de temps aurait dû être dépassée"
+        assert echiquier.cases == cases and echiquier.cle_zobrist == cle and not echiquier.pile_coups
+
+    def test_resoudre_fichier_en_erreur():
+        resultat = resoudre_fichier(os.path.join("parties", "inexistante.pychecs"), 2)
+        assert resultat["statut"] == "erreur" and resultat["erreur"].startswith("FileNotFoundError: ")
+        assert json.loads(json.dumps(resultat, ensure_ascii=False)) == resultat
+
+    def test_repertoire_en_lignes_json():
+        import contextlib
+        import io
+        import shutil
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as repertoire:
+            shutil.copy(os.path.join("parties", "coupdubergerblancs.pychecs"), repertoire)
+            with open(os.path.join(repertoire, "cassee.pychecs"), "w", encoding="utf-8") as fichier:
+                fichier.write("pas une partie")
+            with open(os.path.join(repertoire, "ignore.txt"), "w", encoding="utf-8") as fichier:
+                fichier.write("pas un .pychecs")
+
+            sortie, erreurs = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(sortie), contextlib.redirect_stderr(erreurs):
+                assert main([repertoire, "-n", "2", "--processus", "1", "--limite", "30"]) == 0
+
+        resultats = {os.path.basename(r["fichier"]): r for r in map(json.loads, sortie.getvalue().splitlines())}
+        assert sorted(resultats) == ["cassee.pychecs", "coupdubergerblancs.pychecs"]
+        assert resultats["cassee.pychecs"]["statut"] == "erreur" and resultats["cassee.pychecs"]["erreur"]
+        mat = resultats["coupdubergerblancs.pychecs"]
+        assert mat["statut"] == "mat" and mat["coups"] == 1 and mat["ligne"].endswith("++") and mat["camp"] == "blanc"
+        assert erreurs.getvalue().startswith("2 positions en ")
+
+    test_mat_en_deux()
+    test_mat_en_un_et_aucun_mat()
+    test_temps_ecoule()
+    test_resoudre_fichier_en_erreur()
+    test_repertoire_en_lignes_json()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Module contenant les tables de hachage de Zobrist.
+
+La clé de Zobrist d'une position est le ou exclusif (XOR) d'un nombre aléatoire de 64 bits pour chaque pièce sur sa
+case, d'un nombre pour le trait aux noirs, d'un nombre pour chaque droit de roque encore valide et d'un nombre pour la
+colonne du pion qui vient de sauter deux rangées, si un pion adverse peut le prendre en passant.  Puisque XOR est sa propre réciproque, la clé se met à jour en
+temps constant à chaque pose ou retrait de pièce, sans jamais reparcourir l'échiquier.
+
+Les nombres sont tirés d'un générateur à graine fixe:  une même position a donc la même clé d'une exécution à l'autre,
+ce qui permet de conserver les clés dans des fichiers.
+
+"""
+import random
+
+from pychecs2.echecs.piece import PION, NOIR
+from pychecs2.echecs.geometrie import INDEX_CASES
+
+_generateur = random.Random(20170419)
+
+# ZOBRIST_PIECES[code][case]:  un nombre pour chacun des 16 codes de pièces (les codes VIDE restent à zéro).
+ZOBRIST_PIECES = tuple(tuple(_generateur.getrandbits(64) if code & 7 else 0 for case in range(64))
+                       for code in range(16))
+
+# Le trait aux noirs
+ZOBRIST_TRAIT = _generateur.getrandbits(64)
+
+# Un nombre par case de roi ou de tour de Echiquier.piece_a_bouge, présent dans la clé tant que la pièce n'a pas bougé
+ZOBRIST_ROQUES = {position: _generateur.getrandbits(64) for position in ("e1", "e8", "a1", "a8", "h1", "h8")}
+
+# Un nombre par colonne du pion qui vient de sauter deux rangées
+ZOBRIST_EN_PASSANT = {colonne: _generateur.getrandbits(64) for colonne in "abcdefgh"}
+
+
+def cle_des_roques(piece_a_bouge):
+    """Retourne la part de la clé due aux droits de roque:  les cases de roi ou de tour qui n'ont pas bougé."""
+
+    cle = 0
+    for position, a_bouge in piece_a_bouge.items():
+        if not a_bouge:
+            cle ^= ZOBRIST_ROQUES[position]
+    return cle
+
+
+def cle_en_passant(position, cases):
+    """Retourne la part de la clé due au pion qui vient de sauter à une position donnée ("" si aucun).  Elle est
+    nulle si aucun pion adverse, sur une colonne voisine de la même rangée, ne peut le prendre en passant:  la
+    position est alors la même que si aucun pion n'avait sauté, et doit avoir la même clé (répétitions, cache).
+
+    Args:
+        position(str):  La case du pion qui vient de sauter, ou "".
+        cases(list):  Les codes des pièces des 64 cases (vide tant que l'échiquier n'est pas rempli)."""
+
+    if not position or not cases:
+        return 0
+    case = INDEX_CASES[position]
+    if cases[case] & 7 != PION:
+        return 0
+    pion_adverse = cases[case] ^ NOIR
+    if (case & 7 > 0 and cases[case - 1] == pion_adverse) or (case & 7 < 7 and cases[case + 1] == pion_adverse):
+        return ZOBRIST_EN_PASSANT[position[0]]
+    return 0
+
+
+def cle_de_position(cases, trait, piece_a_bouge, pion_vient_de_sauter_une_case):
+    """Calcule entièrement la clé de Zobrist d'une position.
+
+    Args:
+        cases(list):  Les codes des pièces des 64 cases.
+        trait(int):  Le camp qui a le trait (0 pour blanc, 1 pour noir).
+        piece_a_bouge(dict):  Les droits de roque, comme dans Echiquier.
+        pion_vient_de_sauter_une_case(str):  La case du pion qui vient de sauter, ou "".
+
+    Returns:
+        (int):  La clé de 64 bits."""
+
+    cle = ZOBRIST_TRAIT if trait else 0
+    for case, code in enumerate(cases):
+        cle ^= ZOBRIST_PIECES[code][case]
+    return cle ^ cle_des_roques(piece_a_bouge) ^ cle_en_passant(pion_vient_de_sauter_une_case, cases)
@@ -75,6 +75,11 @@ class ControleurDePartie(Toplevel):
     démarrer et sauvegarder des parties d'échec.  Des objets dérivés pourront servir à interagir avec d'autre type de
     d'adversaires:  moteurs d'échec ou joueurs en réseau."""
 
+    # Notation, dans la liste des coups, des résultats de partie nulle
+    notation_des_resultats = {"matériel insuffisant": " (=)", "répétition": " (=)", "50 coups": " (=)"}
+
+    # Résultats de coup qui terminent la partie
+    resultats_de_fin_de_partie = ("++", "pat", "matériel insuffisant", "répétition", "50 coups")
 
     def __init__(self,
                  master=None,
@@ -213,6 +218,14 @@ class ControleurDePartie(Toplevel):
         else:
             self.etat_partie["liste"] = liste_coups
 
+            # Le fichier ne contient que la position finale:  on reconstitue les positions précédentes pour pouvoir
+            # annuler les coups de la partie chargée.  Une partie incohérente n'est pas affichée.
+            try:
+                self.echiquier_graphique.reconstituer_historique(liste_coups)
+            except ValueError:
+                self.destroy()
+                raise
+
         ################################################################################################################
         # Gestion de l'affichage de la liste des coups
         ################################################################################################################
@@ -295,10 +308,7 @@ class ControleurDePartie(Toplevel):
         Raises:
             Exception:  Si les données du dictionnaire ne sont pas lisibles."""
 
-        dictionnaire = {}
-        for position, piece in dictionnaire_json.items():
-            dictionnaire[position] = Constructeur_de_piece.convertir(piece)
-        return dictionnaire
+        return Constructeur_de_piece.charger_dictionnaire(dictionnaire_json)
 
     #######################################################################
     # Constructeur à-partir d'un fichier
@@ -310,7 +320,7 @@ class ControleurDePartie(Toplevel):
         Args:
             fichier(file object):  Objet fichier ouvert au préalable.
         Returns:
-            (ControleurDePartie object):  Un nouveau contrôleur de partie."""
+            (ControleurDePartie object):  Un nouveau contrôleur de partie, ou None si la partie ne peut être chargée."""
 
         try:
 
@@ -340,16 +350,23 @@ class ControleurDePartie(Toplevel):
             return liste_coups
 
         # Appeler le constructeur avec les infos de la partie
-        return cls(master=master,
-                   dictionnaire=dictionnaire_pieces,
-                   nom_blancs=nom_joueur_blanc,
-                   nom_noirs=nom_joueur_noir,
-                   joueur_actif=joueur_actif,
-                   id_partie=id_partie,
-                   liste_coups=liste_coups,
-                   gagnant=gagnant,
-                   sauvegardee=True,
-                   fichier_sauvegarde=fichier_sauvegarde)
+        try:
+            return cls(master=master,
+                       dictionnaire=dictionnaire_pieces,
+                       nom_blancs=nom_joueur_blanc,
+                       nom_noirs=nom_joueur_noir,
+                       joueur_actif=joueur_actif,
+                       id_partie=id_partie,
+                       liste_coups=liste_coups,
+                       gagnant=gagnant,
+                       fichier_sauvegarde=fichier_sauvegarde)
+
+        # Les coups enregistrés ne mènent pas à la position enregistrée
+        except ValueError as erreur:
+            messagebox.showerror(title="Chargement impossible",
+                                 message=f"La partie enregistrée est incohérente.\n{erreur}",
+                                 parent=master)
+            return
 
     #######################################################################
     # Constructeur à-partir d'une liste de coups
@@ -436,7 +453,7 @@ class ControleurDePartie(Toplevel):
         # Dans le cas d'une promotion on a stocké l'abbréviation appropriée à la suite du str "promotion"
         if "promotion" in coup["special"]:
             texte += coup["special"].lstrip("promotion")
-        texte += coup["resultat"]
+        texte += ControleurDePartie.notation_des_resultats.get(coup["resultat"], coup["resultat"])
 
         return f"{texte:<12s}"
 
@@ -530,9 +547,12 @@ class ControleurDePartie(Toplevel):
     def annuler_le_dernier_coup(self):
         """Demander à l'échiquier d'annuler le dernier coup joué."""
 
-        # Si on n'a pas encore joué on ne peut pas annuler
+        # Si on n'a pas encore joué on ne peut pas annuler.  Ni si l'historique d'une partie chargée n'a pu être
+        # reconstitué:  la position précédente est inconnue.
         if not self.etat_partie["liste"]:
             return
+        if self.etat_partie["liste"][-1]["special"] != "Abandon" and len(self.echiquier_graphique.instantanes) < 2:
+            return
 
         # On retire ce coup de la liste
         dernier_coup = self.etat_partie["liste"].pop()
@@ -587,7 +607,7 @@ class ControleurDePartie(Toplevel):
         self.mise_a_jour_liste_coups()
 
         # Si c'est une fin de partie, finir celle-ci
-        if self.etat_partie["liste"][-1]["resultat"] in ["++", "pat"]:
+        if self.etat_partie["liste"][-1]["resultat"] in self.resultats_de_fin_de_partie:
             self.partie_est_finie()
         else:
 
@@ -686,6 +706,18 @@ class ControleurDePartie(Toplevel):
             self.etat_partie["gagnant"] = "aucun"
             self.message.set("Partie nulle: un roi est pat!")
 
+        elif dernier_coup["resultat"] == "matériel insuffisant":
+            self.etat_partie["gagnant"] = "aucun"
+            self.message.set("Partie nulle: aucun des joueurs ne peut plus mater!")
+
+        elif dernier_coup["resultat"] == "répétition":
+            self.etat_partie["gagnant"] = "aucun"
+            self.message.set("Partie nulle: la même position est apparue trois fois!")
+
+        elif dernier_coup["resultat"] == "50 coups":
+            self.etat_partie["gagnant"] = "aucun"
+            self.message.set("Partie nulle: cinquante coups sans prise ni mouvement de pion!")
+
         elif dernier_coup["resultat"] == "++":
             self.etat_partie["gagnant"] = self.etat_partie["joueur actif"]
             self.message.set(f"Échec et mat!  Félicitations aux {self.etat_partie['gagnant']}s!")
@@ -907,6 +939,38 @@ if __name__=="__main__":
         obj.echiquier_graphique.pack() 
         obj.echiquier_graphique.mainloop()
 
+    def test_annulation_apres_chargement():
+        import io
+
+        obj = ControleurDePartie(fen)
+        for source, cible in [("e2", "e4"), ("e7", "e5"), ("g1", "f3"), ("b8", "c6"), ("f1", "c4"), ("g8", "f6"),
+                              ("e1", "f1")]:
+            obj.echiquier_graphique.jouer_le_coup(source, cible)
+        echiquier = obj.echiquier_graphique
+        fichier = io.StringIO(json.dumps({"nom_blancs": "Blancs", "nom_noirs": "Noirs",
+                                          "joueur_actif": echiquier.joueur_actif, "id_partie": obj.etat_partie["id"],
+                                          "gagnant": "aucun", "sauvegardee": True, "fichier_sauvegarde": None,
+                                          "dictionnaire_pieces": {position: str(piece) for position, piece
+                                                                  in echiquier.dictionnaire_pieces.items()},
+                                          "liste_coups": obj.etat_partie["liste"]}))
+        obj.destroy()
+
+        # La partie chargée retrouve ses positions précédentes:  annuler le coup du roi lui rend le droit de roquer
+        obj = ControleurDePartie.charger(fen, fichier)
+        echiquier = obj.echiquier_graphique
+        assert len(echiquier.instantanes) == 8 and not echiquier.roi_peut_roquer("blanc")
+        obj.annuler_le_dernier_coup()
+        assert echiquier.trait == 0 and echiquier.roi_peut_roquer("blanc") and "e1" in echiquier.dictionnaire_pieces
+        echiquier.jouer_le_coup("e1", "g1")
+        assert obj.etat_partie["liste"][-1]["special"] == "petit roque" and len(obj.etat_partie["liste"]) == 7
+        obj.destroy()
+
+        # Des coups qui ne mènent pas à la position, sans droits de roque enregistrés:  la partie est refusée
+        fichier.seek(0)
+        info_partie = json.load(fichier)
+        info_partie["liste_coups"] = [dict(coup, **{"piece a bouge": None}) for coup in info_partie["liste_coups"][:-1]]
+        assert ControleurDePartie.charger(fen, io.StringIO(json.dumps(info_partie))) is None
+
     def test_interface_sunfish():
         import pychecs2.sunfish.sunfish as sunfish
         obj = ControleurDePartie(fen, nom_blancs="Pascal", nom_noirs="Sunfish")
@@ -917,4 +981,5 @@ if __name__=="__main__":
 
 
 
+    test_annulation_apres_chargement()
     test_interface_sunfish()
@@ -1,17 +1,36 @@
 from pychecs2.interface.ControleurDePartie import ControleurDePartie
+from pychecs2.interface.RechercheDeRiposte import RechercheDeRiposte
 from pychecs2.sunfish.sunfish import ControleurDeSunfish
-from tkinter import DISABLED, NORMAL, messagebox
+from tkinter import messagebox
 
 class ControleurDePartieContre(ControleurDePartie):
     """Classe permettant de faire un partie contre un adversaire qui n'utilise pas notre échiquier, soit un adversaire
     en réseau, ou un moteur d'échec.
 
+    Le moteur d'échecs cherche sa riposte dans un fil d'exécution séparé (voir RechercheDeRiposte):  la fenêtre reste
+    disponible et le chrono continue de tourner pendant qu'il réfléchit.  L'interface consulte périodiquement la
+    recherche avec after(), car seul le fil de l'interface peut toucher à Tk.
+
     Attributs:
 
     adversaire:  Le controleur de l'adversaire.  Doit disposer d'une méthode nom() qui retourne son nom, ainsi qu'une
     méthode jouer() qui accepte un coup sous forme de dict et retourne une riposte.
 
-    couleur_joueur(str):  La couleur de notre joueur, l'adversaire aura donc l'autre couleur."""
+    couleur_joueur(str):  La couleur de notre joueur, l'adversaire aura donc l'autre couleur.
+
+    recherche(RechercheDeRiposte):  La recherche de la riposte du moteur d'échecs.
+
+    sondage_en_cours(bool):  True si une boucle after() consulte déjà la recherche.
+
+    coup_a_riposter(dict):  Notre coup, dont la recherche de la riposte sera lancée une fois le chrono de l'adversaire
+    reparti, ou None."""
+
+    # Délai, en millisecondes, entre deux consultations de la file des ripostes
+    delai_de_sondage = 50
+
+    # Marge, en secondes, retranchée du temps restant au chrono de l'adversaire.  Le chrono sonne dès qu'il affiche
+    # 00:00, soit à moins d'une seconde de la fin.
+    marge_du_chrono = 1.5
 
     def __init__(self,
                  adversaire,
@@ -29,6 +48,14 @@ class ControleurDePartieContre(ControleurDePartie):
                  option_chrono=False,
                  option_aide=False):
 
+        # Doivent exister avant que le parent ne branche les événements de l'échiquier
+        self.adversaire = adversaire
+        self.couleur_joueur = couleur_joueur
+        self.recherche = RechercheDeRiposte(adversaire)
+        self.sondage_en_cours = False
+        self.coup_a_riposter = None
+
+        # Le parent ne connait pas l'argument sauvegardee:  une nouvelle partie n'a jamais été sauvegardée
         ControleurDePartie.__init__(self,
                                     master=master,
                                     dictionnaire=dictionnaire,
@@ -38,98 +65,146 @@ class ControleurDePartieContre(ControleurDePartie):
                                     id_partie=id_partie,
                                     liste_coups=liste_coups,
                                     gagnant=gagnant,
-                                    sauvegardee=sauvegardee,
                                     fichier_sauvegarde=fichier_sauvegarde,
                                     option_chrono=option_chrono,
                                     option_aide=option_aide)
 
-        self.adversaire = adversaire
         if couleur_joueur == "blanc":
             self.nom_noirs = self.adversaire.obtenir_le_nom()
         else:
             self.nom_blancs = self.adversaire.obtenir_le_nom()
 
-    def mise_a_jour_liste_coups(self, *args):
+    def mise_a_jour_liste_coups(self, abandon=False):
         """Méthode interface avec l'adversaire.  Cette méthode est appelée lorsque l'échiquier graphique a enregistré
-        un coup.  On va mettre à jour la liste de coup, et temporairement suspendre l'activité de l'échiquier en
-        attendant que l'adversaire riposte.  On va repasser cette riposte à l'échiquier avec la méthode jouer_le_coup."""
+        un coup.  On va mettre à jour la liste de coup, puis, si c'est notre coup, préparer la recherche de la riposte,
+        que un_coup_est_joue lancera.  Celle-ci sera repassée à l'échiquier avec la méthode jouer_le_coup lorsqu'elle arrivera."""
 
-        # Annexer notre coup à la liste puis attendre la réponse
-        ControleurDePartie.mise_a_jour_liste_coups(self, args)
+        # Annexer le coup à la liste
+        ControleurDePartie.mise_a_jour_liste_coups(self, abandon)
+        dernier_coup = self.etat_partie["liste"][-1]
+
+        # Dans le cas d'un abandon, on ne va pas plus loin car sunfish ne peut pas riposter...  et s'il réfléchissait
+        # encore, sa recherche ne sert plus à rien.
+        if dernier_coup["special"] == "Abandon":
+            self.annuler_la_recherche()
+            return
 
-        # Dans le cas d'un abandon, on ne va pas plus loin car sunfish ne peut pas riposter...
-        if self.liste_coups[-1]["special"] == "Abandon":
+        # La riposte de l'adversaire passe aussi par ici:  on ne répond qu'à notre coup, s'il ne termine pas la partie.
+        # Le joueur actif est encore celui qui vient de jouer.
+        if self.etat_partie["joueur actif"] != self.couleur_joueur:
             return
+        if dernier_coup["resultat"] in self.resultats_de_fin_de_partie:
+            return
+
+        if isinstance(self.adversaire, ControleurDeSunfish):
+            self.coup_a_riposter = self.echiquier_graphique.coup_joue
+        else:
+            # L'adversaire nous communique son coup
+            self.jouer_le_coup(self.adversaire.jouer(self.echiquier_graphique.coup_joue))
+
+    def un_coup_est_joue(self, *args):
+
+        ControleurDePartie.un_coup_est_joue(self, *args)
+
+        # Le chrono de l'adversaire vient de repartir:  on lance sa recherche seulement maintenant, pour lui accorder
+        # le temps qui lui reste vraiment
+        if self.coup_a_riposter is not None:
+            coup, self.coup_a_riposter = self.coup_a_riposter, None
+            self.lancer_la_recherche(coup)
+
+        # Pendant que l'adversaire réfléchit, l'échiquier reste gelé;  la fenêtre, elle, reste disponible
+        if self.recherche.en_cours():
+            self.echiquier_graphique.passer_en_mode_attente()
+
+    ########################################################
+    # Recherche de la riposte dans un fil d'exécution séparé
+    ########################################################
 
-        # On ne pourra pas annuler un coup pendant que l'ordi réfléchit
-        self.bouton_annuler_coup.config(state=DISABLED)
-        self.echiquier_graphique.passer_en_mode_attente()
+    def lancer_la_recherche(self, coup):
+        """Lance la recherche de la riposte à notre coup dans un fil d'exécution séparé.
 
-        # L'adversaire nous communique son coup
-        riposte = self.adversaire.jouer(self.echiquier_graphique.coup_joue)
+        Args:
+            coup (dict):  Le coup auquel l'adversaire doit riposter."""
 
-        # On joue le coup sur l'échiquier et on l'annexe sur notre liste
-        self.jouer_le_coup(riposte)
-        ControleurDePartie.mise_a_jour_liste_coups(self, args)
+        # Dans une partie chronométrée, le moteur doit aussi jouer avant que son chrono ne sonne
+        limites = None
+        if self.etat_partie["chrono"]:
+            temps_restant = max(self.chrono.temps_restant() - self.marge_du_chrono, 0)
+            limites = self.adversaire.limites.avec_pendule(temps_restant, coups_restants=1)
 
-        # Quitter le mode attente pour réagir aux clics du joueur et permettre l'annulation...
-        self.echiquier_graphique.passer_en_mode_actif()
-        self.bouton_annuler_coup.config(state=NORMAL)
+        self.recherche.lancer(coup, limites)
+
+        # Une seule boucle de sondage à la fois, même si une recherche annulée n'est pas encore terminée
+        if not self.sondage_en_cours:
+            self.sondage_en_cours = True
+            self.after(self.delai_de_sondage, self.attendre_la_riposte)
+
+    def attendre_la_riposte(self):
+        """Consulte la recherche depuis le fil de l'interface, et joue sa riposte sur l'échiquier lorsqu'elle arrive."""
+
+        riposte = self.recherche.riposte_prete()
+        if riposte is not None:
+            self.jouer_le_coup(riposte)
+
+        if self.recherche.en_cours():
+            self.after(self.delai_de_sondage, self.attendre_la_riposte)
+        else:
+            self.sondage_en_cours = False
+
+    def annuler_la_recherche(self):
+        """Demande à la recherche en cours, s'il y en a une, de s'arrêter.  Sa riposte sera ignorée."""
+
+        self.recherche.annuler()
+
+    def coup_sans_riposte(self):
+        """Retourne notre dernier coup si l'adversaire n'y a pas encore répondu, sinon None."""
+
+        return self.recherche.coup_sans_riposte(self.etat_partie["liste"])
 
     def annuler_le_dernier_coup(self):
         """Annuler un coup contre le contrôleur de partie adverse est un peu plus subtil:  On ne peut pas annuler
         seulement un coup des noirs, car ils vont toujours rejouer le même coup ensuite.  Il faut donc annuler son
         propre coup,  ou par groupes de deux.  De plus il faudrait renverser la configuration du contrôleur adverse."""
 
-        # Donc annulation du coup dans le cas d'un match contre Sunfish, on peut seulement annuler lorsqu'on a le trait
-        # Et il faut annuler le dernier coup de sunfish + notre propre coup, donc par deux!
+        # Donc annulation du coup dans le cas d'un match contre Sunfish, il faut annuler le dernier coup de sunfish +
+        # notre propre coup, donc par deux!
         # ...
         # Sauf si on a abandonné!!!   Dans ce cas on annule seulement notre abandon et c'est à nous de jouer...
+        # Sauf aussi si sunfish n'a pas encore répondu:  on annule seulement notre coup, qu'il n'a pas enregistré.
 
         if isinstance(self.adversaire, ControleurDeSunfish):
 
-            # D'abord on met l'échiquier en mode attente...
-            self.echiquier_graphique.passer_en_mode_attente()
-
             # On n'a pas joué, on ne peut donc annuler...
-            if not self.liste_coups:
+            if not self.etat_partie["liste"]:
                 return
 
-            dernier_coup = self.liste_coups.pop()
-
-            if len(self.liste_coups) > 1:
-                avant_dernier_coup = self.liste_coups[-1]
-            else:
-                avant_dernier_coup = None
-
-            # Dans le cas d'un abandon il faut seulement annuler le dernier coup car sunfish n'a pas pu réagir
-            if dernier_coup["special"] == "Abandon":
-                self.echiquier_graphique.annuler_le_dernier_coup(dernier_coup, avant_dernier_coup)
-                ControleurDePartie.mise_a_jour_liste_coups(self)
-                self.echiquier_graphique.passer_en_mode_actif()
+            # Sunfish réfléchit encore:  on arrête sa recherche et on reprend notre coup
+            if self.recherche.en_cours():
+                self.annuler_la_recherche()
+                ControleurDePartie.annuler_le_dernier_coup(self)
                 return
 
-            # D'abord annuler le dernier coup des noirs sur l'échiquier
-            self.echiquier_graphique.annuler_le_dernier_coup(dernier_coup, avant_dernier_coup)
-
-            # Maintenant il faut demander à sunfish de revenir en arrière...
-            self.adversaire.annuler_le_dernier_coup()
-
-            # Ensuite mettre la liste à jour, méthode parent pour éviter de resolliciter sunfish
-            ControleurDePartie.mise_a_jour_liste_coups(self)
+            # Dans le cas d'un abandon il faut seulement annuler le dernier coup car sunfish n'a pas pu réagir.  Si on
+            # avait abandonné pendant qu'il réfléchissait, il reprend sa recherche.
+            if self.etat_partie["liste"][-1]["special"] == "Abandon":
+                ControleurDePartie.annuler_le_dernier_coup(self)
+                coup = self.coup_sans_riposte()
+                if coup is not None:
+                    self.lancer_la_recherche(coup)
+                    self.echiquier_graphique.passer_en_mode_attente()
+                return
 
-            # Ensuite annuler le dernier coup des blancs: même démarche...
-            dernier_coup = self.liste_coups.pop()
-            if len(self.liste_coups) > 1:
-                avant_dernier_coup = self.liste_coups[-1]
-            else:
-                avant_dernier_coup = None
-            self.echiquier_graphique.annuler_le_dernier_coup(dernier_coup, avant_dernier_coup)
-            self.adversaire.annuler_le_dernier_coup()
-            ControleurDePartie.mise_a_jour_liste_coups(self)
+            # Notre coup a terminé la partie, sunfish n'y a donc pas répondu
+            if self.coup_sans_riposte() is not None:
+                ControleurDePartie.annuler_le_dernier_coup(self)
+                return
 
-            # Rétablir l"échiquier
-            self.echiquier_graphique.passer_en_mode_actif()
+            # D'abord annuler le dernier coup des noirs, ensuite le dernier coup des blancs, sur l'échiquier et chez
+            # sunfish.  La méthode parent évite de resolliciter sunfish.
+            for _ in range(2):
+                if self.etat_partie["liste"]:
+                    ControleurDePartie.annuler_le_dernier_coup(self)
+                    self.adversaire.annuler_le_dernier_coup()
 
         else:
             messagebox.showwarning(title="Annulation impossible",
@@ -140,11 +215,52 @@ class ControleurDePartieContre(ControleurDePartie):
 
 if __name__=="__main__":
 
-    from tkinter import Tk
-    from pychecs2.sunfish.sunfish import ControleurDeSunfish
-
-    def testCreateSave():
-        fen = Tk()
+    from tkinter import Tk, TclError
+    from pychecs2.sunfish.sunfish import ControleurDeSunfish, LimitesDeRecherche
+    import time
+
+    def attendre_la_riposte(fen, obj):
+        while obj.recherche.en_cours():
+            fen.update()
+            time.sleep(0.01)
+        fen.update()
+
+    def test_partie_contre_sunfish(fen):
+        obj = ControleurDePartieContre(ControleurDeSunfish(LimitesDeRecherche(profondeur=2)), master=fen)
+        echiquier = obj.echiquier_graphique
+
+        # Notre coup:  l'échiquier est gelé pendant que sunfish réfléchit
+        echiquier.jouer_le_coup("e2", "e4")
+        assert obj.recherche.en_cours() and echiquier.mode == "attente"
+
+        # Sa riposte:  c'est de nouveau à nous, pour le contrôleur comme pour l'échiquier
+        attendre_la_riposte(fen, obj)
+        assert len(obj.etat_partie["liste"]) == 2 and obj.adversaire.nombre_de_demi_coups() == 2
+        assert obj.etat_partie["joueur actif"] == echiquier.joueur_actif == "blanc" and echiquier.trait == 0
+        assert echiquier.mode == "actif" and echiquier.historique_positions[echiquier.cle_zobrist] == 1
+
+        # On peut rejouer, puis annuler ce coup pendant que sunfish réfléchit
+        echiquier.case_depart_est_occupee("g1")
+        echiquier.jouer_le_coup("g1", "f3")
+        assert len(obj.etat_partie["liste"]) == 3 and obj.recherche.en_cours()
+        obj.annuler_le_dernier_coup()
+        attendre_la_riposte(fen, obj)
+        assert len(obj.etat_partie["liste"]) == 2 and obj.adversaire.nombre_de_demi_coups() == 2
+        assert obj.etat_partie["joueur actif"] == echiquier.joueur_actif == "blanc" and echiquier.mode == "actif"
+        assert obj.coup_sans_riposte() is None
+        obj.destroy()
+
+    def test_chrono_de_sunfish(fen):
+        # Trois secondes par coup:  sunfish doit répondre avant que son chrono ne sonne, malgré sa minute de budget
+        obj = ControleurDePartieContre(ControleurDeSunfish(LimitesDeRecherche(temps_par_coup=60)), master=fen,
+                                       option_chrono=0.05)
+        debut = time.monotonic()
+        obj.echiquier_graphique.jouer_le_coup("e2", "e4")
+        attendre_la_riposte(fen, obj)
+        assert len(obj.etat_partie["liste"]) == 2 and time.monotonic() - debut < obj.chrono.temps - 1
+        obj.destroy()
+
+    def testCreateSave(fen):
         fen.title("Pychecs")
         adv = ControleurDeSunfish()
         obj = ControleurDePartieContre(adv,
@@ -161,4 +277,12 @@ if __name__=="__main__":
                                        fichier_sauvegarde=None)
         fen.mainloop()
 
-    testCreateSave()
\ No newline at end of file
+    # Ces tests ont besoin d'un affichage;  la recherche elle-même est testée dans RechercheDeRiposte
+    try:
+        fen = Tk()
+    except TclError:
+        print("Aucun affichage:  tests de l'interface sautés.")
+    else:
+        test_partie_contre_sunfish(fen)
+        test_chrono_de_sunfish(fen)
+        testCreateSave(fen)
@@ -1,9 +1,10 @@
 import tkinter as tk
 from pychecs2.echecs.echiquier import Echiquier
+from pychecs2.echecs.geometrie import INDEX_COULEURS
 from pychecs2.interface.PychecsException import PychecsException, CaseDepartVideException, ClicHorsEchiquierException
 from pychecs2.interface.PychecsException import TourException
 from pychecs2.interface.AideContextuellePychecs import AIDE_CONTEXTUELLE
-from pychecs2.echecs.piece import Dame, Tour, Fou, Cavalier, Constructeur_de_piece
+from pychecs2.echecs.piece import Dame, Tour, Fou, Cavalier
 
 
 ########################################################################################################################
@@ -193,6 +194,7 @@ class CanvasEchiquier(tk.Canvas, Echiquier):
         # Variable contenant les messages à l'utilisateur et le statut de la partie, en cours ou gagnée
 
         self.message = tk.StringVar()
+        self.message_erreur = tk.StringVar()
 
         if not joueur_actif:
             self.joueur_actif = "blanc"
@@ -201,6 +203,9 @@ class CanvasEchiquier(tk.Canvas, Echiquier):
             self.joueur_actif = joueur_actif
             self.message.set(f"Au tour des {self.joueur_actif}s de jouer.")
 
+        # Le trait fait partie de la clé de Zobrist de la position
+        self.trait = INDEX_COULEURS[self.joueur_actif]
+
         ##########################
         # Le dernier coup complété
         ##########################
@@ -294,10 +299,12 @@ class CanvasEchiquier(tk.Canvas, Echiquier):
     def basculer_joueur_actif(self):
         """Bascule le joueur actif de blanc à noir et de noir à blanc."""
         self.joueur_actif = self.joueur_inactif()
+        self.trait = INDEX_COULEURS[self.joueur_actif]
 
     def activer(self, couleur):
         """Méthode interface permettant au contrôleur d'imposer le joueur actif"""
         self.joueur_actif = couleur
+        self.trait = INDEX_COULEURS[couleur]
 
     def dernier_coup(self):
         return self.coup_joue
@@ -555,7 +562,9 @@ class CanvasEchiquier(tk.Canvas, Echiquier):
             # Si c'est une promotion, il faut remplacer le pion promu par la pièce choisie
             # Il faut aussi réévaluer si le roi est en échec, mat ou pat.
             if coup["special"] == "promotion":
+                self.oublier_position()
                 coup["special"] += self.promouvoir(position_cible)
+                self.enregistrer_position()
                 coup["resultat"] = self.resultat_du_coup(self.joueur_inactif())
 
             return coup
@@ -635,8 +644,9 @@ class CanvasEchiquier(tk.Canvas, Echiquier):
             else:
                 self.message_aide_contextuelle = AIDE_CONTEXTUELLE["PychecsException"]
 
-            # Passer au prochain joueur!
-            self.basculer_joueur_actif()
+            # Passer au prochain joueur!  Le contrôleur, averti par nombre_de_coups_joues, a peut-être déjà changé le
+            # joueur actif:  on l'impose d'après la couleur de la pièce jouée plutôt que de basculer une seconde fois.
+            self.activer(self.joueurs[self.couleur_piece_a_position(self.case_arrivee)])
             self.message_erreur.set("")
             self.message.set(message_echec + f"C'est maintenant aux {self.joueur_actif}s à jouer!")
 
@@ -719,45 +729,16 @@ class CanvasEchiquier(tk.Canvas, Echiquier):
         # Dans le cas d'un abandon, aucune pièce n'a été déplacée:  on saute cette étape
         if dernier_coup["special"] != "Abandon":
 
-            # Annuler le mouvement sur l'échiquier logique
-            piece_jouee = Constructeur_de_piece.convertir(dernier_coup["jouee"])
-            depart = dernier_coup["source"]
-            arrivee = dernier_coup["cible"]
-
-            if dernier_coup["prise"]:
-                piece_prise = Constructeur_de_piece.convertir(dernier_coup["prise"])
-                self.dictionnaire_pieces[arrivee] = piece_prise
-            else:
-                del self.dictionnaire_pieces[arrivee]
-
-            # Remettre la pièce jouée sur la case départ
-            self.dictionnaire_pieces[depart] = piece_jouee
-
-            # Dans le cas d'un roque: il faut aussi remettre les tours à leur place
-            if dernier_coup["special"] == "grand roque":
-                if piece_jouee.couleur == "blanc":
-                    self.dictionnaire_pieces["a1"] = self.dictionnaire_pieces.pop("d1")
-                else:
-                    self.dictionnaire_pieces["a8"] = self.dictionnaire_pieces.pop("d8")
-            elif dernier_coup["special"] == "petit roque":
-                if piece_jouee.couleur == "blanc":
-                    self.dictionnaire_pieces["h1"] = self.dictionnaire_pieces.pop("f1")
-                else:
-                    self.dictionnaire_pieces["h8"] = self.dictionnaire_pieces.pop("f8")
+            # L'instantané de la position précédente rétablit tout:  pièces prises (même en passant), tour du roque,
+            # droits de roque, prise en passant et historique des répétitions.  Ceux d'une partie chargée d'un fichier
+            # ont été reconstitués au chargement (voir Echiquier.reconstituer_historique).
+            self.revenir_au_demi_coup(len(self.instantanes) - 2)
 
             # Remettre à jour l'échiquier graphique d'après l'échiquier logique
             self.mise_a_jour_echiquier()
 
-        # Ensuite il faut remettre à jour les permissions de prise en passant et du roque, sauf si on est au premier
-        # coup.  Dans ce cas on est certain qu'elles n'ont pas changé.  L'avant-dernier coup devient le coup joué.
-        if avant_dernier_coup is not None:
-            self.coup_joue = avant_dernier_coup
-            self.pion_vient_de_sauter_une_case = avant_dernier_coup["pion a saute"]
-            self.piece_a_bouge = avant_dernier_coup["piece a bouge"]
-        else:
-            self.coup_joue = None
-            self.pion_vient_de_sauter_une_case = ""
-            self.piece_a_bouge = ""
+        # L'avant-dernier coup devient le coup joué
+        self.coup_joue = avant_dernier_coup
 
     def __repr__(self):
         return Echiquier.__repr__(self)
@@ -0,0 +1,148 @@
+import queue
+import threading
+
+
+class RechercheDeRiposte:
+    """Recherche la riposte d'un moteur d'échecs dans un fil d'exécution séparé, pour le compte d'un contrôleur de
+    partie.  Cette classe ne touche jamais à Tk:  le contrôleur lance la recherche, puis consulte riposte_prete()
+    depuis le fil de l'interface (avec after()) jusqu'à ce que la riposte arrive.
+
+    Chaque recherche est identifiée par son événement d'annulation.  Une recherche annulée finit quand même son
+    exécution, mais sa riposte est ignorée à son arrivée dans la file.
+
+    Attributes:
+        adversaire (ControleurDeSunfish):  Le moteur.  Doit disposer des méthodes chercher_riposte, qui ne modifie
+            pas son historique, et enregistrer_les_coups, appelée depuis le fil de l'interface.
+        ripostes (queue.Queue):  Les ripostes trouvées par les fils de recherche, avec l'événement d'annulation de
+            leur recherche et le coup auquel elles répondent.
+        annulation (threading.Event):  L'événement d'annulation de la recherche en cours, ou None si le moteur ne
+            réfléchit pas.
+        fil (threading.Thread):  Le fil de la dernière recherche lancée, ou None.
+    """
+
+    def __init__(self, adversaire):
+        self.adversaire = adversaire
+        self.ripostes = queue.Queue()
+        self.annulation = None
+        self.fil = None
+
+    def lancer(self, coup, limites=None):
+        """Lance la recherche de la riposte à un coup dans un fil d'exécution séparé.
+
+        Args:
+            coup (dict):  Le coup auquel l'adversaire doit riposter.
+            limites (LimitesDeRecherche):  Le budget de la recherche, celui de l'adversaire par défaut."""
+
+        self.annulation = threading.Event()
+        self.fil = threading.Thread(target=self.chercher, args=(coup, self.annulation, limites), daemon=True)
+        self.fil.start()
+
+    def chercher(self, coup, annulation, limites=None):
+        """Corps du fil de recherche:  la riposte est seulement déposée dans la file."""
+
+        riposte = self.adversaire.chercher_riposte(coup, annulation, limites)
+        self.ripostes.put((annulation, coup, riposte))
+
+    def en_cours(self):
+        """Retourne True si le moteur réfléchit à une riposte qu'on attend encore."""
+
+        return self.annulation is not None
+
+    def annuler(self):
+        """Demande à la recherche en cours, s'il y en a une, de s'arrêter.  Sa riposte sera ignorée."""
+
+        if self.annulation is not None:
+            self.annulation.set()
+            self.annulation = None
+
+    def riposte_prete(self):
+        """Vide la file des ripostes.  Doit être appelée depuis le fil de l'interface.  Les ripostes des recherches
+        annulées sont ignorées;  celle de la recherche en cours est enregistrée chez l'adversaire.
+
+        Returns:
+            (dict):  La riposte à jouer sur l'échiquier, ou None si elle n'est pas encore arrivée (ou si le moteur
+                n'a pas trouvé de coup)."""
+
+        riposte_a_jouer = None
+        while True:
+            try:
+                annulation, coup, riposte = self.ripostes.get_nowait()
+            except queue.Empty:
+                return riposte_a_jouer
+
+            if annulation is not self.annulation:
+                continue
+            self.annulation = None
+            if riposte is not None:
+                self.adversaire.enregistrer_les_coups(coup, riposte)
+                riposte_a_jouer = riposte
+
+    def coup_sans_riposte(self, liste):
+        """Retourne notre dernier coup si l'adversaire n'y a pas encore répondu, sinon None.  Le moteur enregistre
+        notre coup en même temps que sa riposte:  tant qu'il n'a pas répondu, son historique a un demi-coup de moins
+        que la liste.
+
+        Args:
+            liste (list):  La liste des coups de la partie, abandons compris."""
+
+        coups = [coup for coup in liste if coup["special"] != "Abandon"]
+        if coups and self.adversaire.nombre_de_demi_coups() < len(coups):
+            return coups[-1]
+        return None
+
+
+if __name__ == '__main__':
+    from pychecs2.echecs.echiquier import Echiquier
+    from pychecs2.sunfish.sunfish import ControleurDeSunfish, LimitesDeRecherche
+
+    def attendre(recherche):
+        """Imite la boucle de sondage du contrôleur de partie."""
+        riposte = None
+        while recherche.en_cours():
+            recherche.fil.join()
+            riposte = recherche.riposte_prete()
+        return riposte
+
+    def test_riposte():
+        echiquier = Echiquier()
+        recherche = RechercheDeRiposte(ControleurDeSunfish(LimitesDeRecherche(profondeur=2)))
+        liste = [echiquier.deplacer("e2", "e4")]
+        recherche.lancer(liste[-1])
+        assert recherche.en_cours() and recherche.coup_sans_riposte(liste) is liste[-1]
+
+        riposte = attendre(recherche)
+        liste.append(echiquier.deplacer(riposte["source"], riposte["cible"]))
+        assert recherche.adversaire.nombre_de_demi_coups() == 2 and recherche.coup_sans_riposte(liste) is None
+
+        # C'est de nouveau aux blancs, et la position est bien dans l'historique des répétitions
+        assert echiquier.trait == 0 and echiquier.historique_positions[echiquier.cle_zobrist] == 1
+        echiquier.deplacer("g1", "f3")
+
+    def test_annulation():
+        echiquier = Echiquier()
+        recherche = RechercheDeRiposte(ControleurDeSunfish(LimitesDeRecherche(temps_par_coup=60)))
+        liste = [echiquier.deplacer("d2", "d4")]
+        cases, cle = list(echiquier.cases), echiquier.cle_zobrist
+
+        # Annuler en pleine recherche:  elle s'arrête bien avant sa minute, et sa riposte est ignorée
+        recherche.lancer(liste[-1])
+        recherche.annuler()
+        recherche.fil.join(10)
+        assert not recherche.fil.is_alive() and not recherche.en_cours()
+        assert recherche.riposte_prete() is None and recherche.ripostes.empty()
+        assert recherche.adversaire.nombre_de_demi_coups() == 0 and recherche.coup_sans_riposte(liste) is liste[-1]
+        assert echiquier.cases == cases and echiquier.cle_zobrist == cle and echiquier.trait == 1
+
+        # Une recherche relancée après une annulation donne une seule riposte
+        recherche.adversaire.limites = LimitesDeRecherche(profondeur=2)
+        recherche.lancer(liste[-1])
+        recherche.annuler()
+        premier_fil = recherche.fil
+        recherche.lancer(liste[-1])
+        riposte = attendre(recherche)
+        premier_fil.join()
+        assert riposte is not None and recherche.riposte_prete() is None
+        assert recherche.adversaire.nombre_de_demi_coups() == 2
+
+    test_riposte()
+    test_annulation()
@@ -46,6 +46,12 @@ class Chronometre(Label):
         if not self.marche:
             self.after_cancel(afterId)
 
+    def temps_restant(self):
+        """Retourne le temps qu'il reste au chrono, en secondes."""
+
+        ecoule = time() - self.debut if self.marche else self.ecoule
+        return max(self.temps - ecoule, 0)
+
     def continuer(self):
         t_offset = time() - self.t_arret
         self.debut += t_offset
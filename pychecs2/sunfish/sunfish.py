@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
-import re, sys, time
+import re, sys, time, threading, random
 from itertools import count
 from collections import namedtuple
 
@@ -109,20 +109,54 @@ directions = {
 MATE_LOWER = piece['K'] - 10*piece['Q']
 MATE_UPPER = piece['K'] + 10*piece['Q']
 
-# The table size is the maximum number of elements in the transposition table.
-TABLE_SIZE = 1e7
+# Memory budget of the transposition tables, in megabytes.
+TABLE_MB = 64
+
+# Approximate memory used by one slot of a transposition table, in bytes: the four list
+# pointers, the 64-bit key and the stored value (a score Entry with its two ints).
+SLOT_BYTES = 224
 
 # Constants for tuning search
 QS_LIMIT = 219
 EVAL_ROUGHNESS = 13
 DRAW_TEST = True
 
+# Number of nodes between two checks of the search limits
+CHECK_INTERVAL = 1024
+
+# Zobrist keys. zobrist[p][i] is the key of piece p on square i, and rzobrist[p][i] the key
+# the same piece gets on the rotated board. Empty squares and the border have no key.
+# The castling, en passant and king passant keys are xored in as well.
+_random = random.Random(2019)
+zobrist = {p: [_random.getrandbits(64) for _ in range(120)] for p in 'PNBRQKpnbrqk'}
+for p in '. \n':
+    zobrist[p] = [0] * 120
+rzobrist = {p: [zobrist[p.swapcase()][119-i] for i in range(120)] for p in zobrist}
+castling_keys = {(a, b): _random.getrandbits(64) for a in (False, True) for b in (False, True)}
+opponent_castling_keys = {(a, b): _random.getrandbits(64) for a in (False, True) for b in (False, True)}
+ep_keys = [0] + [_random.getrandbits(64) for _ in range(119)]
+kp_keys = [0] + [_random.getrandbits(64) for _ in range(119)]
+depth_keys = [_random.getrandbits(64) & ~1 for _ in range(1000)]
+
 
 ###############################################################################
 # Chess logic
 ###############################################################################
 
-class Position(namedtuple('Position', 'board score wc bc ep kp')):
+def state_key(wc, bc, ep, kp):
+    """ The part of a Zobrist key that is not on the board """
+    return castling_keys[wc] ^ opponent_castling_keys[bc] ^ ep_keys[ep] ^ kp_keys[kp]
+
+
+def put(board, i, p, key, rkey):
+    """ Puts p on square i, updating the keys of both orientations """
+    q = board[i]
+    key ^= zobrist[q][i] ^ zobrist[p][i]
+    rkey ^= rzobrist[q][i] ^ rzobrist[p][i]
+    return board[:i] + p + board[i+1:], key, rkey
+
+
+class Position(namedtuple('Position', 'board score wc bc ep kp key rkey')):
     """ A state of a chess game
     board -- a 120 char representation of the board
     score -- the board evaluation
@@ -130,8 +164,21 @@ class Position(namedtuple('Position', 'board score wc bc ep kp')):
     bc -- the opponent castling rights, [west/king side, east/queen side]
     ep - the en passant square
     kp - the king passant square
+    key - the Zobrist key of the position, used by the transposition tables
+    rkey - the Zobrist key of the rotated position, so that rotating is just a swap
     """
 
+    @classmethod
+    def from_board(cls, board, score, wc, bc, ep, kp):
+        """ Builds a position, computing its keys from scratch """
+        key = rkey = 0
+        for i, p in enumerate(board):
+            key ^= zobrist[p][i]
+            rkey ^= rzobrist[p][i]
+        key ^= state_key(wc, bc, ep, kp)
+        rkey ^= state_key(bc, wc, 119-ep if ep else 0, 119-kp if kp else 0)
+        return cls(board, score, wc, bc, ep, kp, key, rkey)
+
     def gen_moves(self):
         # For each of our pieces, iterate through each possible 'ray' of moves,
         # as defined in the 'directions' map. The rays are broken e.g. by
@@ -161,25 +208,35 @@ class Position(namedtuple('Position', 'board score wc bc ep kp')):
         return Position(
             self.board[::-1].swapcase(), -self.score, self.bc, self.wc,
             119-self.ep if self.ep else 0,
-            119-self.kp if self.kp else 0)
+            119-self.kp if self.kp else 0,
+            self.rkey, self.key)
 
     def nullmove(self):
         ''' Like rotate, but clears ep and kp '''
+        ep, kp = self.ep, self.kp
         return Position(
             self.board[::-1].swapcase(), -self.score,
-            self.bc, self.wc, 0, 0)
+            self.bc, self.wc, 0, 0,
+            self.rkey ^ ep_keys[119-ep if ep else 0] ^ kp_keys[119-kp if kp else 0],
+            self.key ^ ep_keys[ep] ^ kp_keys[kp])
 
     def move(self, move):
         i, j = move
         p, q = self.board[i], self.board[j]
-        put = lambda board, i, p: board[:i] + p + board[i+1:]
         # Copy variables and reset ep and kp
         board = self.board
         wc, bc, ep, kp = self.wc, self.bc, 0, 0
         score = self.score + self.value(move)
-        # Actual move
-        board = put(board, j, board[i])
-        board = put(board, i, '.')
+        # The keys of both orientations are updated along with the board
+        key = self.key ^ state_key(wc, bc, self.ep, self.kp) \
+            ^ zobrist[p][i] ^ zobrist[q][j] ^ zobrist[p][j]
+        rkey = self.rkey ^ state_key(bc, wc, 119-self.ep if self.ep else 0, 119-self.kp if self.kp else 0) \
+            ^ rzobrist[p][i] ^ rzobrist[q][j] ^ rzobrist[p][j]
+        # Actual move, copying the board only once
+        if i < j:
+            board = board[:i] + '.' + board[i+1:j] + p + board[j+1:]
+        else:
+            board = board[:j] + p + board[j+1:i] + '.' + board[i+1:]
         # Castling rights, we move the rook or capture the opponent's
         if i == A1: wc = (False, wc[1])
         if i == H1: wc = (wc[0], False)
@@ -190,18 +247,24 @@ class Position(namedtuple('Position', 'board score wc bc ep kp')):
             wc = (False, False)
             if abs(j-i) == 2:
                 kp = (i+j)//2
-                board = put(board, A1 if j < i else H1, '.')
-                board = put(board, kp, 'R')
+                board, key, rkey = put(board, A1 if j < i else H1, '.', key, rkey)
+                board, key, rkey = put(board, kp, 'R', key, rkey)
         # Pawn promotion, double move and en passant capture
         if p == 'P':
             if A8 <= j <= H8:
-                board = put(board, j, 'Q')
+                board, key, rkey = put(board, j, 'Q', key, rkey)
             if j - i == 2*N:
                 ep = i + N
             if j == self.ep:
-                board = put(board, j+S, '.')
+                board, key, rkey = put(board, j+S, '.', key, rkey)
+        key ^= state_key(wc, bc, ep, kp)
+        rkey ^= state_key(bc, wc, 119-ep if ep else 0, 119-kp if kp else 0)
         # We rotate the returned position, so it's ready for the next player
-        return Position(board, score, wc, bc, ep, kp).rotate()
+        return Position(
+            board[::-1].swapcase(), -score, bc, wc,
+            119-ep if ep else 0,
+            119-kp if kp else 0,
+            rkey, key)
 
     def value(self, move):
         i, j = move
@@ -233,12 +296,81 @@ class Position(namedtuple('Position', 'board score wc bc ep kp')):
 # lower <= s(pos) <= upper
 Entry = namedtuple('Entry', 'lower upper')
 
+class TranspositionTable:
+    """ Fixed-size hash table keyed by 64-bit hashes.
+
+    Each bucket has two slots. The first one is depth-preferred: it only gives way to a
+    deeper (or equally deep) entry, or to any entry once its own is left over from an older
+    search. The second one is always replaced. Memory use never grows past the budget, and
+    the deep entries, which cost the most to compute, survive the flood of shallow ones. """
+
+    def __init__(self, megabytes):
+        # Round the number of buckets down to a power of two, to index with a mask
+        buckets = max(int(megabytes * 2**20) // (2 * SLOT_BYTES), 1)
+        self.mask = (1 << (buckets.bit_length() - 1)) - 1
+        self.age = 0
+        self.clear()
+
+    def clear(self):
+        size = 2 * (self.mask + 1)
+        self.keys = [None] * size
+        self.values = [None] * size
+        self.depths = [0] * size
+        self.ages = [0] * size
+
+    def new_search(self):
+        """ Ages the current entries: they can now be evicted from the depth-preferred slots """
+        self.age += 1
+
+    def get(self, key, default=None):
+        i = (key & self.mask) << 1
+        keys = self.keys
+        if keys[i] == key:
+            return self.values[i]
+        if keys[i+1] == key:
+            return self.values[i+1]
+        return default
+
+    def put(self, key, value, depth):
+        i = (key & self.mask) << 1
+        if not (self.keys[i] == key or depth >= self.depths[i] or self.ages[i] != self.age):
+            i += 1
+        self.keys[i] = key
+        self.values[i] = value
+        self.depths[i] = depth
+        self.ages[i] = self.age
+
+    def __len__(self):
+        return len(self.keys) - self.keys.count(None)
+
+
+class SearchStopped(Exception):
+    """ Raised inside bound() when the search limits are exhausted """
+
+
 class Searcher:
-    def __init__(self):
-        self.tp_score = {}
-        self.tp_move = {}
+    def __init__(self, megabytes=TABLE_MB):
+        # tp_score is kept from one search to the next, so it only holds scores that do not depend
+        # on the game history. Scores that saw a repetition go in tp_history, cleared by search().
+        # The scores get half of the memory budget, the history scores and the moves a quarter each.
+        # Moves are keyed by the Zobrist key of pos, scores by that key mixed with depth and root.
+        self.tp_score = TranspositionTable(megabytes / 2)
+        self.tp_history = TranspositionTable(megabytes / 4)
+        self.tp_move = TranspositionTable(megabytes / 4)
         self.history = set()
+        self.history_hits = 0
         self.nodes = 0
+        # Search limits, set by search()
+        self.deadline = None
+        self.max_nodes = None
+        self.cancel = None
+        self.stoppable = False
+
+    def out_of_budget(self):
+        """ True when the deadline or the node budget is exhausted, or the search was cancelled """
+        return (self.deadline is not None and time.monotonic() >= self.deadline
+                or self.max_nodes is not None and self.nodes >= self.max_nodes
+                or self.cancel is not None and self.cancel.is_set())
 
     def bound(self, pos, gamma, depth, root=True):
         """ returns r where
@@ -246,6 +378,11 @@ class Searcher:
                 gamma <= r <= s(pos)   if gamma <= s(pos)"""
         self.nodes += 1
 
+        # Checking the clock at every node would be too slow, but checking only between iterations of
+        # the iterative deepening lets a deep iteration overshoot the budget several times over.
+        if self.stoppable and self.nodes % CHECK_INTERVAL == 0 and self.out_of_budget():
+            raise SearchStopped
+
         # Depth <= 0 is QSearch. Here any position is searched as deeply as is needed for
         # calmness, and from this point on there is no difference in behaviour depending on
         # depth, so so there is no reason to keep different depths in the transposition table.
@@ -266,14 +403,25 @@ class Searcher:
         # FIXME: This is not true, since other positions will be affected by
         # the new values for all the drawn positions.
         if DRAW_TEST:
-            if not root and pos in self.history:
+            if not root and pos.key in self.history:
+                self.history_hits += 1
                 return 0
 
+        # Any repetition found below this node (directly, or through a history-dependent table
+        # entry) makes its score history-dependent.
+        hits = self.history_hits
+
         # Look in the table if we have already searched this position before.
         # We also need to be sure, that the stored search was over the same
         # nodes as the current search.
-        entry = self.tp_score.get((pos, depth, root), Entry(-MATE_UPPER, MATE_UPPER))
-        if entry.lower >= gamma and (not root or self.tp_move.get(pos) is not None):
+        key = pos.key
+        score_key = key ^ depth_keys[depth] ^ root
+        entry = self.tp_history.get(score_key)
+        if entry is not None:
+            self.history_hits += 1
+        else:
+            entry = self.tp_score.get(score_key, Entry(-MATE_UPPER, MATE_UPPER))
+        if entry.lower >= gamma and (not root or self.tp_move.get(key) is not None):
             return entry.lower
         if entry.upper < gamma:
             return entry.upper
@@ -296,7 +444,7 @@ class Searcher:
             # Note, we don't have to check for legality, since we've already done it
             # before. Also note that in QS the killer must be a capture, otherwise we
             # will be non deterministic.
-            killer = self.tp_move.get(pos)
+            killer = self.tp_move.get(key)
             if killer and (depth > 0 or pos.value(killer) >= QS_LIMIT):
                 yield killer, -self.bound(pos.move(killer), 1-gamma, depth-1, root=False)
             # Then all the other moves
@@ -312,10 +460,8 @@ class Searcher:
         for move, score in moves():
             best = max(best, score)
             if best >= gamma:
-                # Clear before setting, so we always have a value
-                if len(self.tp_move) > TABLE_SIZE: self.tp_move.clear()
                 # Save the move for pv construction and killer heuristic
-                self.tp_move[pos] = move
+                self.tp_move.put(key, move, depth)
                 break
 
         # Stalemate checking is a bit tricky: Say we failed low, because
@@ -334,45 +480,71 @@ class Searcher:
                 in_check = is_dead(pos.nullmove())
                 best = -MATE_UPPER if in_check else 0
 
-        # Clear before setting, so we always have a value
-        if len(self.tp_score) > TABLE_SIZE: self.tp_score.clear()
         # Table part 2
+        table = self.tp_history if self.history_hits != hits else self.tp_score
         if best >= gamma:
-            self.tp_score[pos, depth, root] = Entry(best, entry.upper)
+            table.put(score_key, Entry(best, entry.upper), depth)
         if best < gamma:
-            self.tp_score[pos, depth, root] = Entry(entry.lower, best)
+            table.put(score_key, Entry(entry.lower, best), depth)
 
         return best
 
-    def search(self, pos, history=()):
-        """ Iterative deepening MTD-bi search """
+    def search(self, pos, history=(), limits=None, cancel=None):
+        """ Iterative deepening MTD-bi search
+
+        limits is a LimitesDeRecherche (or None for no limit) and cancel a threading.Event.
+        The first iteration always completes, so that there is a move to play; after that the
+        search stops as soon as a limit is reached, discarding the unfinished iteration. """
         self.nodes = 0
         if DRAW_TEST:
-            self.history = set(history)
-            # print('# Clearing table due to new history')
-            self.tp_score.clear()
+            self.history = {position.key for position in history}
+            # Only the history-dependent scores are cleared: tp_score is reused across moves
+            self.tp_history.clear()
+        self.tp_score.new_search()
+        self.tp_move.new_search()
 
         # In finished games, we could potentially go far enough to cause a recursion
         # limit exception. Hence we bound the ply.
-        for depth in range(1, 1000):
-            # The inner loop is a binary search on the score of the position.
-            # Inv: lower <= score <= upper
-            # 'while lower != upper' would work, but play tests show a margin of 20 plays
-            # better.
-            lower, upper = -MATE_UPPER, MATE_UPPER
-            while lower < upper - EVAL_ROUGHNESS:
-                gamma = (lower+upper+1)//2
-                score = self.bound(pos, gamma, depth)
-                if score >= gamma:
-                    lower = score
-                if score < gamma:
-                    upper = score
-            # We want to make sure the move to play hasn't been kicked out of the table,
-            # So we make another call that must always fail high and thus produce a move.
-            self.bound(pos, lower, depth)
-            # If the game hasn't finished we can retrieve our move from the
-            # transposition table.
-            yield depth, self.tp_move.get(pos), self.tp_score.get((pos, depth, True)).lower
+        max_depth = 999
+        self.deadline, self.max_nodes, self.cancel = None, None, cancel
+        if limits is not None:
+            self.deadline = limits.echeance(time.monotonic())
+            self.max_nodes = limits.noeuds
+            max_depth = min(limits.profondeur or max_depth, max_depth)
+
+        for depth in range(1, max_depth + 1):
+            self.stoppable = depth > 1
+            try:
+                score, move = self.iterate(pos, depth)
+            except SearchStopped:
+                return
+            yield depth, move, score
+            if self.out_of_budget():
+                return
+
+    def iterate(self, pos, depth):
+        """ One iteration of the iterative deepening: returns the score and the move to play """
+        # The inner loop is a binary search on the score of the position.
+        # Inv: lower <= score <= upper
+        # 'while lower != upper' would work, but play tests show a margin of 20 plays
+        # better.
+        lower, upper = -MATE_UPPER, MATE_UPPER
+        while lower < upper - EVAL_ROUGHNESS:
+            gamma = (lower+upper+1)//2
+            score = self.bound(pos, gamma, depth)
+            if score >= gamma:
+                lower = score
+            if score < gamma:
+                upper = score
+        # We want to make sure the move to play hasn't been kicked out of the table,
+        # So we make another call that must always fail high and thus produce a move.
+        self.bound(pos, lower, depth)
+        # If the game hasn't finished we can retrieve our move from the
+        # transposition table.
+        key = pos.key
+        score_key = key ^ depth_keys[depth] ^ True
+        entry = self.tp_history.get(score_key) or self.tp_score.get(score_key)
+        return entry.lower, self.tp_move.get(key)
 
 
 ###############################################################################
@@ -404,7 +576,7 @@ def print_pos(pos):
 
 
 def main():
-    hist = [Position(initial, 0, (True,True), (True,True), 0, 0)]
+    hist = [Position.from_board(initial, 0, (True,True), (True,True), 0, 0)]
     searcher = Searcher()
     while True:
         print_pos(hist[-1])
@@ -450,23 +622,106 @@ def main():
 # Classe permettant à sunfish d'interagir avec le Controleur de Partie
 ########################################################################################################################
 
+class LimitesDeRecherche:
+    """Budget d'une recherche de sunfish.  Toutes les limites sont facultatives, et la première atteinte arrête la
+    recherche.  Les durées sont en secondes.
+
+    Attributes:
+        temps_par_coup (float):  Durée fixe de la recherche.
+        profondeur (int):  Profondeur maximale de l'approfondissement itératif.
+        noeuds (int):  Nombre maximal de noeuds visités.
+        temps_restant (float):  Temps restant à la pendule:  la recherche s'en accorde une part.
+        increment (float):  Temps ajouté à la pendule après chaque coup.
+        coups_restants (int):  Nombre de coups à jouer avant le prochain contrôle de temps, ou None si tout le temps
+            restant doit servir jusqu'à la fin de la partie."""
+
+    # Nombre de coups qu'on suppose rester à jouer lorsque la pendule ne le précise pas
+    coups_restants_par_defaut = 30
+
+    # Marge gardée à la pendule pour ne jamais tomber à zéro
+    marge = 0.05
+
+    def __init__(self, temps_par_coup=None, profondeur=None, noeuds=None, temps_restant=None, increment=0,
+                 coups_restants=None):
+        self.temps_par_coup = temps_par_coup
+        self.profondeur = profondeur
+        self.noeuds = noeuds
+        self.temps_restant = temps_restant
+        self.increment = increment
+        self.coups_restants = coups_restants
+
+    def avec_pendule(self, temps_restant, increment=0, coups_restants=None):
+        """Retourne une copie de ces limites qui tient aussi compte de la pendule."""
+
+        return LimitesDeRecherche(self.temps_par_coup, self.profondeur, self.noeuds, temps_restant, increment,
+                                  coups_restants)
+
+    def duree(self):
+        """Retourne la durée accordée à la recherche, ou None si elle n'est pas limitée dans le temps."""
+
+        durees = []
+        if self.temps_par_coup is not None:
+            durees.append(self.temps_par_coup)
+        if self.temps_restant is not None:
+            disponible = max(self.temps_restant - self.marge, 0)
+            coups = self.coups_restants or self.coups_restants_par_defaut
+            durees.append(min(disponible / coups + self.increment, disponible))
+        return min(durees) if durees else None
+
+    def echeance(self, debut):
+        """Retourne l'instant où la recherche commencée à debut doit s'arrêter, ou None."""
+
+        duree = self.duree()
+        return None if duree is None else debut + duree
+
+    def __repr__(self):
+        return (f"LimitesDeRecherche(temps_par_coup={self.temps_par_coup}, profondeur={self.profondeur}, "
+                f"noeuds={self.noeuds}, temps_restant={self.temps_restant}, increment={self.increment}, "
+                f"coups_restants={self.coups_restants})")
+
+
 class ControleurDeSunfish:
     """Classe permettant d'interagir avec le controleur de partie.  Doit posséder une méthode jouer qui reçcoit un coup
-    et retourne la riposte."""
+    et retourne la riposte.
 
-    def __init__(self):
-        self.hist = [Position(initial, 0, (True, True), (True, True), 0, 0)]
-        self.searcher = Searcher()
+    La recherche (chercher_riposte) ne modifie pas l'historique et peut donc tourner dans un fil d'exécution séparé
+    pendant que l'interface reste disponible;  l'historique n'est modifié que par enregistrer_les_coups et
+    annuler_le_dernier_coup, appelées depuis le fil de l'interface.
+
+    Attributes:
+        limites (LimitesDeRecherche):  Le budget de chaque recherche, une seconde par coup par défaut.
+        memoire (float):  La mémoire accordée aux tables de transposition, en mégaoctets."""
+
+    def __init__(self, limites=None, memoire=TABLE_MB):
+        self.hist = [Position.from_board(initial, 0, (True, True), (True, True), 0, 0)]
+        self.searcher = Searcher(memoire)
+        self.memoire = memoire
+        self.limites = limites if limites is not None else LimitesDeRecherche(temps_par_coup=1)
+
+        # Le Searcher n'est pas réentrant:  une recherche abandonnée doit finir avant que la suivante ne commence
+        self.verrou_recherche = threading.Lock()
 
     def obtenir_le_nom(self):
         """Retourne le nom du moteur d'échecs"""
         return "Sunfish"
 
-    def jouer(self, coup):
-        """Méthode qui accepte le coup joué par les blancs, et retourne la riposte du moteur d'échecs.
+    @staticmethod
+    def traduire(coup):
+        """Traduit les cases d'un coup dans notre format en tuple d'int pour sunfish."""
+
+        return parse(coup["source"]), parse(coup["cible"])
+
+    def chercher_riposte(self, coup, annulation=None, limites=None):
+        """Recherche la riposte au coup joué par les blancs, sans modifier l'historique.
+
+        Args:
+            coup (dict):  Le dictionnaire contenant les informations du coup joué.
+            annulation (threading.Event):  Si cet événement est signalé, la recherche s'arrête aussitôt et la
+                méthode retourne None.
+            limites (LimitesDeRecherche):  Le budget de cette recherche, self.limites par défaut.
 
         Returns:
-            coup (dict):  Le dictionnaire contenant les informations du coup joué."""
+            (dict):  La riposte, ou None si les blancs ont abandonné ou si la recherche a été annulée."""
 
         # Pour débuggage, vérifier qu'on a bien un dictionnaire contenant les clés nécessaires
         assert isinstance(coup, dict)
@@ -478,31 +733,216 @@ class ControleurDeSunfish:
         if coup["special"] == "Abandon":
             return
 
-        # Traduire les informations du coup en tuple d'int
-        source = coup["source"]
-        cible = coup["cible"]
-        move = parse(source), parse(cible)
+        # La position après notre coup, qu'on n'annexe pas encore à l'historique
+        position = self.hist[-1].move(self.traduire(coup))
+        historique = self.hist + [position]
 
-        # Annexer ce coup à la liste des coups
-        self.hist.append(self.hist[-1].move(move))
+        # Rechercher la riposte:  on garde le coup de la dernière profondeur complétée
+        move = None
+        with self.verrou_recherche:
+            for _depth, move, score in self.searcher.search(position, historique, limites or self.limites,
+                                                            annulation):
+                pass
 
-        # Rechercher la riposte
-        start = time.time()
-        for _depth, move, score in self.searcher.search(self.hist[-1], self.hist):
-            if time.time() - start > 1:
-                break
+        if move is None or (annulation is not None and annulation.is_set()):
+            return
 
-        # Annexer la riposte à la liste des coups, traduire dans notre format et retourner le coup
-        self.hist.append(self.hist[-1].move(move))
+        # Traduire dans notre format et retourner le coup
         return {"source": render(119-move[0]), "cible": render(119-move[1])}
 
+    def enregistrer_les_coups(self, coup, riposte):
+        """Annexe à l'historique le coup des blancs et la riposte retournée par chercher_riposte."""
+
+        position = self.hist[-1].move(self.traduire(coup))
+        source, cible = self.traduire(riposte)
+        self.hist += [position, position.move((119 - source, 119 - cible))]
+
+    def jouer(self, coup):
+        """Méthode qui accepte le coup joué par les blancs, et retourne la riposte du moteur d'échecs.
+
+        Returns:
+            coup (dict):  Le dictionnaire contenant les informations du coup joué."""
+
+        riposte = self.chercher_riposte(coup)
+        if riposte is not None:
+            self.enregistrer_les_coups(coup, riposte)
+        return riposte
+
+    def nombre_de_demi_coups(self):
+        """Retourne le nombre de demi-coups enregistrés dans l'historique."""
+
+        return len(self.hist) - 1
+
     def annuler_le_dernier_coup(self):
 
         # On enlève tout simplement la dernière configuration de la liste...
         self.hist.pop()
 
 
-
 if __name__ == '__main__':
-    main()
+
+    # python -m pychecs2.sunfish.sunfish tests:  exécuter les tests au lieu de jouer contre sunfish
+    if sys.argv[1:] != ["tests"]:
+        main()
+        sys.exit()
+
+    def position_initiale():
+        return Position.from_board(initial, 0, (True, True), (True, True), 0, 0)
+
+    def test_limites_de_recherche():
+        assert LimitesDeRecherche().duree() is None and LimitesDeRecherche().echeance(100) is None
+        assert LimitesDeRecherche(temps_par_coup=2).echeance(100) == 102
+
+        # Le temps restant, moins la marge, réparti sur les coups restants, plus l'incrément
+        pendule = LimitesDeRecherche(temps_restant=30.05, increment=0.5)
+        assert abs(pendule.duree() - (30 / 30 + 0.5)) < 1e-9
+        assert abs(LimitesDeRecherche(temps_restant=3.05, coups_restants=1).duree() - 3) < 1e-9
+
+        # L'incrément ne permet pas de dépasser le temps restant, ni la marge de le faire devenir négatif
+        assert abs(LimitesDeRecherche(temps_restant=1.05, increment=5).duree() - 1) < 1e-9
+        assert LimitesDeRecherche(temps_restant=0.01).duree() == 0
+
+        # avec_pendule garde les autres limites, et la plus courte des durées l'emporte
+        limites = LimitesDeRecherche(temps_par_coup=1, profondeur=4, noeuds=1000).avec_pendule(10.05, 0, 20)
+        assert (limites.profondeur, limites.noeuds, limites.temps_restant, limites.coups_restants) == (4, 1000, 10.05, 20)
+        assert abs(limites.duree() - 0.5) < 1e-9
+        assert LimitesDeRecherche(temps_par_coup=0.1).avec_pendule(10.05).duree() == 0.1
+
+    def test_arret_de_la_recherche():
+        searcher = Searcher()
+        pos = position_initiale()
+
+        # Profondeur fixe
+        profondeurs = [depth for depth, move, score in searcher.search(pos, [pos], LimitesDeRecherche(profondeur=3))]
+        assert profondeurs == [1, 2, 3]
+
+        # Budget de noeuds:  vérifié tous les CHECK_INTERVAL noeuds
+        for depth, move, score in searcher.search(pos, [pos], LimitesDeRecherche(noeuds=5000)):
+            pass
+        assert 5000 <= searcher.nodes < 5000 + CHECK_INTERVAL and move is not None
+
+        # Budget de temps:  l'itération en cours est interrompue, bien avant la profondeur maximale
+        debut = time.monotonic()
+        for depth, move, score in searcher.search(pos, [pos], LimitesDeRecherche(temps_par_coup=0.2)):
+            pass
+        assert time.monotonic() - debut < 1 and move is not None
+
+        # Une recherche annulée d'avance complète quand même sa première itération
+        annulation = threading.Event()
+        annulation.set()
+        resultats = list(searcher.search(pos, [pos], LimitesDeRecherche(temps_par_coup=60), annulation))
+        assert [depth for depth, move, score in resultats] == [1] and resultats[0][1] is not None
+
+    def test_controleur():
+        controleur = ControleurDeSunfish(LimitesDeRecherche(profondeur=2))
+        coup = {"source": "e2", "cible": "e4", "special": ""}
+        riposte = controleur.chercher_riposte(coup)
+        assert riposte is not None and controleur.nombre_de_demi_coups() == 0
+
+        annulation = threading.Event()
+        annulation.set()
+        assert controleur.chercher_riposte(coup, annulation) is None
+        assert controleur.jouer(coup) == riposte and controleur.nombre_de_demi_coups() == 2
+
+    def test_table_persistante():
+        # Les cavaliers sortent et rentrent:  la position de départ se répète
+        blanc = lambda coup: (parse(coup[:2]), parse(coup[2:]))
+        noir = lambda coup: (119 - parse(coup[:2]), 119 - parse(coup[2:]))
+        historique = [position_initiale()]
+        for coup in (blanc("g1f3"), noir("g8f6"), blanc("f3g1"), noir("f6g8")):
+            historique.append(historique[-1].move(coup))
+        assert historique[-1] == historique[0]
+
+        # Les scores qui ont vu une répétition restent à part, et sont oubliés à la recherche suivante
+        searcher = Searcher()
+        for depth, move, score in searcher.search(historique[-1], historique, LimitesDeRecherche(profondeur=4)):
+            pass
+        assert len(searcher.tp_history) > 0 and len(searcher.tp_score) > 0
+        scores_conserves = len(searcher.tp_score)
+        for depth, move, score in searcher.search(historique[-1], historique[-1:], LimitesDeRecherche(profondeur=1)):
+            pass
+        assert len(searcher.tp_history) == 0 and len(searcher.tp_score) >= scores_conserves
+
+        # Sur une courte partie, la table conservée d'un coup à l'autre donne les mêmes scores qu'une table neuve, à
+        # la précision de la recherche près
+        pos = historique[-1]
+        historique = [pos]
+        for _ in range(6):
+            for depth, move, score in searcher.search(pos, historique, LimitesDeRecherche(profondeur=4)):
+                pass
+            for depth, _move, score_neuf in Searcher().search(pos, historique, LimitesDeRecherche(profondeur=4)):
+                pass
+            assert abs(score - score_neuf) <= EVAL_ROUGHNESS
+            pos = pos.move(move)
+            historique.append(pos)
+
+    def test_table_de_transposition():
+        import tracemalloc
+
+        # Le nombre de seaux est une puissance de deux, et la table tient dans son budget une fois pleine
+        tracemalloc.start()
+        table = TranspositionTable(2)
+        seaux = table.mask + 1
+        assert seaux & table.mask == 0 and 2 * seaux * SLOT_BYTES <= 2 * 2**20
+        tire = random.Random(1)
+        for _ in range(4 * len(table.keys)):
+            table.put(tire.getrandbits(64), Entry(tire.randint(-MATE_UPPER, MATE_UPPER), MATE_UPPER), tire.randint(0, 9))
+        memoire, _pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(table.keys) == 2 * seaux and len(table) > 0.95 * len(table.keys) and memoire < 2 * 2**20
+
+        # Cinq clés qui tombent dans le même seau
+        table = TranspositionTable(1)
+        k1, k2, k3, k4, k5 = (7 + n * (table.mask + 1) for n in range(5))
+        table.put(k1, "a", 5)
+        table.put(k2, "b", 2)
+        assert table.get(k1) == "a" and table.get(k2) == "b"
+
+        # Une entrée moins profonde remplace la case « toujours remplacée », pas la plus profonde
+        table.put(k3, "c", 1)
+        assert table.get(k1) == "a" and table.get(k2) is None and table.get(k3) == "c"
+
+        # Une entrée au moins aussi profonde prend la case « profondeur d'abord »
+        table.put(k4, "d", 7)
+        assert table.get(k1) is None and table.get(k4) == "d" and table.get(k3) == "c"
+
+        # Après une nouvelle recherche, les entrées anciennes cèdent leur place, même plus profondes
+        table.new_search()
+        table.put(k5, "e", 0)
+        assert table.get(k4) is None and table.get(k5) == "e" and table.get(k3) == "c"
+        table.put(k5, "f", 0)
+        assert table.get(k5) == "f" and table.get(k3) == "c" and len(table) == 2
+
+    def test_cles_de_zobrist():
+        recalculer = lambda pos: Position.from_board(pos.board, pos.score, pos.wc, pos.bc, pos.ep, pos.kp)
+
+        # Parties au hasard:  après chaque coup, rotation et coup nul, les clés tenues à jour sont celles qu'on
+        # recalcule.  L'égalité des Position compare aussi key et rkey.
+        tire = random.Random(2019)
+        roques = en_passant = promotions = 0
+        for partie in range(40):
+            pos = position_initiale()
+            for demi_coup in range(150):
+                assert pos == recalculer(pos)
+                assert pos.rotate() == recalculer(pos.rotate()) and pos.nullmove() == recalculer(pos.nullmove())
+                coups = [coup for coup in pos.gen_moves() if pos.move(coup).score > -MATE_LOWER]
+                if not coups:
+                    break
+                i, j = tire.choice(coups)
+                roques += pos.board[i] == 'K' and abs(j - i) == 2
+                en_passant += pos.board[i] == 'P' and j == pos.ep
+                promotions += pos.board[i] == 'P' and A8 <= j <= H8
+                pos = pos.move((i, j))
+        assert roques and en_passant and promotions
+
+        # La clé distingue une position de sa rotation, et ne dépend que de la position
+        pos = position_initiale().move((parse("e2"), parse("e4")))
+        assert pos.key != pos.rotate().key and pos.rotate().rotate() == pos
+
+    test_limites_de_recherche()
+    test_arret_de_la_recherche()
+    test_controleur()
+    test_table_persistante()
+    test_table_de_transposition()
+    test_cles_de_zobrist()
 